@@ -0,0 +1,157 @@
+""" Background acquisition for RadarDevice / RadarData (any source with receive(index, out=None)).
+    A reader thread receives frames straight into a preallocated ring of frame slots, so acquisition
+    runs at the device rate whatever the consumer (e.g. the Qt render loop) is doing.
+    latest(): newest complete frame, non-blocking, older unread frames are skipped
+    next(): oldest unread frame, blocking, for consumers that must see every frame (recording, DDC, sliding RD)
+    The frame returned is a view of its slot, it stays valid until the next latest()/next() call.
+"""
+import threading
+from collections import deque
+from timeit import default_timer as timer
+
+import numpy as np
+
+from processing import getdtypes
+
+
+class AcquisitionEngine:
+    """ source: RadarDevice or RadarData, framesize: samples per frame (source.rxbuffersize by default),
+        nslots: ring size, at least 3 (one being written, one held by the consumer, one ready)
+        Multichannel sources (RadarDevice channelmode "dual"/"sumdelta") get (nslots, channels, framesize) slots
+        and frames of shape (channels, N).
+        Counters: overflows, unread frames overwritten because the consumer fell nslots behind;
+        underruns, latest()/next() calls that found no new frame; skipped, frames passed over by latest()
+    """
+
+    def __init__(self, source, framesize=None, nslots=8, dtype=None):
+        self.source = source
+        self.framesize = int(framesize or source.rxbuffersize)
+        self.nslots = max(int(nslots), 3)
+        self.nchannels = int(getattr(source, "nchannels", 1))
+        cdtype, rdtype = getdtypes()
+        shape = (self.nslots, self.nchannels, self.framesize) if self.nchannels > 1 else (self.nslots, self.framesize)
+        self.slots = np.zeros(shape, dtype=dtype or cdtype)
+        self.lengths = np.zeros(self.nslots, dtype=np.int64)
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.thread = None
+        self.reset()
+
+    def reset(self):
+        self.free = deque(range(self.nslots))  # slots the reader may write
+        self.filled = deque()  # (slot, sequence) complete and unread, oldest first
+        self.held = None  # slot returned to the consumer
+        self.sequence = 0  # frames acquired
+        self.overflows = 0
+        self.underruns = 0
+        self.skipped = 0
+        self.error = None
+        self.running = False
+        self.starttime = None
+        self.stoptime = None
+
+    def start(self, index=0):
+        if self.running:
+            return self
+        self.reset()
+        self.index = index
+        self.running = True
+        self.starttime = timer()
+        self.thread = threading.Thread(target=self.readloop, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+            self.stoptime = timer()
+        with self.ready:
+            self.ready.notify_all()
+
+    def readloop(self):
+        while self.running:
+            with self.lock:
+                if self.free:
+                    slot = self.free.popleft()
+                else:  # consumer too slow, reuse the oldest unread frame
+                    slot, _ = self.filled.popleft()
+                    self.overflows += 1
+            try:
+                data, datalen, self.index = self.source.receive(self.index, out=self.slots[slot])
+            except Exception as e:
+                self.error = e
+                self.running = False
+                with self.ready:
+                    self.free.append(slot)
+                    self.ready.notify_all()
+                break
+            with self.ready:
+                self.lengths[slot] = datalen
+                self.filled.append((slot, self.sequence))
+                self.sequence += 1
+                self.ready.notify_all()
+
+    def hold(self, slot):
+        # give the previously held slot back to the reader
+        if self.held is not None:
+            self.free.append(self.held)
+        self.held = slot
+
+    def latest(self):
+        """ (frame, sequence) of the newest unread frame or None if there is none yet, never blocks """
+        with self.lock:
+            if self.error is not None:
+                raise self.error
+            if not self.filled:
+                self.underruns += 1
+                return None
+            while len(self.filled) > 1:
+                slot, _ = self.filled.popleft()
+                self.free.append(slot)
+                self.skipped += 1
+            slot, sequence = self.filled.popleft()
+            self.hold(slot)
+            return self.slots[slot, ..., :self.lengths[slot]], sequence
+
+    def next(self, timeout=None):
+        """ (frame, sequence) of the oldest unread frame, waits up to timeout seconds (None: forever),
+            returns None on timeout or when the engine stopped
+        """
+        with self.ready:
+            if not self.filled:
+                self.underruns += 1
+                self.ready.wait_for(lambda: self.filled or not self.running, timeout)
+            if self.error is not None:
+                raise self.error
+            if not self.filled:
+                return None
+            slot, sequence = self.filled.popleft()
+            self.hold(slot)
+            return self.slots[slot, ..., :self.lengths[slot]], sequence
+
+    def stats(self):
+        elapsed = (self.stoptime or timer()) - self.starttime if self.starttime is not None else 0.0
+        rate = self.sequence / elapsed if elapsed > 0 else 0.0
+        return {
+            "frames": self.sequence,
+            "frames_per_s": rate,
+            "MSps": rate * self.framesize / 1e6,
+            "overflows": self.overflows,
+            "underruns": self.underruns,
+            "skipped": self.skipped,
+            "queued": len(self.filled),
+        }
+
+    def report(self):
+        st = self.stats()
+        print("Acquisition: %d frames, %0.1f frames/s, %0.3f MS/s, %d overflows, %d underruns, %d skipped"
+              % (st["frames"], st["frames_per_s"], st["MSps"], st["overflows"], st["underruns"], st["skipped"]))
+        return st
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
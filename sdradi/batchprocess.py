@@ -0,0 +1,162 @@
+#Headless batch processing of capture files over a process pool
+#python batchprocess.py ./data/radardata5s-1101fast3move.npy --products spectrum spectrogram rd cfar --workers 8
+#Products are written next to --output: _spectrum.npy (frames, framesize), _spectrogram.npy (stft frames, nfft),
+#_rd.npy (frames, Doppler bins, range bins) and _cfar.npz (detections: frame, range bin, Doppler bin, SNR dB; counts per frame)
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from timeit import default_timer as timer
+
+import fftbackend
+from capture import loadcapture, readmetadata, tocomplex
+from processing import SpectrumProcessor, StreamingSTFT, rangedoppler, cfar2d, getdtypes, setprecision
+
+PRODUCTS = ("spectrum", "spectrogram", "rd", "cfar")
+
+def initworker(precision, fftworkers):
+    #one FFT thread per process unless asked otherwise, the pool already uses the cores
+    setprecision(precision)
+    fftbackend.setbackend(fftbackend.backend, fftworkers)
+
+def stftrange(nsamples, start, stop, nfft, hop):
+    """ spectrogram frames starting in samples start:stop, and the samples they need """
+    nstft = (nsamples - nfft) // hop + 1 if nsamples >= nfft else 0
+    j0 = min(-(-start // hop), nstft)
+    j1 = min(-(-stop // hop), nstft)
+    return j0, j1, j0 * hop, (j1 - 1) * hop + nfft if j1 > j0 else j0 * hop
+
+def processrange(path, startframe, stopframe, params):
+    """ worker: all products of frames startframe:stopframe, read from the memory-mapped capture """
+    data = loadcapture(path)
+    scale = readmetadata(path).get("scale", 1.0)
+    cdtype, rdtype = getdtypes()
+    framesize = params["framesize"]
+    frames = tocomplex(data[startframe*framesize:stopframe*framesize], scale, cdtype).reshape(-1, framesize)
+    results = {}
+    if "spectrum" in params["products"]:
+        spectrum = SpectrumProcessor(window=params["window"])
+        results["spectrum"] = np.stack([spectrum.process(frame, params["fs"])[0] for frame in frames])
+    if "spectrogram" in params["products"]:
+        nfft, hop = params["nfft"], params["hop"]
+        j0, j1, a, b = stftrange(len(data), startframe*framesize, stopframe*framesize, nfft, hop)
+        stft = StreamingSTFT(nfft=nfft, hop=hop, window=params["window"], fs=params["fs"], maxframes=max(j1 - j0, 1))
+        results["spectrogram"] = (j0, stft.update(tocomplex(data[a:b], scale, cdtype)).copy() if j1 > j0 else None)
+    if "rd" in params["products"] or "cfar" in params["products"]:
+        rd, _ = rangedoppler(frames, n_c=params["n_c"], n_s=params["n_s"], showdb=True, fulldoppler=params["fulldoppler"])
+        if "rd" in params["products"]:
+            results["rd"] = rd
+        if "cfar" in params["products"]:
+            detections = cfar2d(rd, method=params["cfar"], threshold_db=params["threshold_db"])
+            results["cfar"] = [np.column_stack([np.full(len(d), startframe + i), d]) for i, d in enumerate(detections)]
+    if hasattr(data, "close"):
+        data.close()
+    return startframe, stopframe, results
+
+def runbatch(path, products=PRODUCTS, output=None, framesize=None, chunkframes=16, workers=None,
+             nfft=1024, overlap=0.5, window="blackman", fulldoppler=True, cfar="ca", threshold_db=15.0,
+             precision="single", fftworkers=1):
+    """ process a capture in frame ranges of chunkframes over a pool of workers processes,
+        products are written to output_<product>.npy/.npz as the ranges complete
+    """
+    for product in products:
+        if product not in PRODUCTS:
+            raise ValueError("products must be in %s" % (PRODUCTS,))
+    metadata = readmetadata(path)
+    data = loadcapture(path)
+    nsamples = len(data)
+    if hasattr(data, "close"):
+        data.close()
+    fs = metadata.get("samplerate", 0.6e6)
+    framesize = framesize or metadata.get("rxbuffersize", 1024*16)
+    n_s = int(metadata.get("ramp_time_s", 1e-3) * fs) #ADC samples per chirp, 600
+    nframes = nsamples // framesize
+    hop = max(1, int(round(nfft * (1 - overlap))))
+    params = {"products": products, "framesize": framesize, "fs": fs, "window": window, "nfft": nfft, "hop": hop,
+              "n_s": n_s, "n_c": int(framesize / n_s) - 1, "fulldoppler": fulldoppler, "cfar": cfar,
+              "threshold_db": threshold_db}
+    output = output or (path[:-4] if path.endswith(".npy") else path)
+    folder = os.path.dirname(os.path.abspath(output))
+    os.makedirs(folder, exist_ok=True)
+
+    #results go straight into preallocated .npy files, memory stays bounded whatever the capture length
+    setprecision(precision)
+    cdtype, rdtype = getdtypes()
+    outputs = {}
+    if "spectrum" in products:
+        outputs["spectrum"] = np.lib.format.open_memmap(output + "_spectrum.npy", mode="w+", dtype=rdtype,
+                                                        shape=(nframes, framesize))
+    if "spectrogram" in products:
+        _, nstft, _, _ = stftrange(nsamples, 0, nframes*framesize, nfft, hop)
+        outputs["spectrogram"] = np.lib.format.open_memmap(output + "_spectrogram.npy", mode="w+", dtype=rdtype,
+                                                           shape=(nstft, nfft))
+    if "rd" in products:
+        with np.errstate(divide="ignore"): #shape probe on zeros
+            rdshape = rangedoppler(np.zeros(framesize, dtype=cdtype), n_c=params["n_c"], n_s=n_s, fulldoppler=fulldoppler)[0].shape
+        outputs["rd"] = np.lib.format.open_memmap(output + "_rd.npy", mode="w+", dtype=rdtype, shape=(nframes,) + rdshape)
+    detections = {}
+
+    ranges = [(start, min(start + chunkframes, nframes)) for start in range(0, nframes, chunkframes)]
+    print("Batch %s: %d frames of %d samples in %d ranges, products %s" % (path, nframes, framesize, len(ranges), ", ".join(products)))
+    start = timer()
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=initworker, initargs=(precision, fftworkers)) as pool:
+        futures = [pool.submit(processrange, path, a, b, params) for a, b in ranges]
+        for future in as_completed(futures):
+            a, b, results = future.result()
+            if "spectrum" in results:
+                outputs["spectrum"][a:b] = results["spectrum"]
+            if "spectrogram" in results and results["spectrogram"][1] is not None:
+                j0, frames = results["spectrogram"]
+                outputs["spectrogram"][j0:j0 + len(frames)] = frames
+            if "rd" in results:
+                outputs["rd"][a:b] = results["rd"]
+            if "cfar" in results:
+                detections[a] = results["cfar"]
+            done += b - a
+            elapsed = timer() - start
+            rate = done * framesize / elapsed / 1e6
+            print("%d/%d frames, %0.1fs, %0.2f MS/s, %0.0fs left" % (done, nframes, elapsed, rate,
+                                                                    (nframes - done) * framesize / 1e6 / rate))
+    for product, array in outputs.items():
+        array.flush()
+    if "cfar" in products:
+        perframe = [d for a in sorted(detections) for d in detections[a]]
+        counts = np.array([len(d) for d in perframe], dtype=np.int64)
+        allframes = np.concatenate(perframe) if perframe else np.zeros((0, 4))
+        np.savez(output + "_cfar.npz", detections=allframes, counts=counts)
+    elapsed = timer() - start
+    print("Processed %0.1f MS in %0.1fs, %0.2f MS/s" % (nframes * framesize / 1e6, elapsed, nframes * framesize / elapsed / 1e6))
+    return output
+
+def main():
+    args = parser.parse_args()
+    runbatch(args.capture, args.products, args.output, args.framesize, args.chunkframes, args.workers,
+             nfft=args.nfft, overlap=args.overlap, cfar=args.cfar, threshold_db=args.threshold, precision=args.precision)
+
+import argparse
+parser = argparse.ArgumentParser(description='Batch capture processing')
+parser.add_argument('capture', type=str,
+                    help='capture file (.npy, int16 IQ or block-compressed)')
+parser.add_argument('--products', default=list(PRODUCTS), nargs='+',
+                    help='products to compute: spectrum, spectrogram, rd, cfar')
+parser.add_argument('--output', default=None, type=str,
+                    help='output prefix, the capture path without .npy by default')
+parser.add_argument('--framesize', default=None, type=int,
+                    help='samples per frame, rxbuffersize of the capture by default')
+parser.add_argument('--chunkframes', default=16, type=int,
+                    help='frames per work item')
+parser.add_argument('--workers', default=None, type=int,
+                    help='worker processes, all cores by default')
+parser.add_argument('--nfft', default=1024, type=int,
+                    help='spectrogram FFT size')
+parser.add_argument('--overlap', default=0.5, type=float,
+                    help='spectrogram frame overlap')
+parser.add_argument('--cfar', default='ca', type=str,
+                    help='CFAR method: ca, go, os')
+parser.add_argument('--threshold', default=15.0, type=float,
+                    help='CFAR threshold in dB')
+parser.add_argument('--precision', default="single", type=str,
+                    help='single (complex64) or double (complex128)')
+
+if __name__ == '__main__':
+    main()
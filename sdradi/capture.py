@@ -0,0 +1,607 @@
+""" Capture files: streaming recorder for rx buffers.
+    CaptureRecorder appends every buffer straight to disk, either into one appendable .npy
+    (fixed-size header patched with the final length on close) or into rotating .npy chunk files,
+    so memory stays bounded and the cost per buffer is constant however long the capture runs.
+    Samples are stored as interleaved int16 IQ (shape (N, 2), 4 bytes per sample) or complex64/complex128,
+    and a JSON sidecar (capture.json next to capture.npy) records the format and the radar configuration.
+    mode='blocks' compresses fixed-size blocks instead (capture.blk + capture_blocks.npy block index),
+    read back with random access by BlockCapture, which decodes only the blocks asked for in a thread pool.
+"""
+import json
+import lzma
+import mmap
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from timeit import default_timer as timer
+
+import numpy as np
+
+try:
+    import zstandard
+
+    use_zstd = True
+except ImportError:
+    use_zstd = False
+try:
+    import lz4.frame
+
+    use_lz4 = True
+except ImportError:
+    use_lz4 = False
+
+FORMATS = {"iq16": np.int16, "complex64": np.complex64, "complex128": np.complex128}
+
+# per-buffer index written next to the samples (capture_index.npy): first sample offset, host time (s since epoch),
+# rx hardware gains, phaser beam phase difference (degrees) and the cumulative count of buffers lost before this one
+INDEX_DTYPE = np.dtype([("offset", "<i8"), ("nsamples", "<i4"), ("timestamp", "<f8"), ("rxgain0", "<f4"),
+                        ("rxgain1", "<f4"), ("steering", "<f4"), ("dropped", "<i4")])
+
+
+# block index of compressed captures (capture_blocks.npy): position of each compressed block in capture.blk
+# and the range of samples it holds
+BLOCK_DTYPE = np.dtype([("offset", "<i8"), ("nbytes", "<i8"), ("start", "<i8"), ("nsamples", "<i8")])
+
+CODECS = ("zstd", "lz4", "zlib", "lzma")  # preference order of compression="auto"
+
+
+def available_codecs():
+    return [name for name in CODECS if (name != "zstd" or use_zstd) and (name != "lz4" or use_lz4)]
+
+
+def getcodec(name, level=None):
+    """ (compress, decompress) functions of bytes for a codec name, "auto" picks the first installed of CODECS """
+    if name == "auto":
+        name = available_codecs()[0]
+    if name not in available_codecs():
+        raise ValueError("compression must be one of %s (installed: %s)" % (CODECS, available_codecs()))
+    if name == "zstd":
+        level = 3 if level is None else level
+        # zstandard (de)compressor objects are not thread safe, make one per call
+        return (lambda raw: zstandard.ZstdCompressor(level=level).compress(raw),
+                lambda raw: zstandard.ZstdDecompressor().decompress(raw))
+    if name == "lz4":
+        level = 0 if level is None else level
+        return lambda raw: lz4.frame.compress(raw, compression_level=level), lz4.frame.decompress
+    if name == "zlib":
+        level = 1 if level is None else level
+        return lambda raw: zlib.compress(raw, level), zlib.decompress
+    level = 1 if level is None else level
+    return lambda raw: lzma.compress(raw, preset=level), lzma.decompress
+
+
+def shuffle(raw, itemsize):
+    """ group the bytes of each significance together (all low bytes, then all high bytes, ...),
+        the mostly constant high bytes of noise-floor samples then compress much better
+    """
+    return np.frombuffer(raw, dtype=np.uint8).reshape(-1, itemsize).T.tobytes()
+
+
+def unshuffle(raw, itemsize):
+    return np.frombuffer(raw, dtype=np.uint8).reshape(itemsize, -1).T.tobytes()
+
+
+def npyheader(dtype, nsamples, itemshape=()):
+    """ .npy v1.0 header of an array of nsamples items of itemshape.
+        The size is fixed for a dtype (room for a 20 digit length), so the header can be patched in place.
+    """
+    dtype = np.dtype(dtype)
+    descr = np.lib.format.dtype_to_descr(dtype)
+    template = "{'descr': %r, 'fortran_order': False, 'shape': %s, }"
+    shape = "(%d,%s)" % (nsamples, "".join(" %d," % n for n in itemshape))
+    header = template % (descr, shape.replace(",)", ")") if itemshape else shape)
+    longest = len(template % (descr, "(%d,%s)" % (10**20, "".join(" %d," % n for n in itemshape))))
+    preamble = 64 * ((10 + longest + 1 + 63) // 64)
+    header = header.ljust(preamble - 10 - 1) + "\n"
+    return b"\x93NUMPY\x01\x00" + np.uint16(len(header)).tobytes() + header.encode("latin1")
+
+
+def itemshape(dtype):
+    """ stored shape of one IQ sample, int16 samples are (I, Q) pairs """
+    return (2,) if np.dtype(dtype) == np.int16 else ()
+
+
+class CaptureRecorder:
+    """ Append rx buffers to disk with bounded memory.
+        mode: 'npy' one appendable .npy file (readable by np.load / RadarData once closed)
+              'chunks' rotating files path_00000.npy, path_00001.npy, ... of chunksamples each
+              'blocks' blocks of blocksamples compressed with compression ('auto', 'zstd', 'lz4', 'zlib', 'lzma'
+                       at level, None is the codec's fast default) after a byte shuffle, read with BlockCapture
+        dtype: stored sample type, int16 interleaved IQ (default) or complex64/complex128,
+               int16 holds the 12bit Pluto ADC samples (and the sum of both channels) exactly,
+               samples are divided by scale before rounding, readers multiply it back
+        metadata: dict of the capture configuration (samplerate, center_freq, signal_freq, BW, ramp_time_s,
+                  num_steps, rxbuffersize, ...), saved with the format in the JSON sidecar
+        index: also write one INDEX_DTYPE row per buffer to capture_index.npy (see write())
+        flushinterval: seconds between flushes to the OS (fsync=True also forces them to disk)
+        threaded: write from a background thread through a queue of at most maxqueue buffers,
+                  the caller only blocks when the disk falls that far behind
+    """
+
+    def __init__(self, path, mode="npy", dtype=np.int16, scale=1.0, metadata=None, index=True, chunksamples=1024 * 1024 * 16,
+                 compression="auto", level=None, blocksamples=1024 * 64, shuffle=True,
+                 flushinterval=1.0, fsync=False, threaded=False, maxqueue=16):
+        if mode not in ("npy", "chunks", "blocks"):
+            raise ValueError("recorder mode must be 'npy', 'chunks' or 'blocks'")
+        self.path = path
+        self.mode = mode
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in [np.dtype(d) for d in FORMATS.values()]:
+            raise ValueError("recorder dtype must be int16, complex64 or complex128")
+        self.scale = float(scale)
+        self.metadata = dict(metadata or {})
+        self.chunksamples = int(chunksamples)
+        if mode == "blocks":
+            self.compression = available_codecs()[0] if compression == "auto" else compression
+            self.level = level
+            self.compress, _ = getcodec(self.compression, level)
+            self.shuffle = shuffle
+            self.block = np.empty((int(blocksamples),) + itemshape(self.dtype), dtype=self.dtype)
+            self.blockfill = 0
+            self.nblocks = 0
+        self.storedbytes = 0  # bytes written to the sample files
+        self.flushinterval = flushinterval
+        self.fsync = fsync
+        self.files = []  # all files written
+        self.file = None
+        self.filesamples = 0
+        self.nsamples = 0  # total samples written
+        self.queuedsamples = 0  # total samples passed to write(), offset of the next buffer
+        self.nbuffers = 0
+        self.writetime = 0.0  # seconds spent in write calls
+        self.starttime = timer()
+        self.lastflush = self.starttime
+        self.closed = False
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self.indexfile = None
+        self.nindex = 0
+        if index:
+            self.indexfile = open(indexpath(path), "wb")
+            self.indexfile.write(npyheader(INDEX_DTYPE, 0))
+        self.writemetadata()  # written up front too, so an interrupted capture still has its configuration
+        self.openfile()
+        self.threaded = threaded
+        if threaded:
+            self.queue = Queue(maxsize=maxqueue)
+            self.error = None
+            self.thread = threading.Thread(target=self.writeloop, daemon=True)
+            self.thread.start()
+
+    def filename(self, index):
+        if self.mode == "npy":
+            return self.path
+        base = self.path[:-4] if self.path.endswith(".npy") else self.path
+        return "%s_%05d.npy" % (base, index)
+
+    def openfile(self):
+        if self.mode == "blocks":
+            self.file = open(blockdatapath(self.path), "wb")
+            self.blockfile = open(blockspath(self.path), "wb")
+            self.blockfile.write(npyheader(BLOCK_DTYPE, 0))
+            self.files.append(blockdatapath(self.path))
+            self.filesamples = 0
+            return
+        name = self.filename(len(self.files))
+        self.file = open(name, "wb")
+        self.file.write(npyheader(self.dtype, 0, itemshape(self.dtype)))
+        self.files.append(name)
+        self.filesamples = 0
+
+    def writeblock(self):
+        """ compress and append the filled part of the block buffer """
+        if self.blockfill == 0:
+            return
+        raw = memoryview(self.block[:self.blockfill]).cast("B")
+        if self.shuffle:
+            raw = shuffle(raw, self.dtype.itemsize if self.dtype == np.int16 else self.dtype.itemsize // 2)
+        packed = self.compress(raw)
+        row = np.array((self.storedbytes, len(packed), self.filesamples - self.blockfill, self.blockfill), dtype=BLOCK_DTYPE)
+        self.file.write(packed)
+        self.blockfile.write(row.tobytes())
+        self.storedbytes += len(packed)
+        self.nblocks += 1
+        self.blockfill = 0
+
+    def closefile(self):
+        if self.mode == "blocks":
+            self.writeblock()
+            self.blockfile.flush()
+            self.blockfile.seek(0)
+            self.blockfile.write(npyheader(BLOCK_DTYPE, self.nblocks))
+            self.blockfile.close()
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+            self.file.close()
+            self.file = None
+            return
+        # patch the header with the number of samples actually written
+        self.file.flush()
+        self.file.seek(0)
+        self.file.write(npyheader(self.dtype, self.filesamples, itemshape(self.dtype)))
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.file.close()
+        self.file = None
+
+    def writemetadata(self):
+        metadata = dict(self.metadata)
+        metadata.update({
+            "format": [name for name, dtype in FORMATS.items() if np.dtype(dtype) == self.dtype][0],
+            "scale": self.scale,
+            "nsamples": self.nsamples,
+            "mode": self.mode,
+            "files": [os.path.basename(name) for name in self.files],
+            "index": os.path.basename(indexpath(self.path)) if self.indexfile is not None else None,
+        })
+        if self.mode == "blocks":
+            metadata.update({
+                "compression": self.compression,
+                "level": self.level,
+                "shuffle": self.shuffle,
+                "blocksamples": len(self.block),
+                "blocks": os.path.basename(blockspath(self.path)),
+            })
+        with open(metapath(self.path), "w") as file1:
+            json.dump(metadata, file1, indent=1)
+
+    def encode(self, data):
+        """ rx buffer to the stored sample type, a copy for int16 """
+        if self.dtype != np.int16:
+            return np.asarray(data, dtype=self.dtype)
+        data = np.asarray(data)
+        if not np.iscomplexobj(data):
+            data = data.astype(np.complex64)
+        iq = np.ascontiguousarray(data).view(data.real.dtype).reshape(-1, 2)  # interleaved I, Q
+        if self.scale != 1.0:
+            iq = iq / self.scale
+        return np.clip(np.rint(iq), -32768, 32767).astype(np.int16)
+
+    def write(self, data, timestamp=None, rxgain=(np.nan, np.nan), steering=np.nan, dropped=0):
+        """ append one rx buffer, with its index row: host timestamp (time.time() at the call by default),
+            rx gains of both channels, phaser steering (beam phase difference) and cumulative dropped buffers
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        data = self.encode(data)
+        row = None
+        if self.indexfile is not None:
+            row = np.array((self.queuedsamples, len(data), timestamp, rxgain[0], rxgain[1], steering, dropped),
+                           dtype=INDEX_DTYPE)
+        self.queuedsamples += len(data)
+        if self.threaded:
+            if self.error is not None:
+                raise self.error
+            self.queue.put((data.copy() if self.dtype != np.int16 else data, row))  # rx buffers may be reused
+        else:
+            self.writebuffer(data, row)
+
+    def writeloop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            try:
+                self.writebuffer(*item)
+            except Exception as e:
+                self.error = e
+
+    def writebuffer(self, data, row=None):
+        start = timer()
+        if row is not None:
+            self.indexfile.write(row.tobytes())
+            self.nindex += 1
+        data = np.ascontiguousarray(data)
+        while self.mode == "blocks" and len(data) > 0:
+            n = min(len(data), len(self.block) - self.blockfill)
+            self.block[self.blockfill:self.blockfill + n] = data[:n]
+            self.blockfill += n
+            self.filesamples += n
+            self.nsamples += n
+            data = data[n:]
+            if self.blockfill == len(self.block):
+                self.writeblock()
+        while len(data) > 0:
+            n = len(data)
+            if self.mode == "chunks":
+                n = min(n, self.chunksamples - self.filesamples)
+            self.file.write(memoryview(data[:n]).cast("B"))
+            self.storedbytes += data[:n].nbytes
+            self.filesamples += n
+            self.nsamples += n
+            data = data[n:]
+            if self.mode == "chunks" and self.filesamples >= self.chunksamples:
+                self.closefile()
+                self.openfile()
+        self.nbuffers += 1
+        now = timer()
+        self.writetime += now - start
+        if now - self.lastflush >= self.flushinterval:
+            self.flush()
+
+    def flush(self):
+        for file1 in (self.file, self.indexfile, getattr(self, "blockfile", None)):
+            if file1 is not None:
+                file1.flush()
+                if self.fsync:
+                    os.fsync(file1.fileno())
+        self.lastflush = timer()
+
+    def stats(self):
+        """ samples/bytes written, write throughput (MB/s while writing) and average rate (MB/s since start) """
+        elapsed = timer() - self.starttime
+        nbytes = self.nsamples * samplesize(self.dtype)
+        return {
+            "samples": self.nsamples,
+            "buffers": self.nbuffers,
+            "bytes": nbytes,
+            "files": len(self.files),
+            "stored_bytes": self.storedbytes,
+            "ratio": nbytes / self.storedbytes if self.storedbytes > 0 else 1.0,
+            "elapsed": elapsed,
+            "write_MBps": nbytes / self.writetime / 1e6 if self.writetime > 0 else 0.0,
+            "average_MBps": nbytes / elapsed / 1e6 if elapsed > 0 else 0.0,
+        }
+
+    def report(self):
+        st = self.stats()
+        print("Recorded %d samples (%0.1f MB, %0.1f MB stored) in %d buffers, %d file(s): write %0.1f MB/s, average %0.2f MB/s"
+              % (st["samples"], st["bytes"] / 1e6, st["stored_bytes"] / 1e6, st["buffers"], st["files"],
+                 st["write_MBps"], st["average_MBps"]))
+        return st
+
+    def close(self):
+        if self.closed:
+            return self.stats()
+        if self.threaded:
+            self.queue.put(None)
+            self.thread.join()
+        self.closefile()
+        if self.mode == "chunks" and self.filesamples == 0 and len(self.files) > 1:
+            os.remove(self.files.pop())  # empty chunk opened after the last rotation
+        if self.indexfile is not None:
+            self.indexfile.flush()
+            self.indexfile.seek(0)
+            self.indexfile.write(npyheader(INDEX_DTYPE, self.nindex))
+            self.indexfile.close()
+        self.writemetadata()
+        self.closed = True
+        return self.stats()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def samplesize(dtype):
+    """ bytes per IQ sample """
+    dtype = np.dtype(dtype)
+    return 2 * dtype.itemsize if dtype == np.int16 else dtype.itemsize
+
+
+def metapath(path):
+    """ JSON sidecar of a capture: data/capture.npy -> data/capture.json """
+    base = path[:-4] if path.endswith(".npy") else path
+    return base + ".json"
+
+
+def blockdatapath(path):
+    """ compressed blocks of a capture: data/capture.npy -> data/capture.blk """
+    base = path[:-4] if path.endswith(".npy") else path
+    return base + ".blk"
+
+
+def blockspath(path):
+    """ block index of a compressed capture: data/capture.npy -> data/capture_blocks.npy """
+    base = path[:-4] if path.endswith(".npy") else path
+    return base + "_blocks.npy"
+
+
+def indexpath(path):
+    """ per-buffer index of a capture: data/capture.npy -> data/capture_index.npy """
+    base = path[:-4] if path.endswith(".npy") else path
+    return base + "_index.npy"
+
+
+def loadindex(path):
+    """ INDEX_DTYPE rows of a capture, None for captures recorded without an index """
+    if not os.path.exists(indexpath(path)):
+        return None
+    return np.load(indexpath(path), mmap_mode="r")
+
+
+def readmetadata(path):
+    """ capture configuration from the JSON sidecar, {} for older captures without one """
+    try:
+        with open(metapath(path), "r") as file1:
+            return json.load(file1)
+    except FileNotFoundError:
+        return {}
+
+
+def tocomplex(data, scale=1.0, cdtype=np.complex128):
+    """ stored samples to complex: int16 (N, 2) interleaved IQ is converted and scaled, complex data only cast """
+    if data.dtype != np.int16:
+        return np.asarray(data).astype(cdtype, copy=False)
+    rdtype = np.empty(0, dtype=cdtype).real.dtype
+    out = np.asarray(data).astype(rdtype)  # (N, 2) I, Q pairs are the memory layout of complex
+    if scale != 1.0:
+        out *= scale
+    return out.view(cdtype).reshape(-1)
+
+
+class BlockCapture:
+    """ Random access to a block-compressed capture, sliced like the array of stored samples.
+        Only the blocks covering a slice are decompressed, in parallel in a pool of workers threads
+        (zlib, lzma, zstd and lz4 release the GIL), and the last maxcache decoded blocks are kept.
+    """
+
+    def __init__(self, path, maxcache=64, workers=None):
+        self.metadata = readmetadata(path)
+        self.dtype = np.dtype(FORMATS[self.metadata["format"]])
+        self.itemshape = itemshape(self.dtype)
+        self.blocks = np.load(blockspath(path))
+        self.starts = self.blocks["start"]
+        self.shape = (int(self.blocks["nsamples"].sum()),) + self.itemshape
+        self.ndim = len(self.shape)
+        self.shuffle = self.metadata.get("shuffle", False)
+        self.itemsize = self.dtype.itemsize if self.dtype == np.int16 else self.dtype.itemsize // 2
+        _, self.decompress = getcodec(self.metadata["compression"])
+        self.file = open(blockdatapath(path), "rb")
+        self.raw = b""  # an empty capture cannot be memory-mapped
+        if os.path.getsize(blockdatapath(path)) > 0:
+            self.raw = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.maxcache = maxcache
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def decodeblock(self, k):
+        row = self.blocks[k]
+        raw = self.decompress(self.raw[int(row["offset"]):int(row["offset"]) + int(row["nbytes"])])
+        if self.shuffle:
+            raw = unshuffle(raw, self.itemsize)
+        return np.frombuffer(raw, dtype=self.dtype).reshape((-1,) + self.itemshape)
+
+    def getblock(self, k):
+        with self.lock:
+            if k in self.cache:
+                self.cache.move_to_end(k)
+                return self.cache[k]
+        block = self.decodeblock(k)
+        with self.lock:
+            self.cache[k] = block
+            if len(self.cache) > self.maxcache:
+                self.cache.popitem(last=False)
+        return block
+
+    def blockrange(self, start, stop):
+        first = int(np.searchsorted(self.starts, start, side="right")) - 1
+        last = int(np.searchsorted(self.starts, stop - 1, side="right")) - 1
+        return range(max(first, 0), last + 1)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            key = slice(key, key + 1) if key >= 0 else slice(len(self) + key, len(self) + key + 1)
+            return self[key][0]
+        start, stop, step = key.indices(len(self))
+        if stop <= start:
+            return np.empty((0,) + self.itemshape, dtype=self.dtype)
+        ks = self.blockrange(start, stop)
+        blocks = list(self.pool.map(self.getblock, ks)) if len(ks) > 1 else [self.getblock(ks[0])]
+        out = np.empty((stop - start,) + self.itemshape, dtype=self.dtype)
+        for k, block in zip(ks, blocks):
+            a = max(start, int(self.starts[k]))
+            b = min(stop, int(self.starts[k]) + len(block))
+            out[a - start:b - start] = block[a - int(self.starts[k]):b - int(self.starts[k])]
+        return out[::step] if step != 1 else out
+
+    def prefetch(self, start, stop):
+        """ decode the blocks of samples start:stop into the cache in the background """
+        for k in self.blockrange(start, min(stop, len(self))):
+            if k not in self.cache:
+                self.pool.submit(self.getblock, k)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        if isinstance(self.raw, mmap.mmap):
+            self.raw.close()
+        self.file.close()
+
+
+class ChunkedCapture:
+    """ The chunk files of a capture (path_00000.npy, ...) sliced like one array of stored samples.
+        Each chunk stays memory-mapped: a slice inside one chunk is a view of it, a slice across chunks
+        copies only the samples asked for, so replaying hours of recording keeps memory flat.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.dtype = chunks[0].dtype
+        self.itemshape = chunks[0].shape[1:]
+        self.strides = chunks[0].strides
+        self.starts = np.cumsum([0] + [len(chunk) for chunk in chunks])
+        self.shape = (int(self.starts[-1]),) + self.itemshape
+        self.ndim = len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            key = slice(key, key + 1) if key >= 0 else slice(len(self) + key, len(self) + key + 1)
+            return self[key][0]
+        start, stop, step = key.indices(len(self))
+        if stop <= start:
+            return np.empty((0,) + self.itemshape, dtype=self.dtype)
+        first = int(np.searchsorted(self.starts, start, side="right")) - 1
+        last = int(np.searchsorted(self.starts, stop - 1, side="right")) - 1
+        parts = []
+        for k in range(first, last + 1):
+            a = max(start, int(self.starts[k]))
+            a = start + -(-(a - start) // step) * step  # first index of the slice in this chunk
+            b = min(stop, int(self.starts[k + 1]))
+            if a < b:
+                parts.append(self.chunks[k][a - int(self.starts[k]):b - int(self.starts[k]):step])
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def __array__(self, dtype=None):
+        # the whole capture in memory, only for analysis scripts that ask for it
+        data = self[:]
+        return data if dtype is None else data.astype(dtype)
+
+
+def loadcapture(path, mmap_mode="r"):
+    """ Load the stored samples of a capture: a .npy file, or chunk files path_00000.npy, ... as a ChunkedCapture
+        int16 captures come back as (N, 2) IQ pairs, see tocomplex()
+        block-compressed captures come back as a BlockCapture, sliced like an array
+    """
+    if os.path.exists(blockspath(path)) and readmetadata(path).get("compression"):
+        return BlockCapture(path)
+    if os.path.exists(path):
+        return np.load(path, mmap_mode=mmap_mode)
+    base = path[:-4] if path.endswith(".npy") else path
+    chunks = []
+    index = 0
+    while os.path.exists("%s_%05d.npy" % (base, index)):
+        chunks.append(np.load("%s_%05d.npy" % (base, index), mmap_mode=mmap_mode))
+        index += 1
+    if not chunks:
+        raise FileNotFoundError(path)
+    return ChunkedCapture(chunks) if len(chunks) > 1 else chunks[0]
+
+
+def convertcapture(inpath, outpath, metadata=None, dtype=np.int16, scale=1.0, stepsamples=1024 * 1024, **kwargs):
+    """ Rewrite an existing capture (e.g. an old complex128 .npy) in another format, streamed block by block.
+        metadata adds the radar configuration the old file does not carry,
+        kwargs go to CaptureRecorder, e.g. mode='blocks', compression='zstd' to compress it.
+    """
+    data = loadcapture(inpath)
+    meta = readmetadata(inpath)
+    inscale = meta.get("scale", 1.0)
+    meta.update(metadata or {})
+    index = loadindex(inpath)
+    for key in ("format", "scale", "nsamples", "mode", "files", "index", "compression", "level", "shuffle",
+                "blocksamples", "blocks"):
+        meta.pop(key, None)  # describe the input file, the recorder writes its own
+    with CaptureRecorder(outpath, dtype=dtype, scale=scale, metadata=meta, index=False, **kwargs) as recorder:
+        for start in range(0, len(data), stepsamples):
+            recorder.write(tocomplex(data[start:start + stepsamples], inscale))
+    if index is not None:  # offsets count samples, the same in every format
+        np.save(indexpath(outpath), np.asarray(index))
+        meta = readmetadata(outpath)
+        meta["index"] = os.path.basename(indexpath(outpath))
+        with open(metapath(outpath), "w") as file1:
+            json.dump(meta, file1, indent=1)
+    return recorder.report()
@@ -0,0 +1,80 @@
+#Compare capture compression codecs: compression ratio against write and decode throughput
+#python capturebenchmark.py --capture ./data/radardata5s-1101fast3move.npy --codecs zstd lz4 zlib lzma
+import os
+import tempfile
+import numpy as np
+from timeit import default_timer as timer
+
+import capture
+
+def synthcapture(nsamples=1024*16*15*8, fs=0.6e6, signal_freq=100e3, seed=0):
+    #beat tones over a 12bit noise floor, like the radar captures
+    rng = np.random.default_rng(seed)
+    t = np.arange(nsamples) / fs
+    x = 200 * np.exp(2j * np.pi * (signal_freq + 2e3) * t) + 50 * np.exp(2j * np.pi * (signal_freq + 7e3) * t)
+    x += 8 * (rng.standard_normal(nsamples) + 1j * rng.standard_normal(nsamples))
+    return np.round(x)
+
+def decodeall(path, workers, framesize):
+    #read and convert every frame as RadarData does, a fresh reader so nothing is cached
+    data = capture.loadcapture(path)
+    if isinstance(data, capture.BlockCapture):
+        data.close()
+        data = capture.BlockCapture(path, workers=workers)
+    start = timer()
+    for index in range(0, len(data), framesize):
+        capture.tocomplex(data[index:index + framesize], cdtype=np.complex64)
+    elapsed = timer() - start
+    if hasattr(data, "close"):
+        data.close()
+    return elapsed
+
+def runbenchmark(x, codecs, blocksamples=1024*64, workers=(1, -1), framesize=1024*16*15, shuffle=True):
+    nbytes = len(x) * capture.samplesize(np.int16)
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for codec in ["none"] + codecs:
+            if codec != "none" and codec not in capture.available_codecs():
+                print("%s not installed, skipping" % codec)
+                continue
+            path = os.path.join(folder, "%s.npy" % codec)
+            if codec == "none":
+                recorder = capture.CaptureRecorder(path, index=False)
+            else:
+                recorder = capture.CaptureRecorder(path, mode="blocks", compression=codec, blocksamples=blocksamples,
+                                                   shuffle=shuffle, index=False)
+            for index in range(0, len(x), framesize):
+                recorder.write(x[index:index + framesize])
+            st = recorder.close()
+            decode = [nbytes / decodeall(path, w if w > 0 else None, framesize) / 1e6 for w in workers]
+            results[codec] = (st["ratio"], st["write_MBps"], decode)
+    print("Capture compression, %0.1f MB int16 IQ, %d sample blocks, shuffle %s" % (nbytes / 1e6, blocksamples, shuffle))
+    print("%-8s%8s%14s" % ("codec", "ratio", "write MB/s") + "".join("%16s" % ("decode %s" % (w if w > 0 else "all")) for w in workers))
+    for codec, (ratio, write, decode) in results.items():
+        print("%-8s%8.2f%14.1f" % (codec, ratio, write) + "".join("%11.1f MB/s" % d for d in decode))
+    return results
+
+def main():
+    args = parser.parse_args()
+    if args.capture:
+        data = capture.loadcapture(args.capture)
+        x = capture.tocomplex(data[:], capture.readmetadata(args.capture).get("scale", 1.0))
+    else:
+        x = synthcapture()
+    runbenchmark(x, args.codecs, args.blocksamples, args.workers, shuffle=not args.noshuffle)
+
+import argparse
+parser = argparse.ArgumentParser(description='Capture compression benchmark')
+parser.add_argument('--capture', default=None, type=str,
+                    help='capture file to compress, a synthetic radar capture if not given')
+parser.add_argument('--codecs', default=list(capture.CODECS), nargs='+',
+                    help='codecs to compare: zstd, lz4, zlib, lzma')
+parser.add_argument('--blocksamples', default=1024*64, type=int,
+                    help='samples per compressed block')
+parser.add_argument('--workers', default=[1, -1], type=int, nargs='+',
+                    help='decoder threads to compare, -1 uses all cores')
+parser.add_argument('--noshuffle', action='store_true',
+                    help='compress without the byte shuffle')
+
+if __name__ == '__main__':
+    main()
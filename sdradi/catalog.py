@@ -0,0 +1,240 @@
+#Capture catalog: per-frame summaries of every capture in a folder, built once and queried in milliseconds
+#python catalog.py scan ./data
+#python catalog.py query ./data --where "peak_range<5" "snr>15"
+#Each capture gets a capture_summary.npy sidecar (SUMMARY_DTYPE rows, one per frame), data/catalog.json lists the
+#captures with the size and modification time they were summarised at, so a rescan only processes new or changed files.
+import glob
+import json
+import os
+import re
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from timeit import default_timer as timer
+
+import fftbackend
+from capture import loadcapture, loadindex, readmetadata, tocomplex
+from processing import spectrumprocessor, getdtypes
+
+SUMMARY_DTYPE = np.dtype([("frame", "<i4"), ("time", "<f8"), ("peak_freq", "<f4"), ("peak_power", "<f4"),
+                          ("noise_floor", "<f4"), ("snr", "<f4"), ("range_bin", "<i4"), ("peak_range", "<f4")])
+CATALOGFILE = "catalog.json"
+#.npy files written next to captures that are not captures themselves
+SIDECARS = re.compile(r".*(_index|_blocks|_summary|_spectrum|_spectrogram|_rd|_\d{5})\.npy$")
+
+def summarypath(path):
+    base = path[:-4] if path.endswith(".npy") else path
+    return base + "_summary.npy"
+
+def findcaptures(folder):
+    """ capture files in folder: IQ .npy files (complex or int16 pairs) and block-compressed captures """
+    captures = set()
+    for name in glob.glob(os.path.join(folder, "*.json")):
+        metadata = readmetadata(name[:-5] + ".npy")
+        if "format" in metadata and name != os.path.join(folder, CATALOGFILE):
+            captures.add(name[:-5] + ".npy")
+    for name in glob.glob(os.path.join(folder, "*.npy")):
+        if SIDECARS.match(name) or name in captures:
+            continue
+        try:
+            data = np.load(name, mmap_mode="r")
+        except Exception:
+            continue
+        if (data.ndim == 1 and np.iscomplexobj(data)) or (data.ndim == 2 and data.dtype == np.int16 and data.shape[1] == 2):
+            captures.add(name)
+    return sorted(captures)
+
+def filestate(path):
+    """ (size, mtime) of all files holding the samples of a capture, changes when it is rewritten """
+    metadata = readmetadata(path)
+    folder = os.path.dirname(path)
+    names = [os.path.join(folder, name) for name in metadata.get("files", [])] or [path]
+    stats = [os.stat(name) for name in names if os.path.exists(name)]
+    return [sum(st.st_size for st in stats), max(st.st_mtime for st in stats)]
+
+def summarize(path, framesize=None, chunkframes=16):
+    """ SUMMARY_DTYPE row per frame: spectrum peak frequency/power, median noise floor, SNR,
+        strongest bin of the chirp-averaged range profile and its range in m
+    """
+    metadata = readmetadata(path)
+    data = loadcapture(path)
+    scale = metadata.get("scale", 1.0)
+    fs = metadata.get("samplerate", 0.6e6)
+    framesize = framesize or metadata.get("rxbuffersize", 1024*16)
+    BW = metadata.get("BW", 500e6)
+    ramp_time_s = metadata.get("ramp_time_s", 1e-3)
+    signal_freq = metadata.get("signal_freq", 100e3)
+    slope = BW / ramp_time_s
+    n_s = int(ramp_time_s * fs) #ADC samples per chirp
+    n_c = int(framesize / n_s) - 1
+    nframes = len(data) // framesize
+    cdtype, rdtype = getdtypes()
+    win, norm, _ = spectrumprocessor.getplan(framesize, fs)
+    freq = fftbackend.fftfreq(framesize, 1 / fs) #FFT bin order, the spectra below are not shifted
+    rangebins = np.arange(n_s // 2) * fs / n_s
+    ranges = (rangebins - signal_freq) * 3e8 / (4 * slope) #same distance axis as the spectrum plots
+    index = loadindex(path)
+    summary = np.zeros(nframes, dtype=SUMMARY_DTYPE)
+    summary["frame"] = np.arange(nframes)
+    if index is not None and len(index) > 0:
+        offsets = np.arange(nframes) * framesize
+        rows = np.maximum(np.searchsorted(index["offset"], offsets, side="right") - 1, 0)
+        summary["time"] = index["timestamp"][rows] - index["timestamp"][0] + (offsets - index["offset"][rows]) / fs
+    else:
+        summary["time"] = np.arange(nframes) * framesize / fs
+    for start in range(0, nframes, chunkframes):
+        stop = min(start + chunkframes, nframes)
+        frames = tocomplex(data[start*framesize:stop*framesize], scale, cdtype).reshape(-1, framesize)
+        s_mag = np.abs(fftbackend.fft(frames * win, axis=-1))
+        s_mag /= norm
+        np.maximum(s_mag, 10 ** (-15) / spectrumprocessor.fullscale, out=s_mag)
+        s_dbfs = 20 * np.log10(s_mag)
+        peak = np.argmax(s_dbfs, axis=-1)
+        rows = np.arange(stop - start)
+        summary["peak_freq"][start:stop] = freq[peak]
+        summary["peak_power"][start:stop] = s_dbfs[rows, peak]
+        summary["noise_floor"][start:stop] = np.median(s_dbfs, axis=-1)
+        table = frames[:, :n_c*n_s].reshape(-1, n_c, n_s)
+        profile = np.mean(np.abs(fftbackend.fft(table, axis=-1)[..., :n_s // 2]) ** 2, axis=1)
+        rangebin = np.argmax(profile, axis=-1)
+        summary["range_bin"][start:stop] = rangebin
+        summary["peak_range"][start:stop] = ranges[rangebin]
+    summary["snr"] = summary["peak_power"] - summary["noise_floor"]
+    if hasattr(data, "close"):
+        data.close()
+    return summary
+
+def scanone(path, framesize):
+    summary = summarize(path, framesize)
+    np.save(summarypath(path), summary)
+    return path, len(summary)
+
+class Catalog:
+    """ Per-frame summaries of all captures in folder. scan() summarises new or changed captures,
+        query() filters the frames of all captures at once.
+    """
+    def __init__(self, folder="./data"):
+        self.folder = folder
+        self.catalogfile = os.path.join(folder, CATALOGFILE)
+        self.entries = {}
+        if os.path.exists(self.catalogfile):
+            with open(self.catalogfile, "r") as file1:
+                self.entries = json.load(file1)
+        self.table = None #all summaries with a capture column, built on the first query
+
+    def save(self):
+        with open(self.catalogfile, "w") as file1:
+            json.dump(self.entries, file1, indent=1)
+
+    def scan(self, framesize=None, workers=None, force=False):
+        """ summarise captures not in the catalog or changed since, drop deleted ones; returns the names scanned """
+        start = timer()
+        captures = findcaptures(self.folder)
+        names = [os.path.basename(path) for path in captures]
+        for name in list(self.entries):
+            if name not in names:
+                del self.entries[name]
+        todo = []
+        for path, name in zip(captures, names):
+            entry = self.entries.get(name)
+            if force or entry is None or entry["state"] != filestate(path) or not os.path.exists(summarypath(path)) \
+                    or (framesize and entry["framesize"] != framesize):
+                todo.append(path)
+        if todo:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for path, nframes in pool.map(scanone, todo, [framesize] * len(todo)):
+                    self.entries[os.path.basename(path)] = {
+                        "state": filestate(path),
+                        "frames": nframes,
+                        "framesize": framesize or readmetadata(path).get("rxbuffersize", 1024*16),
+                        "summary": os.path.basename(summarypath(path)),
+                    }
+                    print("Summarised %s: %d frames" % (path, nframes))
+        self.save()
+        self.table = None
+        print("Catalog %s: %d captures, %d scanned in %0.1fs" % (self.folder, len(self.entries), len(todo), timer() - start))
+        return todo
+
+    def gettable(self):
+        if self.table is None:
+            names = sorted(self.entries)
+            summaries = [np.load(os.path.join(self.folder, self.entries[name]["summary"])) for name in names]
+            self.names = np.array(names)
+            self.table = np.concatenate(summaries) if summaries else np.zeros(0, dtype=SUMMARY_DTYPE)
+            self.capture = np.repeat(np.arange(len(names)), [len(s) for s in summaries])
+        return self.table
+
+    def query(self, **conditions):
+        """ frames of all captures within the given field ranges, e.g. query(peak_range=(0, 5), snr=(15, None)).
+            A bound is a value (inclusive) or (value, inclusive), e.g. snr=((15, False), None) for snr>15.
+            Returns (capture names, summary rows).
+        """
+        table = self.gettable()
+        mask = np.ones(len(table), dtype=bool)
+        for field, (low, high) in conditions.items():
+            if low is not None:
+                value, inclusive = _bound(low)
+                mask &= table[field] >= value if inclusive else table[field] > value
+            if high is not None:
+                value, inclusive = _bound(high)
+                mask &= table[field] <= value if inclusive else table[field] < value
+        return self.names[self.capture[mask]], table[mask]
+
+def _bound(bound):
+    """ (value, inclusive) of a query bound """
+    return (float(bound[0]), bool(bound[1])) if isinstance(bound, tuple) else (float(bound), True)
+
+def _tighter(old, new, upper):
+    # the stricter of two (value, inclusive) bounds, both must hold
+    if old is None or new[0] != old[0]:
+        return new if old is None or (new[0] < old[0]) == upper else old
+    return (new[0], new[1] and old[1])
+
+def parsewhere(expressions):
+    """ ["peak_range<5", "snr>=15"] -> {"peak_range": (None, (5.0, False)), "snr": ((15.0, True), None)} """
+    conditions = {}
+    for expression in expressions:
+        match = re.match(r"\s*(\w+)\s*(<=|>=|<|>|=)\s*([-+.\w]+)\s*$", expression)
+        if match is None or match.group(1) not in SUMMARY_DTYPE.names:
+            raise ValueError("condition must be <field><op><value> with a field of %s" % (SUMMARY_DTYPE.names,))
+        field, op, value = match.group(1), match.group(2), float(match.group(3))
+        low, high = conditions.get(field, (None, None))
+        if op in ("<", "<=", "="):
+            high = _tighter(high, (value, op != "<"), upper=True)
+        if op in (">", ">=", "="):
+            low = _tighter(low, (value, op != ">"), upper=False)
+        conditions[field] = (low, high)
+    return conditions
+
+def main():
+    args = parser.parse_args()
+    catalog = Catalog(args.folder)
+    if args.command == "scan":
+        catalog.scan(args.framesize, args.workers, args.force)
+    else:
+        start = timer()
+        names, rows = catalog.query(**parsewhere(args.where))
+        elapsed = timer() - start
+        for name, row in list(zip(names, rows))[:args.limit]:
+            print("%s frame %d t=%0.2fs peak %0.1fkHz %0.1fdBFS snr %0.1fdB range %0.2fm" % (
+                name, row["frame"], row["time"], row["peak_freq"] / 1e3, row["peak_power"], row["snr"], row["peak_range"]))
+        print("%d frames in %d captures match, query %0.1f ms" % (len(rows), len(set(names)), elapsed * 1e3))
+
+import argparse
+parser = argparse.ArgumentParser(description='Capture catalog')
+parser.add_argument('command', choices=['scan', 'query'],
+                    help='scan: summarise new/changed captures, query: find frames')
+parser.add_argument('folder', nargs='?', default='./data', type=str,
+                    help='capture folder')
+parser.add_argument('--where', default=[], nargs='*',
+                    help='conditions like "peak_range<5" "snr>15", fields: %s' % ", ".join(SUMMARY_DTYPE.names))
+parser.add_argument('--framesize', default=None, type=int,
+                    help='samples per summarised frame, rxbuffersize of each capture by default')
+parser.add_argument('--workers', default=None, type=int,
+                    help='worker processes for the scan, all cores by default')
+parser.add_argument('--force', action='store_true',
+                    help='rescan every capture')
+parser.add_argument('--limit', default=20, type=int,
+                    help='matching frames to print')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+""" FFT backend layer for all spectral code.
+    numpy: np.fft (single threaded, numpy<2 upcasts complex64 to complex128)
+    scipy: scipy.fft with workers threads, keeps single precision
+    pyfftw: pyfftw scipy_fft interface with threads and saved plans (wisdom), when installed
+    Select with setbackend(), or for every script at once with the RADAR_FFT_BACKEND / RADAR_FFT_WORKERS
+    environment variables (read at import).
+"""
+import os
+import pickle
+import warnings
+
+import numpy as np
+from scipy import fft as sfft
+
+try:
+    import pyfftw
+    import pyfftw.interfaces.scipy_fft as fftw_fft
+
+    use_pyfftw = True
+except ImportError:
+    use_pyfftw = False
+
+BACKENDS = ("numpy", "scipy", "pyfftw")
+WISDOMFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fftw_wisdom.pkl")
+
+backend = "scipy"
+workers = os.cpu_count() or 1
+wisdomfile = WISDOMFILE
+
+
+def setbackend(name="scipy", nworkers=None, wisdom=None):
+    """ Select the FFT backend. nworkers=None or -1 uses all cores (scipy/pyfftw only).
+        pyfftw falls back to scipy when not installed, and loads saved wisdom from wisdom (file path).
+    """
+    global backend, workers, wisdomfile
+    if name not in BACKENDS:
+        raise ValueError("FFT backend must be one of %s" % (BACKENDS,))
+    if name == "pyfftw" and not use_pyfftw:
+        warnings.warn("pyfftw not installed, using scipy FFT backend")
+        name = "scipy"
+    backend = name
+    if nworkers is None or nworkers < 1:
+        nworkers = os.cpu_count() or 1
+    workers = int(nworkers)
+    if wisdom is not None:
+        wisdomfile = wisdom
+    if backend == "pyfftw":
+        pyfftw.interfaces.cache.enable()  # keep FFTW plans between calls
+        pyfftw.interfaces.cache.set_keepalive_time(60)
+        loadwisdom(wisdomfile)
+    return backend
+
+
+def loadwisdom(filename=None):
+    """ Load saved FFTW plans, returns False if no file or no pyfftw """
+    if not use_pyfftw:
+        return False
+    try:
+        with open(filename or wisdomfile, "rb") as file1:
+            pyfftw.import_wisdom(pickle.load(file1))
+    except Exception:
+        return False
+    return True
+
+
+def savewisdom(filename=None):
+    """ Save the FFTW plans measured so far, so later runs skip planning """
+    if not use_pyfftw:
+        return False
+    with open(filename or wisdomfile, "wb") as file1:
+        pickle.dump(pyfftw.export_wisdom(), file1)
+    return True
+
+
+def _module():
+    if backend == "pyfftw":
+        return fftw_fft, {"workers": workers, "planner_effort": "FFTW_MEASURE"}
+    if backend == "scipy":
+        return sfft, {"workers": workers}
+    return np.fft, {}
+
+
+def fft(x, n=None, axis=-1):
+    mod, kwargs = _module()
+    return mod.fft(x, n=n, axis=axis, **kwargs)
+
+
+def ifft(x, n=None, axis=-1):
+    mod, kwargs = _module()
+    return mod.ifft(x, n=n, axis=axis, **kwargs)
+
+
+def rfft(x, n=None, axis=-1):
+    mod, kwargs = _module()
+    return mod.rfft(x, n=n, axis=axis, **kwargs)
+
+
+def fft2(x, s=None, axes=(-2, -1)):
+    mod, kwargs = _module()
+    return mod.fft2(x, s=s, axes=axes, **kwargs)
+
+
+def ifft2(x, s=None, axes=(-2, -1)):
+    mod, kwargs = _module()
+    return mod.ifft2(x, s=s, axes=axes, **kwargs)
+
+
+# index helpers do no transform work, same for every backend
+fftshift = sfft.fftshift
+ifftshift = sfft.ifftshift
+fftfreq = sfft.fftfreq
+rfftfreq = sfft.rfftfreq
+
+
+if os.environ.get("RADAR_FFT_BACKEND") or os.environ.get("RADAR_FFT_WORKERS"):
+    setbackend(os.environ.get("RADAR_FFT_BACKEND", backend), int(os.environ.get("RADAR_FFT_WORKERS", "-1")))
@@ -0,0 +1,66 @@
+#Compare the FFT backends in fftbackend.py at our frame sizes
+#python fftbenchmark.py --backends numpy scipy pyfftw --precision single
+import numpy as np
+from timeit import default_timer as timer
+
+import fftbackend
+
+#1024: phaser buffers, 16384: RADAR_FFT_Waterfall, 245760: pyqt6appwdevice frame (1024*16*15), 26x600: range-Doppler table
+SIZES = [(1024,), (16384,), (245760,), (26, 600)]
+
+def timefft(x, repeat=20):
+    if x.ndim == 2:
+        transform = fftbackend.fft2
+    else:
+        transform = fftbackend.fft
+    transform(x) #warm up, plans are created here for pyfftw
+    times = []
+    for r in range(repeat):
+        start = timer()
+        transform(x)
+        times.append(timer() - start)
+    return np.median(times)
+
+def runbenchmark(backends, workers=-1, precision="double", repeat=20):
+    cdtype = np.complex64 if precision == "single" else np.complex128
+    rng = np.random.default_rng(0)
+    results = {}
+    for backend in backends:
+        if backend == "pyfftw" and not fftbackend.use_pyfftw:
+            print("pyfftw not installed, skipping")
+            continue
+        fftbackend.setbackend(backend, workers)
+        for size in SIZES:
+            x = (rng.standard_normal(size) + 1j * rng.standard_normal(size)).astype(cdtype)
+            results[(backend, size)] = timefft(x, repeat)
+        if backend == "pyfftw":
+            fftbackend.savewisdom()
+    print("FFT benchmark, %s precision, %d workers" % (precision, fftbackend.workers))
+    print("%-10s" % "size" + "".join("%14s" % backend for backend in backends))
+    for size in SIZES:
+        row = "%-10s" % "x".join(str(n) for n in size)
+        for backend in backends:
+            if (backend, size) in results:
+                row += "%11.3f ms" % (results[(backend, size)] * 1e3)
+            else:
+                row += "%14s" % "-"
+        print(row)
+    return results
+
+def main():
+    args = parser.parse_args()
+    runbenchmark(args.backends, args.workers, args.precision, args.repeat)
+
+import argparse
+parser = argparse.ArgumentParser(description='FFT backend benchmark')
+parser.add_argument('--backends', default=["numpy", "scipy", "pyfftw"], nargs='+',
+                    help='FFT backends to compare: numpy, scipy, pyfftw')
+parser.add_argument('--workers', default=-1, type=int,
+                    help='FFT threads for scipy/pyfftw, -1 uses all cores')
+parser.add_argument('--precision', default="double", type=str,
+                    help='single (complex64) or double (complex128)')
+parser.add_argument('--repeat', default=20, type=int,
+                    help='timed runs per size')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,394 @@
+""" IQ multiplexer: one daemon owns the Pluto/phaser (RadarDevice) and publishes every buffer into a shared memory
+    ring, any number of local processes (GUI, recorder, detectors) read the frames from there without copies.
+    Ring layout (multiprocessing.shared_memory, default name sdradi_iq): int64 header, then per slot the sequence
+    number of the frame it holds (-1 while being written), its length and host time, then the frame slots
+    (nslots, nchannels, framesize) complex64. A frame stays valid until the daemon wraps around to its slot,
+    IQClient.valid(sequence) tells whether a frame used in place was overwritten meanwhile.
+    Config changes (rx gain, steering, recording) go through a JSON-lines control socket on localhost.
+    python iqmux.py --sdrurl ip:phaser.local:50901 --phaserurl ip:phaser.local  (sim:realtime/sim: simulated)
+    python iqmux.py --client --seconds 5
+    python iqmux.py --command '{"cmd": "setsteering", "phase": 10}'
+"""
+import json
+import socket
+import socketserver
+import threading
+import time
+from multiprocessing import shared_memory
+from timeit import default_timer as timer
+
+import numpy as np
+
+DEFAULT_NAME = "sdradi_iq"
+DEFAULT_PORT = 50990
+MAGIC = 0x73647271  # "sdrq"
+# header fields (int64)
+H_MAGIC, H_NSLOTS, H_NCHANNELS, H_FRAMESIZE, H_SEQUENCE, H_RUNNING, H_PORT = range(7)
+HEADERSIZE = 16
+DTYPE = np.complex64
+
+
+def ringlayout(nslots, nchannels, framesize):
+    """ byte offsets of the slot sequence numbers, lengths, times and frames, and the total size """
+    seqoffset = HEADERSIZE * 8
+    lenoffset = seqoffset + nslots * 8
+    timeoffset = lenoffset + nslots * 8
+    dataoffset = -(-(timeoffset + nslots * 8) // 64) * 64  # frames cache line aligned
+    size = dataoffset + nslots * nchannels * framesize * np.dtype(DTYPE).itemsize
+    return seqoffset, lenoffset, timeoffset, dataoffset, size
+
+class IQRing:
+    """ numpy views of a ring in shared memory (created by the daemon, attached by clients) """
+
+    def __init__(self, shm, nslots, nchannels, framesize):
+        self.shm = shm
+        self.nslots, self.nchannels, self.framesize = nslots, nchannels, framesize
+        seqoffset, lenoffset, timeoffset, dataoffset, size = ringlayout(nslots, nchannels, framesize)
+        self.header = np.ndarray(HEADERSIZE, dtype=np.int64, buffer=shm.buf)
+        self.slotseq = np.ndarray(nslots, dtype=np.int64, buffer=shm.buf, offset=seqoffset)
+        self.slotlen = np.ndarray(nslots, dtype=np.int64, buffer=shm.buf, offset=lenoffset)
+        self.slottime = np.ndarray(nslots, dtype=np.float64, buffer=shm.buf, offset=timeoffset)
+        self.slots = np.ndarray((nslots, nchannels, framesize), dtype=DTYPE, buffer=shm.buf, offset=dataoffset)
+
+    @classmethod
+    def create(cls, name, nslots, nchannels, framesize):
+        try:  # left over by a daemon that was killed
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        size = ringlayout(nslots, nchannels, framesize)[-1]
+        ring = cls(shared_memory.SharedMemory(name=name, create=True, size=size), nslots, nchannels, framesize)
+        ring.header[:] = 0
+        ring.header[[H_MAGIC, H_NSLOTS, H_NCHANNELS, H_FRAMESIZE]] = (MAGIC, nslots, nchannels, framesize)
+        ring.slotseq[:] = -1
+        return ring
+
+    @classmethod
+    def attach(cls, name):
+        shm = shared_memory.SharedMemory(name=name)
+        try:  # the client's resource tracker would unlink the daemon's ring when the client exits
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        header = np.ndarray(HEADERSIZE, dtype=np.int64, buffer=shm.buf)
+        if header[H_MAGIC] != MAGIC:
+            shm.close()
+            raise ValueError("%s is not an iqmux ring" % name)
+        nslots, nchannels, framesize = (int(v) for v in header[[H_NSLOTS, H_NCHANNELS, H_FRAMESIZE]])
+        del header
+        return cls(shm, nslots, nchannels, framesize)
+
+    def frame(self, slot):
+        """ view of the frame in slot, (N,) for one channel and (channels, N) otherwise """
+        frame = self.slots[slot, ..., :self.slotlen[slot]]
+        return frame[0] if self.nchannels == 1 else frame
+
+    def close(self):
+        self.header = self.slotseq = self.slotlen = self.slottime = self.slots = None
+        self.shm.close()
+
+
+class IQServer:
+    """ source: RadarDevice (or anything with receive(index, out=None), rxbuffersize and nchannels)
+        name/nslots: shared memory ring, nslots frames of source.rxbuffersize samples
+        port: control socket on 127.0.0.1, JSON lines {"cmd": ...} answered by {"ok": true, ...} or
+        {"ok": false, "error": ...}, commands: config, stats, setrxgain (gain0, gain1), setsteering (phase),
+        startrecording (path), stoprecording, stop
+        Device calls from the control socket are serialised with receive() by lock.
+    """
+
+    def __init__(self, source, name=DEFAULT_NAME, nslots=64, port=DEFAULT_PORT):
+        self.source = source
+        self.name = name
+        self.ring = IQRing.create(name, max(int(nslots), 2), int(getattr(source, "nchannels", 1)),
+                                  int(source.rxbuffersize))
+        self.ring.header[H_PORT] = port
+        self.lock = threading.Lock()
+        self.running = False
+        self.error = None
+        self.starttime = None
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    try:
+                        reply = server.command(json.loads(line))
+                        reply["ok"] = True
+                    except Exception as e:
+                        reply = {"ok": False, "error": "%s: %s" % (type(e).__name__, e)}
+                    self.wfile.write((json.dumps(reply, default=float) + "\n").encode())
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.control = socketserver.ThreadingTCPServer(("127.0.0.1", port), Handler)
+        self.control.daemon_threads = True
+
+    def config(self):
+        ring = self.ring
+        config = {"name": self.name, "nslots": ring.nslots, "nchannels": ring.nchannels, "framesize": ring.framesize,
+                  "channelmode": getattr(self.source, "channelmode", "sum"),
+                  "rxgain": getattr(self.source, "rxgain", None), "steering": getattr(self.source, "steering", None)}
+        if hasattr(self.source, "capturemetadata"):
+            config["metadata"] = self.source.capturemetadata()
+        return config
+
+    def stats(self):
+        elapsed = timer() - self.starttime if self.starttime is not None else 0.0
+        frames = int(self.ring.header[H_SEQUENCE])
+        st = {"frames": frames, "frames_per_s": frames / elapsed if elapsed > 0 else 0.0}
+        if hasattr(self.source, "metrics"):
+            st["rx"] = self.source.metrics.stats()
+        return st
+
+    def command(self, request):
+        cmd = request.get("cmd")
+        if cmd == "config":
+            return self.config()
+        if cmd == "stats":
+            return self.stats()
+        if cmd == "stop":
+            self.running = False
+            return {}
+        with self.lock:
+            if cmd == "setrxgain":
+                self.source.setrxgain(float(request["gain0"]), float(request.get("gain1", request["gain0"])))
+            elif cmd == "setsteering":
+                self.source.setsteering(float(request["phase"]))
+            elif cmd == "startrecording":
+                self.source.startrecording(request["path"], mode=request.get("mode", "npy"))
+            elif cmd == "stoprecording":
+                return {"report": self.source.stoprecording()}
+            else:
+                raise ValueError("unknown command %r" % cmd)
+        return self.config()
+
+    def publish(self, index):
+        ring = self.ring
+        sequence = int(ring.header[H_SEQUENCE])
+        slot = sequence % ring.nslots
+        ring.slotseq[slot] = -1  # readers of the frame this slot held see it is gone
+        out = ring.slots[slot] if ring.nchannels > 1 else ring.slots[slot, 0]
+        with self.lock:
+            data, datalen, index = self.source.receive(index, out=out)
+        ring.slotlen[slot] = datalen
+        ring.slottime[slot] = time.time()
+        ring.slotseq[slot] = sequence
+        ring.header[H_SEQUENCE] = sequence + 1
+        return index
+
+    def serve(self):
+        """ publish frames until a stop command or Ctrl-C """
+        controlthread = threading.Thread(target=self.control.serve_forever, daemon=True)
+        controlthread.start()
+        print("iqmux: ring %s, %d slots of %d x %d samples, control on 127.0.0.1:%d"
+              % (self.name, self.ring.nslots, self.ring.nchannels, self.ring.framesize, self.ring.header[H_PORT]))
+        self.running = True
+        self.starttime = timer()
+        self.ring.header[H_RUNNING] = 1
+        index = 0
+        try:
+            while self.running:
+                index = self.publish(index)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.running = False
+            self.ring.header[H_RUNNING] = 0
+            self.control.shutdown()
+            self.control.server_close()
+
+    def close(self):
+        shm = self.ring.shm
+        self.ring.close()
+        shm.unlink()
+
+
+class IQClient:
+    """ Reader of an IQServer ring in another process. next()/latest() return (frame, sequence) with frame
+        a view into shared memory: check valid(sequence) after using it, or pass copy=True.
+        receive(index, out=None) makes it a RadarStream/AcquisitionEngine source like RadarDevice.
+        Counters: overruns, frames overwritten before this client got to them
+    """
+
+    def __init__(self, name=DEFAULT_NAME, port=None):
+        self.ring = IQRing.attach(name)
+        self.port = int(port or self.ring.header[H_PORT])
+        config = self.command("config")
+        self.metadata = config.get("metadata", {})
+        self.channelmode = config.get("channelmode", "sum")
+        self.nchannels = self.ring.nchannels
+        self.rxbuffersize = self.ring.framesize
+        self.samplerate = float(self.metadata.get("samplerate", 0.6e6))
+        self.nextsequence = self.published()
+        self.overruns = 0
+
+    def command(self, cmd, **kwargs):
+        """ send a control command, returns the reply dict, RuntimeError if the daemon refused it """
+        request = dict(kwargs, cmd=cmd)
+        with socket.create_connection(("127.0.0.1", self.port), timeout=5.0) as conn:
+            conn.sendall((json.dumps(request) + "\n").encode())
+            reply = json.loads(conn.makefile("r").readline())
+        if not reply.pop("ok", False):
+            raise RuntimeError(reply.get("error", "iqmux command failed"))
+        return reply
+
+    def published(self):
+        """ frames published so far, the sequence number of the next one """
+        return int(self.ring.header[H_SEQUENCE])
+
+    def running(self):
+        return bool(self.ring.header[H_RUNNING])
+
+    def valid(self, sequence):
+        """ the frame of sequence is still in its slot (not overwritten by the daemon) """
+        return self.ring.slotseq[sequence % self.ring.nslots] == sequence
+
+    def get(self, sequence, copy=False):
+        """ (frame, sequence), None if the frame is not published yet or already overwritten """
+        slot = sequence % self.ring.nslots
+        if self.ring.slotseq[slot] != sequence:
+            return None
+        frame = self.ring.frame(slot)
+        if copy:
+            frame = frame.copy()
+            if not self.valid(sequence):
+                return None
+        return frame, sequence
+
+    def latest(self, copy=False):
+        """ newest frame, None if there is none yet, frames in between are skipped """
+        while self.published() > 0:
+            item = self.get(self.published() - 1, copy)
+            if item is not None:
+                self.nextsequence = item[1] + 1
+                return item
+        return None
+
+    def next(self, timeout=None, copy=False):
+        """ oldest frame not read yet, waits up to timeout seconds (None: forever), None on timeout or when the
+            daemon stopped. A client more than nslots behind skips ahead to the newest frames.
+        """
+        start = timer()
+        poll = self.ring.framesize / self.samplerate / 8
+        while True:
+            published = self.published()
+            if published - self.nextsequence >= self.ring.nslots - 1:
+                skip = published - self.ring.nslots // 2
+                self.overruns += skip - self.nextsequence
+                self.nextsequence = skip
+            if self.nextsequence < published:
+                item = self.get(self.nextsequence, copy)
+                if item is None:  # overwritten between the checks
+                    continue
+                self.nextsequence += 1
+                return item
+            if not self.running() or (timeout is not None and timer() - start >= timeout):
+                return None
+            time.sleep(poll)
+
+    def receive(self, index, out=None):
+        """ next frame, written into out (a preallocated frame buffer) if given, as RadarDevice.receive() """
+        while True:
+            item = self.next()
+            if item is None:
+                raise EOFError("iqmux daemon stopped")
+            frame, sequence = item
+            if out is None:
+                return frame, frame.shape[-1], index + 1
+            n = frame.shape[-1]
+            np.copyto(out[..., :n], frame)
+            if self.valid(sequence):
+                return out[..., :n], n, index + 1
+            self.overruns += 1
+
+    def returnparameters(self):
+        c = 3e8
+        fs = int(self.samplerate)
+        BW = self.metadata.get("BW", 500e6)
+        ramp_time_s = self.metadata.get("ramp_time_s", 0.5e-3)
+        signal_freq = self.metadata.get("signal_freq", 100e3)
+        num_steps = self.metadata.get("num_steps", 1000)
+        freq = np.linspace(-fs / 2, fs / 2, self.rxbuffersize)
+        slope = BW / ramp_time_s
+        N_s = int(ramp_time_s * fs)
+        N_c = int(self.rxbuffersize / N_s) - 1
+        dist = (freq - signal_freq) * c / (4 * slope)
+        range_resolution = c / (2 * BW)
+        range_x = signal_freq * c / (4 * slope)
+        return c, BW, num_steps, ramp_time_s, slope, N_c, N_s, freq, dist, range_resolution, signal_freq, range_x
+
+    def close(self):
+        self.ring.close()
+
+
+def readframes(name, seconds):
+    """ read every frame for seconds and report the rate and overruns """
+    client = IQClient(name)
+    start = timer()
+    frames = samples = 0
+    while timer() - start < seconds:
+        item = client.next(timeout=1.0)
+        if item is None:
+            if not client.running():
+                break
+            continue
+        frame, sequence = item
+        frames += 1
+        samples += frame.shape[-1]
+    elapsed = timer() - start
+    item = frame = None  # no views left into the ring
+    print("iqmux client: %d frames, %0.3f MS/s, %d overruns" % (frames, samples / elapsed / 1e6, client.overruns))
+    client.close()
+
+def main():
+    args = parser.parse_args()
+    if args.command:
+        with socket.create_connection(("127.0.0.1", args.port), timeout=5.0) as conn:
+            conn.sendall((json.dumps(json.loads(args.command)) + "\n").encode())
+            print(conn.makefile("r").readline().strip())
+        return
+    if args.client:
+        readframes(args.name, args.seconds)
+        return
+    from myradar import RadarDevice
+    radar = RadarDevice(args.sdrurl, args.phaserurl, rxbuffersize=args.rxbuffersize, channelmode=args.channelmode,
+                        metricsperiod=args.metricsperiod)
+    server = IQServer(radar, args.name, args.nslots, args.port)
+    try:
+        server.serve()
+    finally:
+        server.close()
+        radar.metrics.report()
+
+import argparse
+parser = argparse.ArgumentParser(description='shared memory IQ multiplexer for one Pluto/phaser')
+parser.add_argument('--sdrurl', default="ip:phaser.local:50901", type=str,
+                    help='ad9361 uri, sim:realtime or sim: for the simulated Pluto')
+parser.add_argument('--phaserurl', default="ip:phaser.local", type=str,
+                    help='phaser uri, sim: for the simulated board')
+parser.add_argument('--rxbuffersize', default=1024*16, type=int,
+                    help='samples per frame')
+parser.add_argument('--channelmode', default="sum", type=str,
+                    help='sum, dual or sumdelta')
+parser.add_argument('--metricsperiod', default=None, type=float,
+                    help='seconds between rx metrics reports of the daemon')
+parser.add_argument('--name', default=DEFAULT_NAME, type=str,
+                    help='shared memory ring name')
+parser.add_argument('--nslots', default=64, type=int,
+                    help='frames kept in the ring')
+parser.add_argument('--port', default=DEFAULT_PORT, type=int,
+                    help='control socket port on 127.0.0.1')
+parser.add_argument('--client', action='store_true',
+                    help='read frames from a running daemon for --seconds')
+parser.add_argument('--seconds', default=5.0, type=float,
+                    help='client reading time')
+parser.add_argument('--command', default=None, type=str,
+                    help='send one JSON control command to a running daemon')
+
+if __name__ == '__main__':
+    main()
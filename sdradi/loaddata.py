@@ -5,6 +5,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 from scipy import signal
 from timeit import default_timer as timer
+from processing import rangedoppler, rangedopplerzoom, spectrumprocessor, StreamingSTFT
+from capture import loadcapture, readmetadata, tocomplex
 
 
 def plotfigure(ts, data0):
@@ -29,45 +31,43 @@ def plotfigure(ts, data0):
     plt.show()
 
 def loadad9361data():
-    with open('./data/ad9361data.npy', 'rb') as f:
-        alldata = np.load(f)
-    print(len(alldata))
+    capture = loadcapture('./data/ad9361data.npy')
+    print(len(capture))
     fs= 6000000 #6MHz
     ts = 1/float(fs)
     num_samps = 1024*100
-    plotfigure(ts, alldata.real[0:num_samps*2])
+    #only the plotted samples are converted to complex
+    plotfigure(ts, tocomplex(capture[0:num_samps*2], readmetadata('./data/ad9361data.npy').get("scale", 1.0)).real)
     Nperiod=int(2*fs/num_samps)
-    print(len(alldata)/num_samps)
+    print(len(capture)/num_samps)
+
+class MixedCapture:
+    """ Stored capture samples converted to complex and mixed with a carrier of fc Hz (amplitude 2**14), one
+        slice at a time. len() and [start:stop] slices like the mixed complex array, .real like its real part.
+    """
+    def __init__(self, capture, scale=1.0, fs=0.6e6, fc=100e3, realpart=False):
+        self.capture = capture
+        self.scale = scale
+        self.fs = fs
+        self.fc = fc
+        self.realpart = realpart
+
+    def __len__(self):
+        return len(self.capture)
+
+    @property
+    def real(self):
+        return MixedCapture(self.capture, self.scale, self.fs, self.fc, realpart=True)
+
+    def __getitem__(self, key):
+        start, stop, step = key.indices(len(self))
+        t = np.arange(start, stop, step) / self.fs
+        data = tocomplex(self.capture[key], self.scale) * (2 ** 14 * np.exp(2j * np.pi * self.fc * t))
+        return data.real if self.realpart else data
 
 def showspectrum(data, fs, N_frame):
-    # fc = int(100e3 / (fs / N_frame)) * (fs / N_frame) #300KHz
-    # ts =1.0/fs
-    # t = np.arange(0, N_frame * ts, ts)
-    # i = np.cos(2 * np.pi * t * fc) * 2 ** 14
-    # q = np.sin(2 * np.pi * t * fc) * 2 ** 14
-    # iq_100k = 1 * (i + 1j * q)
-    data=data[0:N_frame] #* iq_100k
-    win_funct = np.blackman(len(data))
-    y = data * win_funct
-    sp = np.absolute(np.fft.fft(y))
-    sp = np.fft.fftshift(sp)
-    s_mag = np.abs(sp) / np.sum(win_funct)
-    s_mag = np.maximum(s_mag, 10 ** (-15))
-    s_dbfs = 20 * np.log10(s_mag / (2 ** 11))
-    """there's a scaling issue on the y-axis of the waterfallcthe data is off by 300kHz.  To fix, I'm just shifting the freq"""
-    # fc = int(300e3 / (fs / N_frame)) * (fs / N_frame) #300KHz
-    # ts =1.0/fs
-    # t = np.arange(0, N_frame * ts, ts)
-    # i = np.cos(2 * np.pi * t * fc) * 2 ** 14
-    # q = np.sin(2 * np.pi * t * fc) * 2 ** 14
-    # iq_300k = 1 * (i + 1j * q)
-    # data_shift = data * iq_300k
-    # y = data_shift * win_funct
-    # sp = np.absolute(np.fft.fft(y))
-    # sp = np.fft.fftshift(sp)
-    # s_mag = np.abs(sp) / np.sum(win_funct)
-    # s_mag = np.maximum(s_mag, 10 ** (-15))
-    # s_dbfs_shift = 20 * np.log10(s_mag / (2 ** 11))
+    data=data[0:N_frame]
+    s_dbfs, s_dbfs_shift = spectrumprocessor.process(data, fs)
     #dist, s_dbfs
     #freq, s_dbfs
     freq = np.linspace(-fs / 2, fs / 2, int(N_frame))
@@ -86,13 +86,7 @@ def dynamicspectrum(dataall, fs, N_frame):
     for i in range(Ntotalframe):
         data = dataall[i*N_frame:(i+1)*N_frame]
         #data=data[0:N_frame]
-        win_funct = np.blackman(len(data))
-        y = data * win_funct
-        sp = np.absolute(np.fft.fft(y))
-        sp = np.fft.fftshift(sp)
-        s_mag = np.abs(sp) / np.sum(win_funct)
-        s_mag = np.maximum(s_mag, 10 ** (-15))
-        s_dbfs = 20 * np.log10(s_mag / (2 ** 11))
+        s_dbfs, s_dbfs_shift = spectrumprocessor.process(data, fs)
         freq = np.linspace(-fs / 2, fs / 2, int(N_frame))
         plt.clf()
         plt.plot(freq,s_dbfs)
@@ -131,31 +125,52 @@ def dynamicspectrum2(dataall, fs, N_frame):
         plt.draw()
         plt.pause(0.1)
 
-def dynamicRD(dataall, fs, N_frame):
+def dynamicstft(dataall, fs, N_frame, nfft=1024, overlap=0.75, num_slices=400):
+    #feed the capture buffer by buffer, STFT frames overlap and continue across buffer boundaries
     totallen=len(dataall)
     Ntotalframe=int(totallen/N_frame)-1
-    plt.figure(figsize=(18,18))
+    stft = StreamingSTFT(nfft=nfft, overlap=overlap, fs=fs, maxframes=int(N_frame/(nfft*(1-overlap)))+1)
+    img_array = np.full((num_slices, nfft), -140.0)
+    plt.figure(figsize=(10,6))
     for i in range(Ntotalframe):
         data = dataall[i*N_frame:(i+1)*N_frame]
-        n_s = 600
-        n_r = int(len(data)/n_s)-1
-        table = np.zeros((n_r, n_s)) #150 chirps,1000 samples/chirp
-        for chirp_nr in range(n_r):
-            table[chirp_nr, :] = data[(chirp_nr*n_s):(n_s*(chirp_nr+1))]
-        #fft_output = np.fft.fft2(table)
-        #2D FFT and Velocity-Distance Relationship
-        Z_fft2 = abs(np.fft.fft2(table)) #
-        #Data_fft2 = Z_fft2[0:int(n_r/2),0:int(n_s/2)] #get half
-        Data_fft2 = Z_fft2[0:n_r,70:120] #get half 0:int(n_s/2)
-        #plt.subplot(4,2,8)
-        plt.imshow(Data_fft2) 
-        plt.xlabel("Range")
-        plt.ylabel("Velocity")
-        plt.title('Velocity-Range 2D FFT')
-        plt.tight_layout(pad=3, w_pad=0.05, h_pad=0.05)
+        spectra = stft.update(data)
+        n = len(spectra)
+        img_array = np.roll(img_array, -n, axis=0)
+        img_array[num_slices-n:] = spectra
+        plt.clf()
+        plt.imshow(img_array.T, aspect='auto', origin='lower', extent=[0, num_slices*stft.hop/fs, -fs/2, fs/2])
+        plt.xlabel('Time (s)')
+        plt.ylabel('Frequency')
+        plt.title('Streaming STFT, hop %d samples' % stft.hop)
         plt.draw()
         plt.pause(0.1)
 
+def dynamicRD(dataall, fs, N_frame, batchframes=32):
+    totallen=len(dataall)
+    Ntotalframe=int(totallen/N_frame)-1
+    n_s = 600
+    n_r = int(N_frame/n_s)-1
+    plt.figure(figsize=(18,18))
+    for start in range(0, Ntotalframe, batchframes):
+        #batchframes frames per batched call, (batch, n_r, n_s) view of the capture, memory bounded by the batch
+        #real chirp tables as before the batched engine (np.real: no copy for real input)
+        #only range bins 70:120 are evaluated (zoom DFT), the Doppler FFT runs over those 50 bins
+        stop = min(start + batchframes, Ntotalframe)
+        frames = np.real(dataall[start*N_frame:stop*N_frame]).reshape(stop - start, N_frame)
+        Z_fft2, table = rangedopplerzoom(frames, n_c=n_r, n_s=n_s, rbins=(70, 120), showdb=False, fulldoppler=True)
+        for i in range(stop - start):
+            #Data_fft2 = Z_fft2[0:int(n_r/2),0:int(n_s/2)] #get half
+            Data_fft2 = Z_fft2[i] #range bins 70:120
+            #plt.subplot(4,2,8)
+            plt.imshow(Data_fft2) 
+            plt.xlabel("Range")
+            plt.ylabel("Velocity")
+            plt.title('Velocity-Range 2D FFT')
+            plt.tight_layout(pad=3, w_pad=0.05, h_pad=0.05)
+            plt.draw()
+            plt.pause(0.1)
+
 def matplotlibspectrogram(dataall, fs, N_frame):
     # plt.figure(figsize=(10,6))
     totallen=len(dataall)
@@ -168,11 +183,7 @@ def matplotlibspectrogram(dataall, fs, N_frame):
         data = dataall[i*N_frame:(i+1)*N_frame]
         n_s = 600
         n_r = int(len(data)/n_s)-1
-        table = np.zeros((n_r, n_s)) #150 chirps,1000 samples/chirp
-        for chirp_nr in range(n_r):
-            table[chirp_nr, :] = data[(chirp_nr*n_s):(n_s*(chirp_nr+1))]
-        Z_fft2 = abs(np.fft.fft2(table))
-        Data_fft2 = Z_fft2[0:n_r,0:300]
+        Data_fft2, table = rangedoppler(data, n_c=n_r, n_s=n_s, showdb=False, fulldoppler=True) #(n_r, 300)
         ax1.cla()  
         #ax1.plot(data)
         ax1.imshow(Data_fft2) 
@@ -189,13 +200,14 @@ def matplotlibspectrogram(dataall, fs, N_frame):
 
 
 def main():
-    with open('./data/radardata5s-indoor2.npy', 'rb') as f:
-        alldata = np.load(f)
-    print(len(alldata))
-    sample_rate = 0.6e6 #0.6M
+    datapath = './data/radardata5s-indoor2.npy'
+    metadata = readmetadata(datapath) #radar configuration of new captures, defaults below for older ones
+    capture = loadcapture(datapath)
+    print(len(capture))
+    sample_rate = metadata.get("samplerate", 0.6e6) #0.6M
     fs = sample_rate
-    center_freq = 2.1e9 #2.1G
-    signal_freq = 100e3 #100K
+    center_freq = metadata.get("center_freq", 2.1e9) #2.1G
+    signal_freq = metadata.get("signal_freq", 100e3) #100K
     num_slices = 200
     fft_size = 1024 * 16 #16384
     ts = 1/float(fs)
@@ -204,25 +216,24 @@ def main():
     print("Total period:", Nperiod)
     N_frame = fft_size
     c = 3e8
-    BW = 500e6
-    num_steps = 1000
-    ramp_time = 1e3  # us
-    ramp_time_s = ramp_time / 1e6
+    BW = metadata.get("BW", 500e6)
+    num_steps = metadata.get("num_steps", 1000)
+    ramp_time_s = metadata.get("ramp_time_s", 1e-3)
+    ramp_time = ramp_time_s * 1e6  # us
     slope = BW / ramp_time_s
     Nr = int(ramp_time_s * fs) #Number ADC sampling points in each chirp
 
     fc = int(100e3 / (fs / N_frame)) * (fs / N_frame) #300KHz
     ts =1.0/fs
-    t = np.arange(0, len(alldata) * ts, ts)
-    i = np.cos(2 * np.pi * t * fc) * 2 ** 14
-    q = np.sin(2 * np.pi * t * fc) * 2 ** 14
-    iq_100k = 1 * (i + 1j * q)
-    alldata=alldata * iq_100k
+    #mixed with the fc carrier slice by slice as the plots read it, the capture is never converted whole
+    alldata = MixedCapture(capture, metadata.get("scale", 1.0), fs, fc)
 
     showspectrum(alldata.real, fs, N_frame)
 
     dynamicspectrum(alldata.real, fs, N_frame)
 
+    dynamicstft(alldata, fs, N_frame)
+
     dynamicRD(alldata.real, fs, fft_size)
 
     
@@ -1,12 +1,19 @@
 #ref: https://ez.analog.com/ez-blogs/b/engineerzone-spotlight/posts/using-python-to-control-the-pluto-radio-and-plot-data
 import time
 
-import adi
 import matplotlib.pyplot as plt
 import numpy as np
 from scipy import signal
 from timeit import default_timer as timer
 
+from capture import CaptureRecorder, loadcapture, readmetadata, tocomplex
+from rxmetrics import RxMetrics
+import simdevice
+try:
+    import adi
+except ImportError: #no pyadi-iio, only the simulated Pluto ("sim:" url) can be opened
+    adi = None
+
 def testlibiioaccess(urladdress="ip:pluto.local"):
     import iio
     sdr = adi.Pluto(urladdress)
@@ -30,6 +37,7 @@ def readiio(sdr):
     status = phy.reg_read(r)
     if status & 0b0100:
         print("Overflow")
+    return bool(status & 0b0100)
 
 # Read back properties from hardware https://analogdevicesinc.github.io/pyadi-iio/devices/adi.ad936x.html
 def printSDRproperties(sdr):
@@ -96,7 +104,12 @@ def main():
     #testlibiioaccess(urladdress)
 
     # Create radio
-    sdr = adi.ad9361(uri=urladdress)
+    if simdevice.issim(urladdress):
+        sdr = simdevice.ad9361(uri=urladdress)
+    elif adi is None:
+        raise ImportError("pyadi-iio is needed to open %s, only sim: urls run without it" % urladdress)
+    else:
+        sdr = adi.ad9361(uri=urladdress)
     
     # Configure properties
     fs= 6000000 #6MHz
@@ -139,13 +152,15 @@ def main():
     if plot_flag:
         #plt.figure(figsize=(10,6))
         fig, axs = plt.subplots(2, 1, layout='constrained', figsize=(12,6))
-    # Collect data
-    #alldata0 = np.empty(0) #Default is numpy.float64.
-    alldata0 = np.empty(0, dtype=np.complex_) #Default is numpy.float64.
+    # Collect data, each buffer is appended to the capture file so memory stays bounded for long runs
+    metadata = {"samplerate": float(fs), "center_freq": float(sdr.rx_lo), "rxbuffersize": num_samps, "rxchannels": Rx_CHANNEL}
+    recorder = CaptureRecorder(args.output, mode=args.recordmode, dtype=np.int16 if args.format == 'iq16' else args.format,
+                               metadata=metadata, threaded=True)
+    metrics = RxMetrics(fs, logperiod=args.metricsperiod)
     rxtime=[]
     processtime=[]
-    Nperiod=int(2*fs/num_samps) #total time 10s *fs=total samples /fft_size = Number of frames
-    print("Total period for 2s:", Nperiod)
+    Nperiod=int(args.duration*fs/num_samps) #total time *fs=total samples /fft_size = Number of frames
+    print("Total period for %ss:" % args.duration, Nperiod)
     for r in range(Nperiod):
         start = timer()
         x = sdr.rx() #1024 size array of complex
@@ -157,9 +172,7 @@ def main():
             data1=x[1]
         else:
             data0=x
-        datarate=len(data0.real)*4/timedelta/1e6 #Mbps, complex data is 4bytes
-        print("Data rate at ", datarate, "Mbps.") #7-8Mbps in 10240 points, 10Mbps in 102400points, single channel in 19-20Mbps
-        alldata0 = np.concatenate((alldata0, data0))
+        recorder.write(data0, rxgain=(float(sdr.rx_hardwaregain_chan0), float(sdr.rx_hardwaregain_chan1))) #AGC changes the gains
         f, Pxx_den = signal.periodogram(data0.real, fs) #https://docs.scipy.org/doc/scipy/reference/generated/scipy.signal.periodogram.html
         #returns f (ndarray): Array of sample frequencies.
         #returns Pxx_den (ndarray): Power spectral density or power spectrum of x.
@@ -168,7 +181,7 @@ def main():
         peak_freq = f[peak_index]
         print("Peak frequency found at ", peak_freq, "MHz.")
 
-        readiio(sdr)
+        metrics.record(start, rxt, len(data0), overflow=readiio(sdr))
 
         if plot_flag:
             Npoints=min(len(data1.real), len(data0.real))
@@ -187,9 +200,12 @@ def main():
     # Stop transmitting
     sdr.tx_destroy_buffer() #Clears TX buffer
     sdr.rx_destroy_buffer() #Clears RX buffer
-    print(len(alldata0))
-    with open('./data/antad9361data.npy', 'wb') as f:
-        np.save(f, alldata0)
+    recorder.close()
+    recorder.report()
+    metrics.report()
+    capturedata = loadcapture(args.output)
+    print(len(capturedata))
+    alldata0 = tocomplex(capturedata[0:num_samps*2], readmetadata(args.output).get("scale", 1.0))
     plotfigure(ts, alldata0.real[0:num_samps*2])
     print(np.mean(rxtime))
     print(np.mean(processtime))
@@ -277,6 +293,16 @@ parser.add_argument('--signal', default="dds", type=str,
                     help='signal type: sinusoid, dds')
 parser.add_argument('--plot', default=False, type=bool,
                     help='plot figure')
+parser.add_argument('--duration', default=2, type=float,
+                    help='capture time in seconds')
+parser.add_argument('--output', default='./data/antad9361data.npy', type=str,
+                    help='capture file')
+parser.add_argument('--recordmode', default='npy', type=str,
+                    help='npy: one appendable file, chunks: rotating chunk files, blocks: compressed blocks')
+parser.add_argument('--format', default='iq16', type=str,
+                    help='stored samples: iq16 (int16 IQ), complex64, complex128')
+parser.add_argument('--metricsperiod', default=1.0, type=float,
+                    help='seconds between acquisition metrics reports')
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
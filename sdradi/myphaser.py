@@ -6,6 +6,8 @@ import numpy as np
 from scipy import signal
 from timeit import default_timer as timer
 import phaser.mycn0566 as mycn0566
+from rxmetrics import RxMetrics
+from rxtune import profilesettings, DEFAULT_RXBUFFERSIZE
 CN0566=mycn0566.CN0566
 import pickle
 
@@ -164,9 +166,15 @@ def configureADF4159(my_phaser, output_freq= 12.1e9, BW= 500e6, num_steps= 1000,
     my_phaser.enable = 0  # 0 = PLL enable.  Write this last to update all the registers
     return my_phaser
 
-def initAD9361(urladdress, fs, center_freq=2.2e9, rxbuffer=1024, Rx_CH=2, Tx_CH=2, rxbw=4000000, rxgain0=30, rxgain1=30, txgain0=-88, txgain1=-88):
+def initAD9361(urladdress, fs, center_freq=2.2e9, rxbuffer=1024, Rx_CH=2, Tx_CH=2, rxbw=4000000, rxgain0=30, rxgain1=30, txgain0=-88, txgain1=-88, profile=False):
     # Create radio
     sdr = adi.ad9361(uri=urladdress)
+    #profile=True applies the rxtune.py profile of this host: rxbuffer=None takes the tuned size, the tuned
+    #kernel buffer count goes with it. Without it the driver keeps its kernel buffers (rxbuffer=None: 16384)
+    rxbuffer, kernelbuffers = profilesettings(urladdress, fs, rxbuffer) if profile else (rxbuffer or DEFAULT_RXBUFFERSIZE, None)
+    if kernelbuffers is not None:
+        print("rx profile: rx_buffer_size %d, %d kernel buffers" % (rxbuffer, kernelbuffers))
+        sdr._rxadc.set_kernel_buffers_count(kernelbuffers)
     sdr.rx_rf_bandwidth = int(rxbw) #4000000 #4MHz
     sdr.sample_rate = int(fs) 
 
@@ -438,6 +446,7 @@ def main():
 
     # Collect data
     alldata0 = np.empty(0, dtype=np.complex_) #Default is numpy.float64.
+    metrics = RxMetrics(fs, logperiod=1.0)
     rxtime=[]
     processtime=[]
     Nperiod=int(5*fs/rxbuffersize) #total time 10s *fs=total samples /fft_size = Number of frames
@@ -456,8 +465,7 @@ def main():
             data = data0 + data1
         else:
             data=x
-        datarate=len(data.real)*4/timedelta/1e6 #Mbps, complex data is 4bytes
-        print("Data rate at ", datarate, "Mbps.") #7-8Mbps in 10240 points, 10Mbps in 102400points, single channel in 19-20Mbps
+        metrics.record(start, rxt, len(data))
         alldata0 = np.concatenate((alldata0, data))
 
         if plot_flag:
@@ -473,6 +481,7 @@ def main():
     with open('./data/phaser1101data1.npy', 'wb') as f:
         np.save(f, alldata0)
     print(len(alldata0)) #1196032
+    metrics.report()
     
 # piuri="ip:phaser.local:50901"#connect ad9361 via Pi
 # localuri="ip:analog.local"#Pi
@@ -1,12 +1,28 @@
 import time
+import threading
+import mmap
 from time import sleep
-import adi
 import matplotlib.pyplot as plt
 import numpy as np
 from scipy import signal
 from timeit import default_timer as timer
-import phaser.mycn0566 as mycn0566
-CN0566=mycn0566.CN0566
+import simdevice
+try:
+    import adi
+    import phaser.mycn0566 as mycn0566
+    CN0566=mycn0566.CN0566
+except ImportError: #no pyadi-iio, only the simulated devices ("sim:" urls) can be opened
+    adi = None
+    CN0566 = None
+from processing import getdtypes, todtype, spectrumprocessor, rangedoppler, cfar2d
+from capture import CaptureRecorder, loadcapture, loadindex, readmetadata, tocomplex
+from rxmetrics import RxMetrics
+from rxtune import profilesettings, DEFAULT_RXBUFFERSIZE
+
+def requireadi(urladdress):
+    """ hardware urls need pyadi-iio, never fall back to the simulator for them """
+    if adi is None or CN0566 is None:
+        raise ImportError("pyadi-iio (adi, phaser.mycn0566) is needed to open %s, only sim: urls run without it" % urladdress)
 
 # Read back properties from hardware https://analogdevicesinc.github.io/pyadi-iio/devices/adi.ad936x.html
 def printSDRproperties(sdr):
@@ -30,7 +46,11 @@ def printSDRproperties(sdr):
 
 def initPhaser(urladdress, my_sdr, Blackman=False):
     #my_phaser = adi.CN0566(uri=urladdress, sdr=my_sdr)
-    my_phaser = CN0566(uri=urladdress, sdr=my_sdr)
+    if simdevice.issim(urladdress):
+        my_phaser = simdevice.CN0566(uri=urladdress, sdr=my_sdr)
+    else:
+        requireadi(urladdress)
+        my_phaser = CN0566(uri=urladdress, sdr=my_sdr)
     print("Phaser url: ", my_phaser.uri)
     print("Phaser already connected")
 
@@ -84,9 +104,19 @@ def configureADF4159(my_phaser, output_freq= 12.1e9, BW= 500e6, num_steps= 1000,
     my_phaser.enable = 0  # 0 = PLL enable.  Write this last to update all the registers
     return my_phaser
 
-def initAD9361(urladdress, fs, center_freq=2.2e9, rxbuffer=1024, Rx_CH=2, Tx_CH=2, rxbw=4000000, rxgain0=30, rxgain1=30, txgain0=-88, txgain1=-88):
+def initAD9361(urladdress, fs, center_freq=2.2e9, rxbuffer=1024, Rx_CH=2, Tx_CH=2, rxbw=4000000, rxgain0=30, rxgain1=30, txgain0=-88, txgain1=-88, profile=False):
     # Create radio
-    sdr = adi.ad9361(uri=urladdress)
+    if simdevice.issim(urladdress):
+        sdr = simdevice.ad9361(uri=urladdress)
+    else:
+        requireadi(urladdress)
+        sdr = adi.ad9361(uri=urladdress)
+    #profile=True applies the rxtune.py profile of this host: rxbuffer=None takes the tuned size, the tuned
+    #kernel buffer count goes with it. Without it the driver keeps its kernel buffers (rxbuffer=None: 16384)
+    rxbuffer, kernelbuffers = profilesettings(urladdress, fs, rxbuffer) if profile else (rxbuffer or DEFAULT_RXBUFFERSIZE, None)
+    if kernelbuffers is not None:
+        print("rx profile: rx_buffer_size %d, %d kernel buffers" % (rxbuffer, kernelbuffers))
+        sdr._rxadc.set_kernel_buffers_count(kernelbuffers)
     sdr.rx_rf_bandwidth = int(rxbw) #4000000 #4MHz
     sdr.sample_rate = int(fs) 
 
@@ -158,8 +188,9 @@ def readiio(sdr):
     status = phy.reg_read(r)
     if status & 0b0100:
         print("Overflow")
+    return bool(status & 0b0100)
 
-def setupalldevices(sdrurl, phaserurl, Rx_CHANNEL, Tx_CHANNEL, fs, center_freq, signal_freq, fft_size):
+def setupalldevices(sdrurl, phaserurl, Rx_CHANNEL, Tx_CHANNEL, fs, center_freq, signal_freq, fft_size, profile=False):
     sample_rate=fs
     # Configure the ADF4159 Rampling PLL
     #final output is 12.1GHz-LO(2.1GHz)=10GHz, Ramp range is 10GHz~10.5Ghz(10GHz+500MHz)
@@ -172,7 +203,8 @@ def setupalldevices(sdrurl, phaserurl, Rx_CHANNEL, Tx_CHANNEL, fs, center_freq,
 
     #sdr=initAD9361(ad9361urladdress, sample_rate, center_freq, fft_size, Rx_CH=2, Tx_CH=2)
     sdr=initAD9361(sdrurl, sample_rate, center_freq, rxbuffer=fft_size, \
-                   Rx_CH=Rx_CHANNEL, Tx_CH=Tx_CHANNEL, rxbw=rxbw, rxgain0=30, rxgain1=30, txgain0=-88, txgain1=0)
+                   Rx_CH=Rx_CHANNEL, Tx_CH=Tx_CHANNEL, rxbw=rxbw, rxgain0=30, rxgain1=30, txgain0=-88, txgain1=0, profile=profile)
+    fft_size = int(sdr.rx_buffer_size) #fft_size=None: tuned size from the host profile (profile=True)
     sleep(1)
     my_phaser=initPhaser(phaserurl, sdr)
 
@@ -206,21 +238,182 @@ def setupalldevices(sdrurl, phaserurl, Rx_CHANNEL, Tx_CHANNEL, fs, center_freq,
     )
     return sdr, my_phaser, BW, num_steps, ramp_time_s
 
+class ReplayClock:
+    """ Paces replayed frames like the device delivers them.
+        mode: 'realtime' one frame per rxbuffersize/samplerate seconds, 'accelerated' speed times faster,
+              'max' no pacing, only the throughput is measured
+        In the paced modes a caller that falls more than buffers frames behind loses the oldest frames,
+        like the kernel buffers of the device overflowing: each whole period beyond the buffers skips a frame,
+        counted as dropped. Every frame handed out after its due time, by any amount, is counted as late.
+    """
+    MODES = ("realtime", "accelerated", "max")
+
+    def __init__(self, period, mode="max", speed=1.0, buffers=4):
+        if mode not in self.MODES:
+            raise ValueError("replay mode must be one of %s" % (self.MODES,))
+        self.mode = mode
+        self.speed = float(speed) if mode == "accelerated" else 1.0
+        self.period = period / self.speed #wall seconds per frame
+        self.buffers = buffers
+        self.reset()
+
+    def reset(self):
+        self.starttime = None
+        self.frames = 0 #frames handed out
+        self.due = 0 #frame slots elapsed on the replay clock
+        self.late = 0
+        self.dropped = 0
+
+    def wait(self):
+        """ block until the next frame is due (the first one is due at the first call), returns the number of
+            frames to skip
+        """
+        now = timer()
+        if self.starttime is None:
+            self.starttime = now
+        skip = 0
+        if self.mode != "max":
+            duetime = self.starttime + self.due * self.period #schedule anchored at the first wait(), frame 0 is due at once
+            if now <= duetime:
+                sleep(duetime - now)
+            else:
+                self.late += 1
+                behind = int((now - duetime) / self.period) #whole periods past the deadline
+                if behind > self.buffers:
+                    skip = behind - self.buffers
+                    self.dropped += skip
+                    self.due += skip
+        self.due += 1
+        self.frames += 1
+        return skip
+
+    def stats(self, framesize):
+        """ frames handed out, late and dropped frames, sustained frames/s, MS/s and multiple of real time """
+        elapsed = timer() - self.starttime if self.starttime is not None else 0.0
+        framerate = self.frames / elapsed if elapsed > 0 else 0.0
+        return {
+            "mode": self.mode,
+            "frames": self.frames,
+            "late": self.late,
+            "dropped": self.dropped,
+            "elapsed": elapsed,
+            "frames_per_s": framerate,
+            "MSps": framerate * framesize / 1e6,
+            "realtime_factor": framerate * self.period * self.speed,
+        }
+
+    def report(self, framesize):
+        st = self.stats(framesize)
+        print("Replay %s: %d frames in %0.2fs, %0.1f frames/s, %0.3f MS/s (%0.2fx real time), %d late, %d dropped"
+              % (st["mode"], st["frames"], st["elapsed"], st["frames_per_s"], st["MSps"], st["realtime_factor"],
+                 st["late"], st["dropped"]))
+        return st
+
 class RadarData:
-    def __init__(self, datapath='./data/radardata5s-1101fast3move.npy', samplerate=0.6e6, rxbuffersize=1024*16):
-        with open(datapath, 'rb') as f:
-            self.alldata = np.load(f)
+    def __init__(self, datapath='./data/radardata5s-1101fast3move.npy', samplerate=None, rxbuffersize=None, mmap_mode='r', readahead=0,
+                 replay="max", speed=1.0, buffers=4):
+        #memory-map the capture: startup time and memory stay flat with the file size, frames are paged in on access
+        #int16 IQ captures are converted and scaled per frame, the JSON sidecar (if any) provides the radar configuration
+        self.metadata = readmetadata(datapath)
+        self.alldata = loadcapture(datapath, mmap_mode=mmap_mode)
+        self.scale = self.metadata.get("scale", 1.0)
+        #per-buffer index (offsets, host timestamps, gains, steering, dropped buffers) of captures recorded with one
+        self.index = loadindex(datapath)
         print(len(self.alldata))
-        self.samplerate = samplerate
-        self.rxbuffersize=rxbuffersize
+        self.samplerate = samplerate or self.metadata.get("samplerate", 0.6e6)
+        self.rxbuffersize = rxbuffersize or self.metadata.get("rxbuffersize", 1024*16)
         self.totallen=len(self.alldata)
-        self.Ntotalframe=int(self.totallen/rxbuffersize)-1
-        self.signal_freq = 100e3 #100K
-        self.BW = 500e6
-        self.ramp_time = 1e3  # us
-        self.ramp_time_s = self.ramp_time / 1e6
-        self.num_steps = 1000
-        
+        self.Ntotalframe=int(self.totallen/self.rxbuffersize)-1
+        self.signal_freq = self.metadata.get("signal_freq", 100e3) #100K
+        self.BW = self.metadata.get("BW", 500e6)
+        self.ramp_time_s = self.metadata.get("ramp_time_s", 1e-3)
+        self.ramp_time = self.ramp_time_s * 1e6  # us
+        self.num_steps = self.metadata.get("num_steps", 1000)
+        self.currentindex = 0
+        #replay pacing: 'realtime', 'accelerated' (speed x real time) or 'max', see ReplayClock
+        self.clock = ReplayClock(self.rxbuffersize / self.samplerate, replay, speed, buffers)
+        #optional read-ahead thread that pages in the next readahead frames
+        self.readahead = int(readahead) if mmap_mode is not None else 0
+        if self.readahead > 0:
+            self.prefetchindex = 0
+            self.prefetchevent = threading.Event()
+            self.prefetchstop = threading.Event()
+            self.prefetchthread = threading.Thread(target=self.prefetch, daemon=True)
+            self.prefetchthread.start()
+
+    def prefetch(self):
+        compressed = hasattr(self.alldata, "prefetch") #BlockCapture decodes the blocks into its cache
+        pagestep = 1 if compressed else max(1, int(mmap.PAGESIZE / self.alldata.strides[0]))
+        while not self.prefetchstop.is_set():
+            self.prefetchevent.wait()
+            self.prefetchevent.clear()
+            start = self.prefetchindex
+            if compressed:
+                self.alldata.prefetch(start*self.rxbuffersize, (start+self.readahead)*self.rxbuffersize)
+                continue
+            for index in range(start, min(start + self.readahead, self.Ntotalframe)):
+                if self.prefetchevent.is_set() or self.prefetchstop.is_set():
+                    break #a new seek happened, restart from there
+                #touch one sample per page, the OS keeps the pages cached for receive()
+                np.sum(self.alldata[index*self.rxbuffersize:(index+1)*self.rxbuffersize:pagestep])
+
+    def close(self):
+        if self.readahead > 0:
+            self.prefetchstop.set()
+            self.prefetchevent.set()
+            self.prefetchthread.join()
+        if hasattr(self.alldata, "close"):
+            self.alldata.close()
+
+    def seek(self, index):
+        """ jump to any frame index, the next receive() returns that frame """
+        self.currentindex = int(index) % max(self.Ntotalframe, 1)
+        self.clock.reset()
+        if self.readahead > 0:
+            self.prefetchindex = self.currentindex
+            self.prefetchevent.set()
+        return self.currentindex
+
+    def indexrow(self, index):
+        """ position in self.index of the recorded buffer holding the first sample of frame index """
+        offsets = self.index["offset"]
+        return max(int(np.searchsorted(offsets, index * self.rxbuffersize, side="right")) - 1, 0)
+
+    def frametime(self, index):
+        """ host timestamp of the first sample of frame index, None without an index """
+        if self.index is None or len(self.index) == 0:
+            return None
+        row = self.index[self.indexrow(index)]
+        return float(row["timestamp"]) + (index * self.rxbuffersize - int(row["offset"])) / self.samplerate
+
+    def framestate(self, index):
+        """ index row (rx gains, steering, dropped buffers, timestamp) in effect at frame index, None without an index """
+        if self.index is None or len(self.index) == 0:
+            return None
+        return self.index[self.indexrow(index)]
+
+    def seektime(self, t, relative=False):
+        """ jump to the frame captured at host time t (relative: seconds from the capture start), O(log n) in the index """
+        if self.index is None or len(self.index) == 0:
+            if not relative:
+                raise ValueError("capture has no index, only relative seeking is possible")
+            return self.seek(int(t * self.samplerate / self.rxbuffersize))
+        timestamps = self.index["timestamp"]
+        if relative:
+            t = t + float(timestamps[0])
+        row = max(int(np.searchsorted(timestamps, t, side="right")) - 1, 0)
+        offset = int(self.index[row]["offset"]) + max(t - float(timestamps[row]), 0.0) * self.samplerate
+        offset = min(offset, int(self.index[row]["offset"]) + int(self.index[row]["nsamples"]) - 1)
+        return self.seek(int(offset // self.rxbuffersize))
+
+    def getframe(self, index):
+        """ frame index of the capture, a view into the memory-mapped file if no dtype conversion is needed """
+        frame = self.alldata[index*self.rxbuffersize:(index+1)*self.rxbuffersize]
+        if frame.dtype == np.int16:
+            cdtype, rdtype = getdtypes()
+            return tocomplex(frame, self.scale, cdtype)
+        return todtype(frame)
+
     def returnparameters(self):
         c = 3e8
         fs= int(self.samplerate)
@@ -235,32 +428,95 @@ class RadarData:
         return c, self.BW, self.num_steps, self.ramp_time_s, self.slope, self.N_c, self.N_s, freq, dist, range_resolution, self.signal_freq, range_x
 
 
-    def receive(self, index):
-        self.currentindex = index
+    def replaystats(self):
+        return self.clock.stats(self.rxbuffersize)
+
+    def receive(self, index, out=None):
+        """ next frame, written into out (a preallocated frame buffer) if given """
+        #frames the caller was too slow for are skipped in the paced replay modes
+        self.currentindex = index + self.clock.wait()
         if self.currentindex>=self.Ntotalframe:
             print("Finished one round data")
-            self.currentindex=0
+            self.currentindex=self.currentindex % max(self.Ntotalframe, 1)
         start = timer()
-        currentdata = self.alldata[self.currentindex*self.rxbuffersize:(self.currentindex+1)*self.rxbuffersize]
+        currentdata = self.getframe(self.currentindex)
+        if out is not None:
+            out[:len(currentdata)] = currentdata
+            currentdata = out[:len(currentdata)]
         rxt = timer()
         timedelta=rxt-start
         self.currentindex= self.currentindex+1
+        if self.readahead > 0:
+            self.prefetchindex = self.currentindex
+            self.prefetchevent.set()
         return currentdata, len(currentdata), self.currentindex
 
+CHANNELMODES = ("sum", "dual", "sumdelta")
+
 class RadarDevice:
-    def __init__(self, sdrurl, phaserurl, samplerate =0.6e6, rxbuffersize = 1024*16):
+    """ channelmode: "sum", receive() returns data0+data1 (N,) as before; "dual", both channels (2, N);
+        "sumdelta", sum and difference (2, N) for processing.monopulse(). Recordings keep the sum channel.
+        profile: apply the rx_buffer_size and kernel buffer count tuned by rxtune.py for this host,
+        rxbuffersize=None then takes the tuned size (16384 untuned)
+        metrics: rolling rx() throughput/latency/gap statistics (rxmetrics.RxMetrics), printed every
+        metricsperiod seconds if given
+    """
+    def __init__(self, sdrurl, phaserurl, samplerate =0.6e6, rxbuffersize = 1024*16, channelmode="sum", metricsperiod=None, profile=False):
+        if channelmode not in CHANNELMODES:
+            raise ValueError("channelmode must be in %s" % (CHANNELMODES,))
         self.Rx_CHANNEL = 2
         self.Tx_CHANNEL = 2
+        self.channelmode = channelmode
         self.samplerate = samplerate
         self.center_freq = 2.1e9 #2.1G
         self.signal_freq = 100e3 #100K
         self.rxbuffersize=rxbuffersize
 
         self.sdr, self.phaser, self.BW, self.num_steps, self.ramp_time_s=setupalldevices(sdrurl, phaserurl, self.Rx_CHANNEL, self.Tx_CHANNEL, self.samplerate, \
-                                    self.center_freq, self.signal_freq, self.rxbuffersize)
-
+                                    self.center_freq, self.signal_freq, self.rxbuffersize, profile)
+        self.rxbuffersize = int(self.sdr.rx_buffer_size) #rxbuffersize=None takes the tuned size of the host profile
+
+        self.recorder = None
+        #device state saved per buffer in recording indexes, change it through setrxgain()/setsteering()
+        self.rxgain = (float(self.sdr.rx_hardwaregain_chan0), float(self.sdr.rx_hardwaregain_chan1))
+        self.steering = 0.0 #beam phase difference, setupalldevices aims at boresight
+        self.metrics = RxMetrics(self.samplerate, logperiod=metricsperiod, name="RadarDevice rx")
         self.transmitsetup()
         self.transmit()
+
+    @property
+    def nchannels(self):
+        """ rows of a received frame, 1 for (N,) frames """
+        return 1 if self.channelmode == "sum" or self.Rx_CHANNEL != 2 else 2
+
+    def setrxgain(self, gain0, gain1):
+        self.sdr.rx_hardwaregain_chan0 = int(gain0)
+        self.sdr.rx_hardwaregain_chan1 = int(gain1)
+        self.rxgain = (float(gain0), float(gain1))
+
+    def setsteering(self, phase):
+        """ steer the beam with the phase difference between elements (degrees) """
+        self.phaser.set_beam_phase_diff(phase)
+        self.steering = float(phase)
+
+    def capturemetadata(self):
+        """ radar configuration saved with recordings, read back by RadarData """
+        return {"samplerate": float(self.samplerate), "center_freq": float(self.center_freq),
+                "signal_freq": float(self.signal_freq), "BW": float(self.BW), "ramp_time_s": float(self.ramp_time_s),
+                "num_steps": int(self.num_steps), "rxbuffersize": int(self.rxbuffersize), "rxchannels": self.Rx_CHANNEL}
+
+    def startrecording(self, path, mode='npy', dtype=np.int16, threaded=True):
+        """ record every received buffer to path (see capture.CaptureRecorder), int16 IQ with a JSON sidecar by default """
+        self.stoprecording()
+        self.recorder = CaptureRecorder(path, mode=mode, dtype=dtype, metadata=self.capturemetadata(), threaded=threaded)
+        return self.recorder
+
+    def stoprecording(self):
+        if self.recorder is None:
+            return None
+        recorder, self.recorder = self.recorder, None
+        recorder.close()
+        return recorder.report()
     
     def returnparameters(self):
         c = 3e8
@@ -286,26 +542,67 @@ class RadarDevice:
     def transmit(self):
         self.sdr.tx([self.iq * 0.5, self.iq])  # only send data to the 2nd channel (that's all we need)
     
-    def receive(self, index):
+    def receive(self, index, out=None):
+        """ next buffer from the device, written into out (a preallocated frame buffer) if given """
         self.currentindex = index
         start = timer()
         x = self.sdr.rx() #1024 size array of complex
         rxt = timer()
-        timedelta=rxt-start
+        timestamp = time.time()
+        cdtype, rdtype = getdtypes()
         if self.Rx_CHANNEL==2:
             data0=x[0]
             data1=x[1]
-            data = data0 + data1
+            n = len(data0)
+            if self.channelmode == "sum":
+                data = np.add(data0, data1, dtype=cdtype, out=out[:n] if out is not None else None)
+            else:
+                #one pass per output row straight from the rx() buffers, no intermediate copies
+                data = out[..., :n] if out is not None else np.empty((2, n), dtype=cdtype)
+                if self.channelmode == "dual":
+                    np.copyto(data[0], data0, casting="same_kind")
+                    np.copyto(data[1], data1, casting="same_kind")
+                else:
+                    np.add(data0, data1, dtype=cdtype, out=data[0])
+                    np.subtract(data0, data1, dtype=cdtype, out=data[1])
         else:
-            data=x
-        datalen=len(data.real)
-        datarate=datalen*4/timedelta/1e6 #Mbps, complex data is 4bytes
-        print("Data rate at ", datarate, "Mbps.") #7-8Mbps in 10240 points, 10Mbps in 102400points, single channel in 19-20Mbps
+            data=todtype(x)
+            if out is not None:
+                out[:len(data)] = data
+                data = out[:len(data)]
+        datalen=data.shape[-1]
+        self.metrics.record(start, rxt, datalen)
+        if self.recorder is not None:
+            if data.ndim == 2: #recordings hold the sum channel, like channelmode "sum"
+                summed = data[0] if self.channelmode == "sumdelta" else np.add(data[0], data[1])
+            else:
+                summed = data
+            self.recorder.write(summed, timestamp=timestamp - datalen / self.samplerate, #time of the first sample
+                                rxgain=self.rxgain, steering=self.steering, dropped=self.metrics.dropped)
         self.currentindex = self.currentindex +1
         return data, datalen, self.currentindex
     
+def replaycheck(datapath, replay="realtime", speed=1.0, nframes=100, rxbuffersize=1024*16*15):
+    """ replay a capture through the GUI processing chain (spectrum, range-Doppler, CFAR) and report
+        whether it keeps up: in realtime mode any late or dropped frame means it would fall behind the device
+    """
+    radar = RadarData(datapath=datapath, rxbuffersize=rxbuffersize, readahead=4, replay=replay, speed=speed)
+    c, BW, num_steps, ramp_time_s, slope, N_c, N_s, freq, dist, range_resolution, signal_freq, range_x = radar.returnparameters()
+    index = 0
+    for r in range(nframes):
+        data, datalen, index = radar.receive(index)
+        spectrumprocessor.process(data, radar.samplerate)
+        rd, _ = rangedoppler(data, n_c=N_c, n_s=N_s, showdb=True)
+        cfar2d(rd, method='ca', threshold_db=15)
+    stats = radar.clock.report(radar.rxbuffersize)
+    radar.close()
+    return stats
+
 def main():
     args = parser.parse_args()
+    if args.replay:
+        replaycheck(args.output, args.replay, args.speed, args.frames)
+        return
     phaserurladdress = args.phaserurladdress #urladdress #"ip:pluto.local"
     ad9361urladdress = args.ad9361urladdress
     Rx_CHANNEL = args.rxch
@@ -350,12 +647,17 @@ def main():
     range_x = (100e3) * c / (4 * slope) #15
     #0, range_x or frequency 100e3, 200e3
 
-    # Collect data
-    alldata0 = np.empty(0, dtype=np.complex_) #Default is numpy.float64.
+    # Collect data, appended to the capture file buffer by buffer
+    metadata = {"samplerate": float(fs), "center_freq": center_freq, "signal_freq": signal_freq, "BW": float(BW),
+                "ramp_time_s": float(ramp_time_s), "num_steps": int(num_steps), "rxbuffersize": fft_size, "rxchannels": Rx_CHANNEL}
+    recorder = CaptureRecorder(args.output, mode=args.recordmode, dtype=np.int16 if args.format == 'iq16' else args.format,
+                               metadata=metadata, threaded=True)
+    rxgain = (float(sdr.rx_hardwaregain_chan0), float(sdr.rx_hardwaregain_chan1))
+    metrics = RxMetrics(fs, logperiod=args.metricsperiod)
     rxtime=[]
     processtime=[]
-    Nperiod=int(5*fs/fft_size) #total time 10s *fs=total samples /fft_size = Number of frames
-    print("Total period for 5s:", Nperiod) #73
+    Nperiod=int(args.duration*fs/fft_size) #total time *fs=total samples /fft_size = Number of frames
+    print("Total period for %ss:" % args.duration, Nperiod) #73 for 5s
     for r in range(Nperiod):
         start = timer()
         x = sdr.rx() #1024 size array of complex
@@ -368,20 +670,18 @@ def main():
             data = data0 + data1
         else:
             data=x
-        datarate=len(data.real)*4/timedelta/1e6 #Mbps, complex data is 4bytes
-        print("Data rate at ", datarate, "Mbps.") #7-8Mbps in 10240 points, 10Mbps in 102400points, single channel in 19-20Mbps
-        alldata0 = np.concatenate((alldata0, data))
-
-        readiio(sdr)
+        #overflows: buffers flagged by the ad9361 overflow status bit, counted before this buffer is indexed
+        metrics.record(start, rxt, len(data), overflow=readiio(sdr))
+        recorder.write(data, rxgain=rxgain, steering=0.0, dropped=metrics.overflows)
         endtime = timer()
         processtime.append(endtime-start)
     
         # Stop transmitting
     sdr.tx_destroy_buffer() #Clears TX buffer
     sdr.rx_destroy_buffer() #Clears RX buffer
-    with open('./data/radardata5s-1101fast4move.npy', 'wb') as f:
-        np.save(f, alldata0)
-    print(len(alldata0)) #1196032
+    recorder.close()
+    recorder.report() #1196032 samples
+    metrics.report()
 # piuri="ip:phaser.local:50901"
 # localuri="ip:analog.local"
 # antsdruri="ip:192.168.1.10"#connected via Ethernet with static IP
@@ -401,6 +701,22 @@ parser.add_argument('--signal', default="dds", type=str,
                     help='signal type: sinusoid, dds')
 parser.add_argument('--plot', default=False, type=bool,
                     help='plot figure')
+parser.add_argument('--duration', default=5, type=float,
+                    help='capture time in seconds')
+parser.add_argument('--output', default='./data/radardata5s-1101fast4move.npy', type=str,
+                    help='capture file')
+parser.add_argument('--metricsperiod', default=1.0, type=float,
+                    help='seconds between acquisition metrics reports')
+parser.add_argument('--recordmode', default='npy', type=str,
+                    help='npy: one appendable file, chunks: rotating chunk files, blocks: compressed blocks')
+parser.add_argument('--format', default='iq16', type=str,
+                    help='stored samples: iq16 (int16 IQ), complex64, complex128')
+parser.add_argument('--replay', default=None, type=str,
+                    help='instead of capturing, replay --output through the processing chain: realtime, accelerated, max')
+parser.add_argument('--speed', default=1.0, type=float,
+                    help='replay speed for --replay accelerated, multiple of real time')
+parser.add_argument('--frames', default=100, type=int,
+                    help='frames to replay')
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -13,7 +13,8 @@ import pyqtgraph as pg
 from PyQt5 import QtCore, QtWidgets
 from pyqtgraph import GraphicsLayoutWidget, PlotWidget, plot
 from scipy import signal
-from scipy.fftpack import fft
+
+import fftbackend  # on the path when run from sdradi: python -m otheradis.adiplot
 
 try:
     import genalyzer
@@ -261,8 +262,8 @@ class ADIPlotter(object):
             else:
                 all_results = None
 
-            sp_data = np.fft.fft(wf_data)
-            sp_data = np.abs(np.fft.fftshift(sp_data)) / self.stream.rx_buffer_size
+            sp_data = fftbackend.fft(wf_data)
+            sp_data = np.abs(fftbackend.fftshift(sp_data)) / self.stream.rx_buffer_size
             sp_data = 20 * np.log10(sp_data / (2 ** 11))
 
             self.set_plotdata(name="spectrum", data_x=self.f, data_y=sp_data)
@@ -1,5 +1,6 @@
 
 # Imports
+#run from sdradi: python -m phaser.RADAR_FFT_Waterfall
 import sys
 import time
 import warnings
@@ -11,14 +12,17 @@ import numpy as np
 import pyqtgraph as pg
 from matplotlib import cm
 from numpy import arange, cos, log10, pi, sin
-from numpy.fft import fft, fft2, fftshift, ifft2, ifftshift
 from PyQt5.QtCore import Qt
 from PyQt5.QtSvg import QSvgWidget
 from PyQt5.QtWidgets import *
 from pyqtgraph.Qt import QtCore, QtGui
 from scipy import interpolate, signal
-import mycn0566 as mycn0566
+import phaser.mycn0566 as mycn0566
 CN0566=mycn0566.CN0566
+from fftbackend import fft, fft2, fftshift, ifft2, ifftshift
+from processing import SpectrumProcessor, DigitalDownConverter, setprecision, getdtypes
+from capture import CaptureRecorder
+setprecision("single") #complex64/float32 spectrum and waterfall, Pluto ADC is 12bit
 
 mpl.rcParams["mathtext.fontset"] = "cm"
 warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -85,7 +89,7 @@ center_freq = 2.1e9 #2.1G
 signal_freq = 100e3 #100K
 num_slices = 200
 fft_size = 1024 * 16
-img_array = np.zeros((num_slices, fft_size))
+img_array = np.zeros((num_slices, fft_size), dtype=getdtypes()[1])
 
 # Create radio.
 # This script is for Pluto Rev C, dual channel setup
@@ -170,10 +174,21 @@ i = np.cos(2 * np.pi * t * fc) * 2 ** 14
 q = np.sin(2 * np.pi * t * fc) * 2 ** 14
 iq = 1 * (i + 1j * q)
 
-fc = int(300e3 / (fs / N)) * (fs / N) #300KHz
-i = np.cos(2 * np.pi * t * fc) * 2 ** 14
-q = np.sin(2 * np.pi * t * fc) * 2 ** 14
-iq_300k = 1 * (i + 1j * q)
+spectrumprocessor = SpectrumProcessor(window="blackman", shift_freq=300e3) #window and 300KHz shift cached per frame size
+
+#Waterfall from a streaming DDC instead of the 300KHz shift: IF (signal_freq) to 0Hz with a phase-continuous NCO,
+#decimated by 4 around the beat band (0.6MS/s -> 150kS/s), so each waterfall row is 4x shorter
+UseDDC = True
+ddc = DigitalDownConverter(fs=fs, if_freq=signal_freq, decimation=4)
+waterfall_size = int(N / ddc.decimation) if UseDDC else N
+waterfall_offset = 20 * np.log10(2 ** 14)  # level of the old 2**14 amplitude carrier, keeps the slider levels
+
+#Record every received buffer to disk while the GUI runs, e.g. "./data/waterfallrecord.npy"
+record_path = None
+record_metadata = {"samplerate": float(fs), "center_freq": center_freq, "signal_freq": signal_freq, "BW": BW,
+                   "ramp_time_s": ramp_time_s, "num_steps": num_steps, "rxbuffersize": N, "rxchannels": 2}
+recorder = CaptureRecorder(record_path, metadata=record_metadata, threaded=True) if record_path else None
+steering_phase = 0.0 #beam phase difference set by the steer slider, saved in the recording index
 
 # Send data
 my_sdr._ctx.set_timeout(0)
@@ -324,7 +339,11 @@ class Window(QMainWindow):
         self.waterfall.addItem(self.imageitem)
         # self.imageitem.scale(0.35, sample_rate / (N))  # this is deprecated -- we have to use setTransform instead
         tr = QtGui.QTransform()
-        tr.scale(0.35, sample_rate / (N))
+        if UseDDC:
+            tr.translate(0, signal_freq - ddc.fs_out / 2)  # row 0 is IF - fs_out/2
+            tr.scale(0.35, ddc.fs_out / waterfall_size)
+        else:
+            tr.scale(0.35, sample_rate / (N))
         self.imageitem.setTransform(tr)
         # # color map
         # colors = [
@@ -345,7 +364,7 @@ class Window(QMainWindow):
         self.waterfall.setLabel("left", "Frequency", units="Hz")
         self.waterfall.setLabel("bottom", "Time", units="sec")
         layout.addWidget(self.waterfall, 0 + self.num_rows + 1, 2, self.num_rows, 1)
-        self.img_array = np.zeros((num_slices, fft_size))
+        self.img_array = np.zeros((num_slices, waterfall_size), dtype=getdtypes()[1])
 
         widget.setLayout(layout)
         # setting this widget as central widget of the main window
@@ -388,6 +407,8 @@ class Window(QMainWindow):
             / (3e8)
         )
         my_phaser.set_beam_phase_diff(np.degrees(phase_delta))
+        global steering_phase
+        steering_phase = float(np.degrees(phase_delta))
 
     def set_range_res(self):
         """ Sets the RF bandwidth
@@ -449,21 +470,15 @@ def update():
 
     data = my_sdr.rx() #16384
     data = data[0] + data[1]
-    win_funct = np.blackman(len(data))
-    y = data * win_funct
-    sp = np.absolute(np.fft.fft(y))
-    sp = np.fft.fftshift(sp)
-    s_mag = np.abs(sp) / np.sum(win_funct)
-    s_mag = np.maximum(s_mag, 10 ** (-15))
-    s_dbfs = 20 * np.log10(s_mag / (2 ** 11))
+    if recorder is not None:
+        recorder.write(data, rxgain=(my_sdr.rx_hardwaregain_chan0, my_sdr.rx_hardwaregain_chan1), steering=steering_phase)
     """there's a scaling issue on the y-axis of the waterfallcthe data is off by 300kHz.  To fix, I'm just shifting the freq"""
-    data_shift = data * iq_300k
-    y = data_shift * win_funct
-    sp = np.absolute(np.fft.fft(y))
-    sp = np.fft.fftshift(sp)
-    s_mag = np.abs(sp) / np.sum(win_funct)
-    s_mag = np.maximum(s_mag, 10 ** (-15))
-    s_dbfs_shift = 20 * np.log10(s_mag / (2 ** 11))
+    if UseDDC:
+        #the waterfall shows the DDC output, the full rate spectrum is only needed for the FFT plot
+        s_dbfs = spectrumprocessor.spectrum(data, fs)
+        s_dbfs_shift = spectrumprocessor.spectrum(ddc.process(data), ddc.fs_out) + waterfall_offset
+    else:
+        s_dbfs, s_dbfs_shift = spectrumprocessor.process(data, fs)
 
     if plot_dist:
         win.fft_curve.setData(dist, s_dbfs)
@@ -487,4 +502,8 @@ timer.timeout.connect(update)
 timer.start(0) #A QTimer with a timeout interval of 0 will time out as soon as all the events in the window system's event queue have been processed.
 
 # start the app
-sys.exit(App.exec())
+status = App.exec()
+if recorder is not None:
+    recorder.close()
+    recorder.report()
+sys.exit(status)
@@ -11,9 +11,9 @@ import matplotlib.pyplot as plt
 import numpy as np
 from adi import ad9361
 #from adi.cn0566 import CN0566
-import mycn0566 as mycn0566
+import phaser.mycn0566 as mycn0566
 CN0566=mycn0566.CN0566
-from phaser_functions import (
+from phaser.phaser_functions import (
     calculate_plot,
     channel_calibration,
     gain_calibration,
@@ -23,13 +23,13 @@ from phaser_functions import (
 from scipy import signal
 
 try:
-    import config_custom as config  # this has all the key parameters that the user would want to change (i.e. calibration phase and antenna element spacing)
+    from phaser import config_custom as config  # this has all the key parameters that the user would want to change (i.e. calibration phase and antenna element spacing)
 
     print("Found custom config file")
 except:
     print("Didn't find custom config, looking for default.")
     try:
-        import config as config
+        from phaser import config as config
     except:
         print("Make sure config.py is in this directory")
         sys.exit(0)
@@ -10,8 +10,8 @@ import numpy as np
 from adi import ad9361
 import adi
 #from adi.cn0566 import CN0566
-import mycn0566 as mycn0566
-from phaser_functions import save_hb100_cal, spec_est
+import phaser.mycn0566 as mycn0566
+from phaser.phaser_functions import save_hb100_cal, spec_est
 from scipy import signal
 
 CN0566=mycn0566.CN0566
@@ -1,4 +1,5 @@
 # Utility functions for CN0566 Phaser
+# imports the sdradi modules, so the scripts using it run from sdradi: python -m phaser.phaser_gui
 
 import pickle
 from time import sleep
@@ -16,9 +17,14 @@ from numpy import (
     multiply,
     pi,
 )
-from numpy.fft import fft, fftfreq, fftshift
 from scipy import signal
 
+import fftbackend
+from fftbackend import fft, fftfreq, fftshift
+from rxsettle import SettledRx
+
+KERNELBUFFERS = 1  # SDR_init sets one kernel buffer, the flushing rx() these measurements used read one more
+
 
 def to_sup(angle):
     """ Return suplimentary angle if greater than 180 degrees. """
@@ -36,7 +42,7 @@ def find_peak_bin(cn0566, verbose=False):
     cn0566.set_beam_phase_diff(0.0)
     data = cn0566.sdr.rx()  # read a buffer of data
     y_sum = (data[0] + data[1]) * win
-    s_sum = np.fft.fftshift(np.absolute(np.fft.fft(y_sum)))
+    s_sum = fftbackend.fftshift(np.absolute(fftbackend.fft(y_sum)))
     return np.argmax(s_sum)
 
 
@@ -120,8 +126,8 @@ def calculate_plot(cn0566, gcal_element=0, cal_element=0):
             )  # read a buffer of data from Pluto using pyadi-iio library (adi.py)
             y_sum = (data[0] + data[1]) * win
             y_delta = (data[0] - data[1]) * win
-            s_sum = np.fft.fftshift(np.absolute(np.fft.fft(y_sum)))
-            s_delta = np.fft.fftshift(np.absolute(np.fft.fft(y_delta)))
+            s_sum = fftbackend.fftshift(np.absolute(fftbackend.fft(y_sum)))
+            s_delta = fftbackend.fftshift(np.absolute(fftbackend.fft(y_delta)))
             total_angle = total_angle + (
                 np.angle(s_sum[np.argmax(s_sum)]) - np.angle(s_delta[np.argmax(s_sum)])
             )
@@ -173,8 +179,8 @@ def calculate_plot(cn0566, gcal_element=0, cal_element=0):
         diff_error.append(target_error)
 
     y = data_fft * win
-    sp = np.absolute(np.fft.fft(y))
-    sp = np.fft.fftshift(sp)
+    sp = np.absolute(fftbackend.fft(y))
+    sp = fftbackend.fftshift(sp)
     s_mag = (
         np.abs(sp) * 2 / np.sum(win)
     )  # Scale FFT by window and /2 since we are using half the FFT spectrum
@@ -183,8 +189,8 @@ def calculate_plot(cn0566, gcal_element=0, cal_element=0):
         s_mag / (2 ** 12)
     )  # Pluto is a 12 bit ADC, so use that to convert to dBFS
     ts = 1 / float(cn0566.sdr.sample_rate)
-    xf = np.fft.fftfreq(NumSamples, ts)
-    xf = np.fft.fftshift(xf)  # this is the x axis (freq in Hz) for our fft plot
+    xf = fftbackend.fftfreq(NumSamples, ts)
+    xf = fftbackend.fftshift(xf)  # this is the x axis (freq in Hz) for our fft plot
     # Return values/ parameter based on Calibration Flag status
 
     return gain, angle, delta, diff_error, beam_phase, xf, max_gain, PhaseValues
@@ -290,6 +296,7 @@ def measure_channel_gains(
     plot_data = []
     channel_level = []
     cn0566.set_rx_hardwaregain(6, False)
+    acq = SettledRx(cn0566.sdr, KERNELBUFFERS)
     for channel in range(0, 2):
         # Start with sdr CH0 elements
         cn0566.set_all_gain(0, apply_cal=False)  # Start with all gains set to zero
@@ -308,7 +315,7 @@ def measure_channel_gains(
             (1 - channel) * 4 + 3, 127, apply_cal=False
         )  # Set element to max
 
-        sleep(1.0)  # todo - remove when driver fixed to compensate for ADAR1000 quirk
+        acq.changed(settle=True)  # wait out the ADAR1000 gain quirk instead of a fixed sleep
         if verbose:
             print("measuring channel ", channel)
         total_sum = 0
@@ -319,11 +326,10 @@ def measure_channel_gains(
         for count in range(
             0, cn0566.Averages
         ):  # repeatsnip loop and average the results
-            data = cn0566.sdr.rx()  # todo - remove once confirmed no flushing necessary
-            data = cn0566.sdr.rx()  # read a buffer of data
+            data = acq.rx()  # read a buffer of data
             y_sum = (data[0] + data[1]) * win
 
-            s_sum = np.fft.fftshift(np.absolute(np.fft.fft(y_sum)))
+            s_sum = fftbackend.fftshift(np.absolute(fftbackend.fft(y_sum)))
             spectrum += s_sum
 
             # Look for peak value within window around fundamental (reject interferers)
@@ -357,7 +363,8 @@ def measure_element_gain(
     cn0566.set_rx_hardwaregain(6)  # Channel calibration defaults to True
     cn0566.set_all_gain(0, apply_cal=False)  # Start with all gains set to zero
     cn0566.set_chan_gain(cal, 127, apply_cal=False)  # Set element to max
-    sleep(1.0)  # todo - remove when driver fixed to compensate for ADAR1000 quirk
+    acq = SettledRx(cn0566.sdr, KERNELBUFFERS)
+    acq.changed(settle=True)  # wait out the ADAR1000 gain quirk instead of a fixed sleep
     if verbose:
         print("measuring element: ", cal)
     total_sum = 0
@@ -367,11 +374,10 @@ def measure_element_gain(
     spectrum = np.zeros(cn0566.sdr.rx_buffer_size)
 
     for count in range(0, cn0566.Averages):  # repeatsnip loop and average the results
-        data = cn0566.sdr.rx()  # todo - remove once confirmed no flushing necessary
-        data = cn0566.sdr.rx()  # read a buffer of data
+        data = acq.rx()  # read a buffer of data
         y_sum = (data[0] + data[1]) * win
 
-        s_sum = np.fft.fftshift(np.absolute(np.fft.fft(y_sum)))
+        s_sum = fftbackend.fftshift(np.absolute(fftbackend.fft(y_sum)))
         spectrum += s_sum
 
         # Look for peak value within window around fundamental (reject interferers)
@@ -402,9 +408,10 @@ def phase_cal_sweep(cn0566, peak_bin, ref=0, cal=1):
     cn0566.set_all_gain(0)  # Reset all elements to zero
     cn0566.set_chan_gain(ref, 127, apply_cal=True)  # Set two adjacent elements to zero
     cn0566.set_chan_gain(cal, 127, apply_cal=True)
-    sleep(1.0)
+    acq = SettledRx(cn0566.sdr, KERNELBUFFERS)
 
     cn0566.set_chan_phase(ref, 0.0, apply_cal=False)  # Reference element
+    acq.changed(settle=True)
     # win = np.blackman(cn0566.sdr.rx_buffer_size)
     win = signal.windows.flattop(cn0566.sdr.rx_buffer_size)  # Super important!
     win /= np.average(np.abs(win))  # Normalize to unity gain
@@ -417,12 +424,12 @@ def phase_cal_sweep(cn0566, peak_bin, ref=0, cal=1):
     for phase in PhaseValues:  # These sweeps phase value from -180 to 180
         # set Phase of channels based on Calibration Flag status and calibration element
         cn0566.set_chan_phase(cal, phase, apply_cal=False)
+        acq.changed()
         total_sum = 0
         for count in range(0, cn0566.Averages):  # repeat loop and average the results
-            data = cn0566.sdr.rx()  # read a buffer of data
-            data = cn0566.sdr.rx()
+            data = acq.rx()  # read a buffer of data
             y_sum = (data[0] + data[1]) * win
-            s_sum = np.fft.fftshift(np.absolute(np.fft.fft(y_sum)))
+            s_sum = fftbackend.fftshift(np.absolute(fftbackend.fft(y_sum)))
 
             # Pick (uncomment) one:
             # 1) RSS sum a few bins around max
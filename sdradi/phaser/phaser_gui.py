@@ -12,21 +12,22 @@ from tkinter import ttk
 import adi
 import matplotlib.pyplot as plt
 import numpy as np
-from ADAR_pyadi_functions import *  # import the ADAR1000 functions (These all start with ADAR_xxxx)
+from phaser.ADAR_pyadi_functions import *  # import the ADAR1000 functions (These all start with ADAR_xxxx)
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 from matplotlib.widgets import Cursor
-from phaser_functions import load_hb100_cal
+from phaser.phaser_functions import load_hb100_cal
+import fftbackend
 from scipy import signal
-from SDR_functions import *  # import the SDR functions (These all start with SDR_xxxx)
+from phaser.SDR_functions import *  # import the SDR functions (These all start with SDR_xxxx)
 
 try:
-    import config_custom as config  # this has all the key parameters that the user would want to change (i.e. calibration phase and antenna element spacing)
+    from phaser import config_custom as config  # this has all the key parameters that the user would want to change (i.e. calibration phase and antenna element spacing)
 
     print("Found custom config file")
 except:
     print("Didn't find custom config, looking for default.")
     try:
-        import config as config
+        from phaser import config as config
     except:
         print("Make sure config.py is in this directory")
         sys.exit(0)
@@ -1857,12 +1858,12 @@ class App:
             dig_Beam0_phase = np.deg2rad(self.Beam0_Phase_set.get())
             dig_Beam1_phase = np.deg2rad(self.Beam1_Phase_set.get())
             if dig_Beam0_phase != 0:
-                chan1_fft_shift = np.fft.fft(chan1) * np.exp(1.0j * dig_Beam0_phase)
-                chan1 = np.fft.ifft(chan1_fft_shift, n=NumSamples)
+                chan1_fft_shift = fftbackend.fft(chan1) * np.exp(1.0j * dig_Beam0_phase)
+                chan1 = fftbackend.ifft(chan1_fft_shift, n=NumSamples)
                 chan1 = chan1[0:NumSamples]
             if dig_Beam1_phase != 0:
-                chan2_fft_shift = np.fft.fft(chan2) * np.exp(1.0j * dig_Beam1_phase)
-                chan2 = np.fft.ifft(chan2_fft_shift, n=NumSamples)
+                chan2_fft_shift = fftbackend.fft(chan2) * np.exp(1.0j * dig_Beam1_phase)
+                chan2 = fftbackend.ifft(chan2_fft_shift, n=NumSamples)
                 chan2 = chan2[0:NumSamples]
 
             sum_chan = chan1 + chan2
@@ -2074,8 +2075,8 @@ class App:
         NumSamples = len(data_fft)  # number of samples
         win = np.blackman(NumSamples)
         y = data_fft * win
-        sp = np.absolute(np.fft.fft(y))
-        sp = np.fft.fftshift(sp)
+        sp = np.absolute(fftbackend.fft(y))
+        sp = fftbackend.fftshift(sp)
         s_mag = np.abs(sp) / np.sum(
             win
         )  # Scale FFT by window and /2 since we are using half the FFT spectrum
@@ -2084,8 +2085,8 @@ class App:
             s_mag / (2 ** 11)
         )  # Pluto is a 12 bit ADC, but we're only looking at positive #'s, so use 2**11
         ts = 1 / float(self.SampleRate)
-        self.xf = np.fft.fftfreq(NumSamples, ts)
-        self.xf = np.fft.fftshift(
+        self.xf = fftbackend.fftfreq(NumSamples, ts)
+        self.xf = fftbackend.fftshift(
             self.xf
         )  # this is the x axis (freq in Hz) for our fft plot
 
@@ -9,13 +9,14 @@ import matplotlib.pyplot as plt
 import numpy as np
 from adi import ad9361
 from adi.cn0566 import CN0566
-from phaser_functions import (
+from phaser.phaser_functions import (
     calculate_plot,
     channel_calibration,
     gain_calibration,
     get_signal_levels,
     phase_calibration,
 )
+from rxsettle import SettledRx
 from scipy import signal
 
 start = time.time()
@@ -301,14 +302,14 @@ with open(filename, "w") as f:
 do_plot = (
     False  # Do a plot just for debug purposes. Suppress for actual production test.
 )
+acq = SettledRx(my_sdr, kernelbuffers=1)  # one kernel buffer, set up above
 
 while do_plot == True:
 
     start = time.time()
     my_phaser.set_beam_phase_diff(0.0)
-    time.sleep(0.25)
-    data = my_sdr.rx()
-    data = my_sdr.rx()
+    acq.changed(settle=True)
+    data = acq.rx()
     ch0 = data[0]
     ch1 = data[1]
     f, Pxx_den0 = signal.periodogram(
@@ -2,57 +2,520 @@ import numpy as np
 from scipy import ndimage
 from timeit import default_timer as timer
 from scipy import signal
+from collections import OrderedDict
+import fftbackend
+
+#pipeline-wide sample precision, "double": complex128/float64, "single": complex64/float32
+#(Pluto ADC is 12bit, single precision halves memory traffic). scipy/pyfftw FFT backends keep single precision.
+PRECISIONS = {"double": (np.complex128, np.float64), "single": (np.complex64, np.float32)}
+precision = "double"
+
+def setprecision(mode):
+    global precision
+    if mode not in PRECISIONS:
+        raise ValueError("precision must be one of %s" % list(PRECISIONS))
+    precision = mode
+
+def getdtypes(mode=None):
+    """ returns (complex dtype, real dtype) of the current or given precision """
+    return PRECISIONS[precision if mode is None else mode]
+
+def todtype(data, mode=None):
+    """ cast samples to the pipeline precision, no copy if already there """
+    cdtype, rdtype = getdtypes(mode)
+    data = np.asarray(data)
+    return data.astype(cdtype if np.iscomplexobj(data) else rdtype, copy=False)
 
 def extenddata(data, zoom=(20,5)):
     resampled_data=ndimage.zoom(data, zoom=(20,5))
     return resampled_data
 
-def showspectrum(data, fs):
-    # fc = int(100e3 / (fs / N_frame)) * (fs / N_frame) #300KHz
-    # ts =1.0/fs
-    # t = np.arange(0, N_frame * ts, ts)
-    # i = np.cos(2 * np.pi * t * fc) * 2 ** 14
-    # q = np.sin(2 * np.pi * t * fc) * 2 ** 14
-    # iq_100k = 1 * (i + 1j * q)
-    #data=data[0:N_frame] #* iq_100k
-    N_frame = len(data)
-    win_funct = np.blackman(len(data))
-    y = data * win_funct
-    sp = np.absolute(np.fft.fft(y))
-    sp = np.fft.fftshift(sp)
-    s_mag = np.abs(sp) / np.sum(win_funct)
-    s_mag = np.maximum(s_mag, 10 ** (-15))
-    s_dbfs = 20 * np.log10(s_mag / (2 ** 11))
+class SpectrumProcessor:
+    """ Reusable dBFS spectrum of rx frames. The window, its normalization and the integer bin shift
+        of the 300kHz frequency-shifted copy are cached per (N, fs, window) with LRU eviction, so each
+        call is a single FFT: the shifted spectrum is a circular roll of the first one.
+    """
+    def __init__(self, window='blackman', shift_freq=300e3, fullscale=2**11, maxcache=8):
+        self.window = window
+        self.shift_freq = shift_freq
+        self.fullscale = fullscale #12bit ADC, dBFS reference
+        self.maxcache = maxcache
+        self.cache = OrderedDict()
+
+    def getplan(self, N, fs, window=None):
+        window = self.window if window is None else window
+        cdtype, rdtype = getdtypes()
+        key = (int(N), float(fs), window, precision)
+        plan = self.cache.get(key)
+        if plan is not None:
+            self.cache.move_to_end(key)
+            return plan
+        win_funct = signal.get_window(window, int(N), fftbins=False).astype(rdtype) #symmetric, same as np.blackman(N)
+        shift_bins = int(self.shift_freq / (fs / N)) #fc = shift_bins * (fs / N)
+        plan = (win_funct, np.sum(win_funct) * self.fullscale, shift_bins)
+        self.cache[key] = plan
+        if len(self.cache) > self.maxcache:
+            self.cache.popitem(last=False)
+        return plan
+
+    def spectrum(self, data, fs, window=None):
+        """ returns s_dbfs alone, fftshifted (e.g. the decimated DDC output, no shifted copy needed) """
+        data = todtype(data)
+        win_funct, norm, shift_bins = self.getplan(len(data), fs, window)
+        sp = fftbackend.fftshift(fftbackend.fft(data * win_funct))
+        s_mag = np.abs(sp)
+        s_mag /= norm
+        np.maximum(s_mag, 10 ** (-15) / self.fullscale, out=s_mag)
+        return 20 * np.log10(s_mag)
 
+    def process(self, data, fs, window=None):
+        """ returns s_dbfs and s_dbfs_shift (spectrum shifted by shift_freq), both fftshifted """
+        s_dbfs = self.spectrum(data, fs, window)
+        shift_bins = self.getplan(len(s_dbfs), fs, window)[2]
+        #old code multiplied by a 2**14 amplitude carrier before the FFT, keep that level for the waterfall
+        s_dbfs_shift = np.roll(s_dbfs, shift_bins)
+        s_dbfs_shift += s_dbfs.dtype.type(20 * np.log10(2 ** 14))
+        return s_dbfs, s_dbfs_shift
+
+spectrumprocessor = SpectrumProcessor()
+
+def showspectrum(data, fs):
     """there's a scaling issue on the y-axis of the waterfallcthe data is off by 300kHz.  To fix, I'm just shifting the freq"""
-    fc = int(300e3 / (fs / N_frame)) * (fs / N_frame) #300KHz
-    ts =1.0/fs
-    t = np.arange(0, N_frame * ts, ts)
-    i = np.cos(2 * np.pi * t * fc) * 2 ** 14
-    q = np.sin(2 * np.pi * t * fc) * 2 ** 14
-    iq_300k = 1 * (i + 1j * q)
-    data_shift = data * iq_300k
-    y = data_shift * win_funct
-    sp = np.absolute(np.fft.fft(y))
-    sp = np.fft.fftshift(sp)
-    s_mag = np.abs(sp) / np.sum(win_funct)
-    s_mag = np.maximum(s_mag, 10 ** (-15))
-    s_dbfs_shift = 20 * np.log10(s_mag / (2 ** 11))
-    return s_dbfs, s_dbfs_shift
-
-
-def rangedoppler(data, n_c=150, n_s=600, showdb=True):
-    #n_s = 600
-    #n_r = int(len(data)/n_s)-1
-    table = np.zeros((n_c, n_s), dtype=np.complex_) #150 chirps,1000 samples/chirp
-    for chirp_nr in range(n_c):
-        table[chirp_nr, :] = data[(chirp_nr*n_s):(n_s*(chirp_nr+1))]
-    #fft_output = np.fft.fft2(table)
-    #2D FFT and Velocity-Distance Relationship
-    Z_fft2 = abs(np.fft.fft2(table)) #
+    return spectrumprocessor.process(data, fs)
+
+
+def rangedoppler(data, n_c=150, n_s=600, showdb=True, fulldoppler=False, complexout=False):
+    """ Range-Doppler map of one frame (N,) or a stack of frames (F, N) / (F, n_c, n_s).
+        Multichannel frames (2, N) or (F, 2, N) from RadarDevice(channelmode="dual"/"sumdelta") give
+        one map per channel in the same batched FFTs.
+        The chirp table is a reshaped view of data (no chirp loop, no copy), and only the half
+        spectrum that is returned is computed: range bins 0:n_s/2, Doppler bins 0:n_c/2
+        (all n_c Doppler bins if fulldoppler). Real input uses rfft for the range axis.
+        complexout: return the complex 2D FFT (phase kept, for monopulse()) instead of its magnitude
+        returns (Data_fft2, table), shapes (..., n_c/2, n_s/2) and (..., n_c, n_s)
+    """
+    data = np.asarray(data)
+    if data.shape[-2:] == (n_c, n_s):
+        table = data
+    else:
+        table = data[..., :n_c*n_s].reshape(data.shape[:-1] + (n_c, n_s)) #150 chirps,600 samples/chirp
+    table = todtype(table)
+    #2D FFT and Velocity-Distance Relationship, range axis first then Doppler over the kept range bins
+    if np.iscomplexobj(table):
+        range_fft = fftbackend.fft(table, axis=-1)[..., 0:int(n_s/2)]
+    else:
+        range_fft = fftbackend.rfft(table, axis=-1)[..., 0:int(n_s/2)]
+    Z_fft2 = fftbackend.fft(range_fft, axis=-2)
+    if not fulldoppler:
+        Z_fft2 = Z_fft2[..., 0:int(n_c/2), :] #get half
+    if complexout:
+        return Z_fft2, table
+    Data_fft2 = np.abs(Z_fft2)
+    if showdb:
+        Data_fft2 /= n_c #power spectrum
+        np.log10(Data_fft2, out=Data_fft2)
+        Data_fft2 *= 20
+    return Data_fft2, table
+
+def monopulse(data, n_c=150, n_s=600, channelmode="sumdelta", showdb=True, fulldoppler=False,
+              spacing=4*0.014, freq=10.25e9):
+    """ Sum map and per-cell angle of arrival from a two-channel frame (2, N) or stack (F, 2, N).
+        channelmode: "dual", data[0]/data[1] are the two subarrays (phase comparison);
+        "sumdelta", data[0]/data[1] are their sum and difference (D/S = j*tan(phase/2))
+        spacing: distance between the subarray phase centres (4 elements of 14mm), freq: RF centre of the ramp
+        returns (sum map like rangedoppler(), angle map in degrees), shapes (..., n_c/2, n_s/2)
+    """
+    Z_fft2, _ = rangedoppler(data, n_c=n_c, n_s=n_s, fulldoppler=fulldoppler, complexout=True)
+    Z0, Z1 = Z_fft2[..., 0, :, :], Z_fft2[..., 1, :, :]
+    #phase lag of channel 0 (elements 5-8) behind channel 1 (elements 1-4), positive angles like the steering slider
+    if channelmode == "dual":
+        S = Z0 + Z1
+        phase = np.angle(Z1 * np.conj(Z0))
+    elif channelmode == "sumdelta":
+        S = Z0
+        phase = -2 * np.arctan2((Z1 * np.conj(Z0)).imag, np.abs(Z0) ** 2)
+    else:
+        raise ValueError("channelmode must be dual or sumdelta")
+    #phase difference between the subarrays -> angle, same relation as the steering slider
+    sinangle = phase * 3e8 / (2 * np.pi * freq * spacing)
+    np.clip(sinangle, -1, 1, out=sinangle)
+    angle = np.degrees(np.arcsin(sinangle))
+    Data_fft2 = np.abs(S)
     if showdb:
-        s_mag = np.abs(Z_fft2)/len(Z_fft2) #power spectrum
-        Z_fft2 = 20 * np.log10(s_mag)
-    #Data_fft2 = Z_fft2[0:int(n_r/2),0:int(n_s/2)] #get half
-    Data_fft2 = Z_fft2[0:int(n_c/2),0:int(n_s/2)]#70:120] #get half 0:int(n_s/2)
-    return Data_fft2, table
\ No newline at end of file
+        Data_fft2 /= n_c
+        np.log10(Data_fft2, out=Data_fft2)
+        Data_fft2 *= 20
+    return Data_fft2, angle
+
+
+class DigitalDownConverter:
+    """ Streaming DDC: NCO mix of if_freq to 0Hz with the phase carried across buffers, then an optional
+        decimating lowpass FIR whose filter state (lfilter zi) and decimation phase also carry over.
+        Buffers of a stream give the same output as the stream processed in one piece.
+        if_freq: IF to bring to DC, e.g. signal_freq (100kHz) of RadarData/RadarDevice
+        decimation: output rate fs/decimation, cutoff defaults to 80% of the output Nyquist
+    """
+    def __init__(self, fs=0.6e6, if_freq=100e3, decimation=1, numtaps=None, cutoff=None, maxcache=4):
+        self.fs = fs
+        self.if_freq = if_freq
+        self.decimation = int(decimation)
+        self.fs_out = fs / self.decimation
+        self.maxcache = maxcache
+        self.cache = OrderedDict() #NCO tables per buffer length
+        if self.decimation > 1:
+            numtaps = numtaps or 16 * self.decimation + 1
+            cutoff = cutoff or 0.8 * self.fs_out / 2
+            self.taps = signal.firwin(numtaps, cutoff, fs=fs)
+        else:
+            self.taps = None
+        self.reset()
+
+    def reset(self):
+        self.phase = 0.0 #NCO phase at the next sample (rad)
+        self.zi = None
+        self.offset = 0 #index of the next kept sample in the next buffer
+
+    def ncotable(self, N, cdtype):
+        key = (int(N), np.dtype(cdtype).str)
+        table = self.cache.get(key)
+        if table is None:
+            table = np.exp(-2j * np.pi * self.if_freq / self.fs * np.arange(N)).astype(cdtype)
+            self.cache[key] = table
+            if len(self.cache) > self.maxcache:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+        return table
+
+    def process(self, data):
+        cdtype, rdtype = getdtypes()
+        data = np.asarray(data)
+        N = len(data)
+        #mix: cached exp(-jwn) table times the carried phase, one scalar per buffer
+        y = data * self.ncotable(N, cdtype)
+        y *= cdtype(np.exp(-1j * self.phase))
+        self.phase = (self.phase + 2 * np.pi * self.if_freq / self.fs * N) % (2 * np.pi)
+        if self.taps is None:
+            return y
+        if self.zi is None:
+            self.zi = np.zeros(len(self.taps) - 1, dtype=cdtype)
+        y, self.zi = signal.lfilter(self.taps.astype(rdtype), np.ones(1, dtype=rdtype), y, zi=self.zi)
+        out = y[self.offset::self.decimation]
+        self.offset = (self.offset - N) % self.decimation
+        return out
+
+
+class ZoomRange:
+    """ Range spectrum of a chirp table evaluated only over the range bins [rbin0, rbin1) of the
+        n_s-point FFT, with nbins output points (more than rbin1-rbin0 gives a finer bin spacing).
+        Narrow windows use a cached zoom DFT matrix (one BLAS matmul), wide windows the chirp-Z
+        transform (scipy.signal.ZoomFFT). Plans are cached per (n_s, rbins, nbins, precision).
+    """
+    MATRIXBINS = 64 #up to this many output bins the direct zoom DFT beats the CZT
+
+    def __init__(self, maxcache=8):
+        self.maxcache = maxcache
+        self.cache = OrderedDict()
+
+    def getplan(self, n_s, rbins, nbins):
+        key = (int(n_s), float(rbins[0]), float(rbins[1]), int(nbins), precision)
+        plan = self.cache.get(key)
+        if plan is not None:
+            self.cache.move_to_end(key)
+            return plan
+        if nbins <= self.MATRIXBINS:
+            cdtype, rdtype = getdtypes()
+            bins = zoombins(rbins, nbins)
+            plan = np.exp(-2j * np.pi * np.outer(np.arange(n_s), bins) / n_s).astype(cdtype)
+        else:
+            plan = signal.ZoomFFT(int(n_s), [rbins[0], rbins[1]], m=int(nbins), fs=n_s, endpoint=False)
+        self.cache[key] = plan
+        if len(self.cache) > self.maxcache:
+            self.cache.popitem(last=False)
+        return plan
+
+    def process(self, table, rbins, nbins=None):
+        n_s = table.shape[-1]
+        nbins = int(rbins[1] - rbins[0]) if nbins is None else int(nbins)
+        plan = self.getplan(n_s, rbins, nbins)
+        if isinstance(plan, np.ndarray):
+            return np.matmul(table, plan)
+        return plan(table, axis=-1)
+
+zoomrange = ZoomRange()
+
+def zoombins(rbins, nbins=None):
+    """ range bin (in n_s-point FFT bins) of each zoomed output point """
+    nbins = int(rbins[1] - rbins[0]) if nbins is None else int(nbins)
+    return rbins[0] + np.arange(nbins) * (rbins[1] - rbins[0]) / nbins
+
+def rangedopplerzoom(data, n_c=150, n_s=600, rbins=(70, 120), nbins=None, showdb=True, fulldoppler=False, complexout=False):
+    """ rangedoppler restricted to the range bins rbins=(rbin0, rbin1), optionally at a finer spacing
+        (nbins points, see zoombins). The Doppler FFT runs only over those range bins.
+        complexout: return the complex 2D FFT instead of its magnitude, as in rangedoppler()
+        returns (Data_fft2, table), shapes (..., n_c/2 or n_c, nbins) and (..., n_c, n_s)
+    """
+    data = np.asarray(data)
+    if data.shape[-2:] == (n_c, n_s):
+        table = data
+    else:
+        table = data[..., :n_c*n_s].reshape(data.shape[:-1] + (n_c, n_s))
+    table = todtype(table)
+    range_zoom = zoomrange.process(table, rbins, nbins)
+    Z_fft2 = fftbackend.fft(range_zoom, axis=-2)
+    if not fulldoppler:
+        Z_fft2 = Z_fft2[..., 0:int(n_c/2), :] #get half
+    if complexout:
+        return Z_fft2, table
+    Data_fft2 = np.abs(Z_fft2)
+    if showdb:
+        Data_fft2 /= n_c #power spectrum
+        np.log10(Data_fft2, out=Data_fft2)
+        Data_fft2 *= 20
+    return Data_fft2, table
+
+
+class SlidingRangeDoppler:
+    """ Range-Doppler map over a sliding window of the last nchirps chirps (e.g. Ntimes frames) for
+        finer Doppler resolution. Range FFTs of chirps already seen stay in a ring buffer, each
+        update() range-FFTs only the new chirps and redoes just the slow-time FFT over the ring.
+        The ring is not reordered: a circular rotation in slow time only changes the Doppler phase,
+        not the magnitude. Samples of an incomplete chirp are carried to the next frame.
+        returns (nchirps/2, n_s/2) map like rangedoppler
+    """
+    def __init__(self, n_s=600, nchirps=408*5, showdb=True):
+        self.n_s = int(n_s)
+        self.nchirps = int(nchirps)
+        self.showdb = showdb
+        self.ring = None #(nchirps, n_s/2) range FFTs, allocated on the first frame
+        self.pos = 0 #next ring row to write
+        self.tail = None #samples of the last incomplete chirp
+
+    def reset(self):
+        self.ring = None
+        self.pos = 0
+        self.tail = None
+
+    def rangefft(self, table):
+        if np.iscomplexobj(table):
+            return fftbackend.fft(table, axis=-1)[:, 0:int(self.n_s/2)]
+        return fftbackend.rfft(table, axis=-1)[:, 0:int(self.n_s/2)]
+
+    def push(self, range_fft):
+        n = len(range_fft)
+        if n >= self.nchirps:
+            self.ring[:] = range_fft[n-self.nchirps:]
+            self.pos = 0
+            return
+        first = min(n, self.nchirps - self.pos)
+        self.ring[self.pos:self.pos+first] = range_fft[:first]
+        self.ring[0:n-first] = range_fft[first:]
+        self.pos = (self.pos + n) % self.nchirps
+
+    def update(self, data):
+        data = todtype(data)
+        if self.ring is None:
+            cdtype, rdtype = getdtypes()
+            self.ring = np.zeros((self.nchirps, int(self.n_s/2)), dtype=cdtype)
+        if self.tail is not None and len(self.tail) > 0:
+            k = self.n_s - len(self.tail)
+            if len(data) < k:
+                self.tail = np.concatenate((self.tail, data))
+                return self.dopplermap()
+            self.push(self.rangefft(np.concatenate((self.tail, data[:k]))[None, :]))
+            data = data[k:]
+        nnew = int(len(data)/self.n_s)
+        if nnew > 0:
+            self.push(self.rangefft(data[:nnew*self.n_s].reshape(nnew, self.n_s))) #view, new chirps only
+        self.tail = data[nnew*self.n_s:].copy()
+        return self.dopplermap()
+
+    def dopplermap(self):
+        Z_fft2 = fftbackend.fft(self.ring, axis=0)[0:int(self.nchirps/2), :]
+        Data_fft2 = np.abs(Z_fft2)
+        if self.showdb:
+            Data_fft2 /= self.nchirps #power spectrum
+            np.log10(Data_fft2, out=Data_fft2)
+            Data_fft2 *= 20
+        return Data_fft2
+
+
+def _bounds(n, before, after):
+    """ [lo, hi) index bounds of idx-before .. idx+after for every idx, clipped to the map """
+    idx = np.arange(n)
+    return np.clip(idx - before, 0, n), np.clip(idx + after + 1, 0, n)
+
+def _boxsum(sat, rows, cols):
+    """ window sums for every cell from a summed-area table (4 lookups per cell) """
+    r0, r1 = rows[0][:, None], rows[1][:, None]
+    c0, c1 = cols[0][None, :], cols[1][None, :]
+    return sat[..., r1, c1] - sat[..., r0, c1] - sat[..., r1, c0] + sat[..., r0, c0]
+
+def _boxcount(rows, cols):
+    return np.outer(rows[1] - rows[0], cols[1] - cols[0])
+
+def cfar2d(rd, guard=(2, 2), train=(4, 8), method='ca', threshold_db=12.0, os_rank=0.75, indb=True):
+    """ 2D CFAR on a range-Doppler map (n_c/2, n_s/2) from rangedoppler, or a stack (F, n_c/2, n_s/2).
+        guard/train: (Doppler, range) cells on each side of the cell under test.
+        method: 'ca' cell-averaging, 'go' greatest-of the range-lagging/leading halves (the
+        training cells in the test cell's own range column are not used), 'os' ordered-statistic
+        (os_rank quantile of the training cells). CA/GO noise estimates come from a summed-area
+        table, so the cost per map is O(N) whatever the window size. indb: rd is 20log10 magnitude
+        (showdb=True), else linear magnitude.
+        returns (K, 3) array of [range bin, Doppler bin, SNR dB] (list of them for a stack)
+    """
+    rd = np.asarray(rd)
+    power = np.power(10.0, rd / 10.0) if indb else np.square(np.abs(rd, dtype=np.float64))
+    n_d, n_r = power.shape[-2:]
+    gd, gr = guard
+    td, tr = train
+    if method in ('ca', 'go'):
+        #float64 summed-area table with a zero first row/col, avoids cancellation in the differences
+        sat = np.zeros(power.shape[:-2] + (n_d + 1, n_r + 1))
+        np.cumsum(power, axis=-2, out=sat[..., 1:, 1:])
+        np.cumsum(sat[..., 1:, 1:], axis=-1, out=sat[..., 1:, 1:])
+        outer_d = _bounds(n_d, gd + td, gd + td)
+        guard_d = _bounds(n_d, gd, gd)
+        if method == 'ca':
+            outer_r, guard_r = _bounds(n_r, gr + tr, gr + tr), _bounds(n_r, gr, gr)
+            total = _boxsum(sat, outer_d, outer_r) - _boxsum(sat, guard_d, guard_r)
+            count = _boxcount(outer_d, outer_r) - _boxcount(guard_d, guard_r)
+            noise = total / np.maximum(count, 1)
+        else:
+            means = []
+            for outer_r, guard_r in ((_bounds(n_r, gr + tr, -1), _bounds(n_r, gr, -1)), #lagging (lower range)
+                                     (_bounds(n_r, -1, gr + tr), _bounds(n_r, -1, gr))): #leading
+                total = _boxsum(sat, outer_d, outer_r) - _boxsum(sat, guard_d, guard_r)
+                count = _boxcount(outer_d, outer_r) - _boxcount(guard_d, guard_r)
+                means.append(np.where(count > 0, total / np.maximum(count, 1), 0))
+            noise = np.maximum(means[0], means[1])
+    elif method == 'os':
+        footprint = np.ones((2 * (gd + td) + 1, 2 * (gr + tr) + 1), dtype=bool)
+        footprint[td:td + 2 * gd + 1, tr:tr + 2 * gr + 1] = False
+        rank = int(os_rank * (np.count_nonzero(footprint) - 1))
+        footprint = footprint.reshape((1,) * (power.ndim - 2) + footprint.shape)
+        noise = ndimage.rank_filter(power, rank, footprint=footprint, mode='reflect')
+    else:
+        raise ValueError("CFAR method must be 'ca', 'go' or 'os'")
+    snr = 10 * np.log10(power / np.maximum(noise, 1e-30))
+    hits = snr > threshold_db
+    if power.ndim == 2:
+        d, r = np.nonzero(hits)
+        return np.column_stack((r, d, snr[d, r]))
+    detections = []
+    for f in range(power.shape[0]):
+        d, r = np.nonzero(hits[f])
+        detections.append(np.column_stack((r, d, snr[f, d, r])))
+    return detections
+
+
+class StreamingSTFT:
+    """ Streaming STFT over arbitrary-length sample chunks (live RadarDevice or RadarData replay).
+        Frames are nfft samples long with a hop of nfft*(1-overlap) (or hop), samples left over
+        between calls are kept for the next call, and dBFS spectra (fftshifted) are written into a
+        preallocated (maxframes, nfft) buffer. update() returns a view of that buffer that is
+        overwritten on the next call; frames beyond maxframes stay queued (see available).
+    """
+    def __init__(self, nfft=1024, overlap=0.5, hop=None, window='blackman', fs=0.6e6, maxframes=256, fullscale=2**11):
+        self.nfft = int(nfft)
+        self.hop = int(hop) if hop else max(1, int(round(self.nfft * (1 - overlap))))
+        self.fs = fs
+        self.maxframes = int(maxframes)
+        self.fullscale = fullscale
+        cdtype, rdtype = getdtypes()
+        self.win = signal.get_window(window, self.nfft, fftbins=False).astype(rdtype)
+        self.norm = np.sum(self.win) * fullscale
+        self.out = np.zeros((self.maxframes, self.nfft), dtype=rdtype)
+        self.buf = None #sample buffer, allocated on the first chunk with its dtype
+        self.nbuf = 0
+        self.framecount = 0 #frames emitted since reset, frame i starts at sample i*hop
+
+    def reset(self):
+        self.nbuf = 0
+        self.framecount = 0
+
+    @property
+    def available(self):
+        if self.nbuf < self.nfft:
+            return 0
+        return (self.nbuf - self.nfft) // self.hop + 1
+
+    def frametimes(self, nframes):
+        """ start time (s) of the last nframes frames returned """
+        start = self.framecount - nframes
+        return (np.arange(start, self.framecount) * self.hop) / self.fs
+
+    def append(self, samples):
+        samples = todtype(samples)
+        n = len(samples)
+        if self.buf is None or self.buf.dtype != samples.dtype:
+            old = self.buf[:self.nbuf] if self.buf is not None else samples[:0]
+            self.buf = np.zeros(max(2 * self.nfft, self.nbuf + n), dtype=np.result_type(old, samples))
+            self.buf[:self.nbuf] = old
+        elif self.nbuf + n > len(self.buf):
+            newbuf = np.zeros(max(2 * len(self.buf), self.nbuf + n), dtype=self.buf.dtype)
+            newbuf[:self.nbuf] = self.buf[:self.nbuf]
+            self.buf = newbuf
+        self.buf[self.nbuf:self.nbuf + n] = samples
+        self.nbuf += n
+
+    def update(self, samples=None):
+        if samples is not None and len(samples) > 0:
+            self.append(samples)
+        nframes = min(self.available, self.maxframes)
+        if nframes == 0:
+            return self.out[:0]
+        #(nframes, nfft) strided view of the sample buffer, no copy until the window multiply
+        frames = np.lib.stride_tricks.sliding_window_view(self.buf[:self.nbuf], self.nfft)[0:nframes*self.hop:self.hop]
+        sp = fftbackend.fftshift(fftbackend.fft(frames * self.win, axis=-1), axes=-1)
+        s_mag = self.out[:nframes]
+        np.abs(sp, out=s_mag)
+        s_mag /= self.norm
+        np.maximum(s_mag, 10 ** (-15) / self.fullscale, out=s_mag)
+        np.log10(s_mag, out=s_mag)
+        s_mag *= 20
+        #keep the samples not consumed yet (overlap and partial frame) at the front
+        consumed = nframes * self.hop
+        rest = self.nbuf - consumed
+        self.buf[:rest] = self.buf[consumed:self.nbuf]
+        self.nbuf = rest
+        self.framecount += nframes
+        return s_mag
+
+    def feed(self, source, index):
+        """ receive one buffer from a RadarDevice or RadarData and update, returns (spectra, index) """
+        data, datalen, index = source.receive(index)
+        return self.update(data), index
+
+
+def precisioncheck(N=1024*16*15, fs=0.6e6, n_s=600, tol_db=0.05, floor_db=100):
+    """ Accuracy of the single precision path against double precision on a 12bit FMCW-like capture.
+        Spectrum and range-Doppler dB values within floor_db of the peak must agree to tol_db.
+    """
+    rng = np.random.default_rng(0)
+    t = np.arange(N) / fs
+    x = 1500 * np.exp(2j * np.pi * 130e3 * t) + 300 * np.exp(2j * np.pi * 101e3 * t)
+    x = x + 20 * (rng.standard_normal(N) + 1j * rng.standard_normal(N))
+    x = np.round(x.real) + 1j * np.round(x.imag) #12bit ADC samples
+    n_c = int(N / n_s) - 1
+    results = {}
+    previous = precision #restored afterwards, the check must not change the caller's pipeline
+    try:
+        for mode in ("double", "single"):
+            setprecision(mode)
+            s_dbfs, s_dbfs_shift = showspectrum(todtype(x), fs)
+            rd, table = rangedoppler(todtype(x), n_c=n_c, n_s=n_s, showdb=True)
+            results[mode] = (s_dbfs, s_dbfs_shift, rd)
+    finally:
+        setprecision(previous)
+    maxerr = 0
+    for ref, single in zip(results["double"], results["single"]):
+        assert single.dtype == np.float32
+        valid = ref > ref.max() - floor_db
+        maxerr = max(maxerr, np.max(np.abs(ref[valid] - single[valid])))
+    print("single vs double precision max error: %0.5f dB (tolerance %0.3f dB)" % (maxerr, tol_db))
+    assert maxerr < tol_db
+    return maxerr
+
+if __name__ == '__main__':
+    precisioncheck()
@@ -26,7 +26,8 @@ import sys
 import numpy as np
 
 from myradar import RadarData, RadarDevice
-from processing import rangedoppler, showspectrum
+from acquisition import AcquisitionEngine
+from processing import rangedoppler, showspectrum, spectrumprocessor, DigitalDownConverter, setprecision, getdtypes, cfar2d, SlidingRangeDoppler, rangedopplerzoom, monopulse
 
 #fix the error of `np.float` was a deprecated alias for the builtin `float`
 np.float = float    
@@ -82,22 +83,59 @@ def create_color_heatmap(powData, PLOT_SIZE=128):
 sample_rate = 0.6e6 #0.6M
 fs = int(sample_rate) #0.6MHz
 rxbuffersize = 1024 * 16 * 15 #fft_size
+Precision = "single" #"single": complex64/float32 pipeline, "double": complex128/float64
+setprecision(Precision)
 UseRadarDevice= True
 if UseRadarDevice == True:
-    sdrurl = "ip:phaser.local:50901" #"ip:pluto.local" #ip:phaser.local:50901
+    sdrurl = "ip:phaser.local:50901" #"ip:pluto.local" #ip:phaser.local:50901, "sim:" with phaserurl "sim:" runs on simdevice
     phaserurl = "ip:phaser.local"
-    radar=RadarDevice(sdrurl=sdrurl, phaserurl=phaserurl, samplerate=sample_rate, rxbuffersize=rxbuffersize)
+    ChannelMode = "sum" #"sum": data0+data1, "dual"/"sumdelta": both channels kept, detections get an angle (monopulse)
+    radar=RadarDevice(sdrurl=sdrurl, phaserurl=phaserurl, samplerate=sample_rate, rxbuffersize=rxbuffersize, channelmode=ChannelMode)
+    RecordPath = None #e.g. './data/radarrecord.npy', streams every received frame to disk while the GUI runs
+    if RecordPath is not None:
+        radar.startrecording(RecordPath)
 else:
     datapath='./data/radardata5s-1101fast3move.npy'
-    radar=RadarData(datapath=datapath, samplerate=sample_rate, rxbuffersize=rxbuffersize)
+    ReplayMode = "realtime" #"realtime": device frame rate, "accelerated": ReplaySpeed x faster, "max": as fast as the GUI runs
+    ReplaySpeed = 1.0
+    radar=RadarData(datapath=datapath, samplerate=sample_rate, rxbuffersize=rxbuffersize, readahead=4, #memory-mapped, pages in 4 frames ahead
+                    replay=ReplayMode, speed=ReplaySpeed)
 c, BW, num_steps, ramp_time_s, slope, N_c, N_s, freq, dist, range_resolution, signal_freq, range_x = radar.returnparameters()
 
 ts = 1 / float(fs)
 t = np.arange(0, rxbuffersize * ts, ts)
 
+#Waterfall from a streaming DDC: IF (signal_freq) to 0Hz with a phase-continuous NCO, decimated by 4
+#(0.6MS/s -> 150kS/s) around the beat band instead of the 300KHz shifted full-rate spectrum
+UseDDC = True
+ddc = DigitalDownConverter(fs=fs, if_freq=signal_freq, decimation=4)
+waterfall_size = int(rxbuffersize / ddc.decimation) if UseDDC else rxbuffersize
+waterfall_offset = 20 * np.log10(2 ** 14) #level of the old 2**14 amplitude carrier, keeps the slider levels
+
+#Background acquisition: a reader thread fills a ring of frame slots at the device rate while the GUI renders
+#"latest": render the newest frame (skip the rest), "next": every frame in order (DDC and sliding RD continuity)
+UseAcquisition = True
+AcquisitionMode = "latest"
+if UseAcquisition == True:
+    acquisition = AcquisitionEngine(radar, nslots=8).start()
+
+#Sliding range-Doppler: Doppler FFT over the chirps of the last Ntimes frames (finer Doppler resolution),
+#range FFTs of old chirps are cached so each tick only range-FFTs the new frame
+SlidingRD = False
+Ntimes = 5
+#Range region of interest (range FFT bins), only these bins are evaluated (zoom DFT/chirp-Z), None for 0:N_s/2
+RangeROI = None #(0, 60) short-range indoor scenes
+RangeROIbins = None #number of output bins in RangeROI, more than the ROI width gives a finer spacing
 global xSize, ySize
-xSize = int(N_c/2) #13 1024 #128 #26 #128
-ySize = int(N_s/2) #300 1024 #150 #600 #128
+if SlidingRD == True:
+    slidingrd = SlidingRangeDoppler(n_s=N_s, nchirps=Ntimes*N_c, showdb=True)
+    xSize = int(Ntimes*N_c/2)
+else:
+    xSize = int(N_c/2) #13 1024 #128 #26 #128
+if RangeROI is not None and SlidingRD == False:
+    ySize = int(RangeROIbins or (RangeROI[1] - RangeROI[0]))
+else:
+    ySize = int(N_s/2) #300 1024 #150 #600 #128
 
 class Window(QMainWindow): 
     def __init__(self): 
@@ -238,6 +276,13 @@ class Window(QMainWindow):
         self.steer_label.setMinimumWidth(self.minw1)
         layout.addWidget(self.steer_label, 9, 1)
 
+        #CFAR detections on the range-Doppler map
+        self.detect_label = QLabel("Detections: 0")
+        self.detect_label.setFont(font)
+        self.detect_label.setAlignment(Qt.AlignmentFlag.AlignLeft)
+        self.detect_label.setMinimumWidth(self.minw1)
+        layout.addWidget(self.detect_label, 10, 0, 1, 2)
+
         #add polar plot
         self.polarplot = pg.plot()
         self.polarplot.setBackground("w")
@@ -295,7 +340,7 @@ class Window(QMainWindow):
 
         # Waterfall plot
         self.num_slices = 200
-        self.img_array = np.zeros((self.num_slices, rxbuffersize))
+        self.img_array = np.zeros((self.num_slices, waterfall_size), dtype=getdtypes()[1])
         self.waterfall = pg.PlotWidget()
         self.waterfall.setBackground("w")
         self.waterfall.setMinimumWidth(self.minw)
@@ -303,7 +348,11 @@ class Window(QMainWindow):
         self.waterfall.addItem(self.imageitem)
         # self.imageitem.scale(0.35, sample_rate / (N))  # this is deprecated -- we have to use setTransform instead
         tr = QtGui.QTransform()
-        tr.scale(0.35, sample_rate / (rxbuffersize)) ## scale horizontal and vertical axes
+        if UseDDC == True:
+            tr.translate(0, signal_freq - ddc.fs_out / 2) #row 0 is IF - fs_out/2
+            tr.scale(0.35, ddc.fs_out / waterfall_size)
+        else:
+            tr.scale(0.35, sample_rate / (rxbuffersize)) ## scale horizontal and vertical axes
         self.imageitem.setTransform(tr)
         zoom_freq = 40e3
         self.waterfall.setRange(yRange=(100e3, 100e3 + zoom_freq))#starting from 100K
@@ -399,11 +448,26 @@ class Window(QMainWindow):
         self.timer.start()
     
     def update_plot(self):
-        currentdata, datalen, self.currentindex = radar.receive(self.currentindex)
+        if UseAcquisition == True:
+            frame = acquisition.latest() if AcquisitionMode == "latest" else acquisition.next(timeout=0)
+            if frame is None:
+                return #no new frame since the last tick
+            currentdata, sequence = frame
+            self.currentindex = sequence + 1
+        else:
+            currentdata, datalen, self.currentindex = radar.receive(self.currentindex)
+        angles = None
+        if currentdata.ndim == 2: #two channels, the plots show the sum channel
+            if SlidingRD == False and RangeROI is None:
+                rddata, angles = monopulse(currentdata, n_c=N_c, n_s=N_s, channelmode=radar.channelmode, showdb=True)
+            currentdata = currentdata[0] if radar.channelmode == "sumdelta" else currentdata[0] + currentdata[1]
 
         self.line.setData(t, currentdata.real)
 
         sepcf, s_dbfs_shift = showspectrum(currentdata, fs)
+        if UseDDC == True:
+            s_dbfs_ddc = spectrumprocessor.spectrum(ddc.process(currentdata), ddc.fs_out)
+            s_dbfs_shift = s_dbfs_ddc + waterfall_offset
     
         self.fft_curve.setData(freq, sepcf)
 
@@ -415,21 +479,12 @@ class Window(QMainWindow):
         #self.imageitem.setImage(self.img_array, autoLevels=True)
 
         
-        # rddata=rddata/max(rddata)
-        # print(rddata)
-        #endframeid=(self.currentindex*5+1)*N_frame
-        # Ntimes=5
-        # if self.currentindex>Ntimes:
-        #     currentdata2=alldata[max(0, (self.currentindex-Ntimes)*N_frame):(self.currentindex+1)*N_frame]
-        #     N_c = int(len(currentdata2)/N_s)-1 #number of chirps in fft_size
-        #     rddata, table=rangedoppler(currentdata2, n_c=N_c, n_s=N_s, showdb=True) #81 300
-        #     xSize = int(N_c/2)
-        #     newsize = int(xSize * ySize)
-        #     self.surface_plot.setData(z=rddata, colors = self.colors.reshape(newsize,4))
-            
-            #resampled_rd=ndimage.zoom(rddata, zoom=(20,5))
-            #self.imv.setImage(resampled_rd)
-        rddata, table = rangedoppler(currentdata, n_c=N_c, n_s=N_s, showdb=True) #Number of Chirps, Number of samples
+        if SlidingRD == True:
+            rddata = slidingrd.update(currentdata) #(Ntimes*N_c/2, N_s/2)
+        elif RangeROI is not None:
+            rddata, table = rangedopplerzoom(currentdata, n_c=N_c, n_s=N_s, rbins=RangeROI, nbins=RangeROIbins, showdb=True)
+        elif angles is None:
+            rddata, table = rangedoppler(currentdata, n_c=N_c, n_s=N_s, showdb=True) #Number of Chirps, Number of samples
         #print(np.max(rddata))
         #print(np.min(rddata))
         newsize = int(xSize * ySize) #204*300=61200
@@ -437,6 +492,18 @@ class Window(QMainWindow):
         newcolorshape = self.colors.reshape(newsize,4)
         self.surface_plot.setData(z=rddata)#, colors = newcolorshape)
 
+        #cell-averaging CFAR, [range bin, Doppler bin, SNR dB] per target
+        self.detections = cfar2d(rddata, guard=(2, 2), train=(4, 8), method='ca', threshold_db=15)
+        if len(self.detections) > 0:
+            strongest = self.detections[np.argmax(self.detections[:, 2])]
+            text = "Detections: %d, strongest range bin %d, Doppler bin %d, SNR %0.1f dB" \
+                   % (len(self.detections), strongest[0], strongest[1], strongest[2])
+            if angles is not None:
+                text += ", angle %0.1f DEG" % angles[int(strongest[1]), int(strongest[0])]
+            self.detect_label.setText(text)
+        else:
+            self.detect_label.setText("Detections: 0")
+
         #self.currentindex = self.currentindex + 1 #updated in receive()
 
   
@@ -483,4 +550,13 @@ window = Window()
 
 # start the app 
 #sys.exit(App.exec()) 
-App.exec()
\ No newline at end of file
+App.exec()
+if UseAcquisition == True:
+    acquisition.stop()
+    acquisition.report()
+if UseRadarDevice == True:
+    radar.stoprecording()
+    radar.metrics.report() #rx throughput, latency percentiles, dropped buffers
+else:
+    radar.clock.report(rxbuffersize) #late or dropped frames in realtime mode: the GUI falls behind the device rate
+    radar.close()
\ No newline at end of file
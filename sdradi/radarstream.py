@@ -0,0 +1,260 @@
+""" asyncio stream of RadarDevice / RadarData frames (any source with receive(index, out=None)) for several
+    consumers at once. The blocking receive() (libiio rx(), capture file reads) runs in a single reader thread,
+    every frame is fanned out to the subscribers through bounded asyncio queues, each with its own policy when
+    its queue is full:
+    "dropoldest": newest frames win, for displays and detectors that only care about now
+    "dropnewest": keep the queued backlog, newer frames are discarded
+    "block": every frame, acquisition waits for this subscriber (recording); it has to read until the end
+    of the stream or close(), stop() delivers the frames received so far before ending the subscriptions
+    Frames are shared between subscribers and read-only.
+    stream = RadarStream(RadarDevice("sim:", "sim:"))
+    display = stream.subscribe("display", maxsize=1)
+    async with stream:
+        async for frame, sequence in display: ...
+    python radarstream.py --sdrurl sim: --phaserurl sim: --seconds 5
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer as timer
+
+import numpy as np
+
+DROP_POLICIES = ("dropoldest", "dropnewest", "block")
+_END = None  # queued after the last frame
+
+
+class Subscription:
+    """ One consumer of a RadarStream: async iterator of (frame, sequence), sequence counts frames from the source.
+        Counters: delivered, frames queued for this consumer; dropped, frames it lost to its drop policy
+    """
+
+    def __init__(self, stream, name, maxsize=4, policy="dropoldest"):
+        if policy not in DROP_POLICIES:
+            raise ValueError("policy must be in %s" % (DROP_POLICIES,))
+        self.stream = stream
+        self.name = name
+        self.policy = policy
+        self.maxsize = max(int(maxsize), 1)
+        # the drop policies keep a spare place for the end marker, so ending the stream never drops a frame
+        self.queue = asyncio.Queue(self.maxsize if policy == "block" else self.maxsize + 1)
+        self.delivered = 0
+        self.dropped = 0
+        self.closed = False
+
+    async def put(self, item):
+        if self.closed:
+            return
+        if self.policy == "block":
+            await self.queue.put(item)
+            self.delivered += 1
+            return
+        if self.queue.qsize() >= self.maxsize:
+            self.dropped += 1
+            if self.policy == "dropnewest":
+                return
+            self.queue.get_nowait()
+        self.queue.put_nowait(item)
+        self.delivered += 1
+
+    async def end(self):
+        """ queue the end marker after the frames, a "block" subscriber gets it once it has read them """
+        if self.closed:
+            return
+        await self.queue.put(_END)
+
+    async def get(self):
+        """ (frame, sequence) of the next frame, None once the stream stopped """
+        item = await self.queue.get()
+        if item is _END:
+            self.queue.put_nowait(_END)  # later get() calls end too
+            if self.stream.error is not None:
+                raise self.stream.error
+        return item
+
+    def close(self):
+        """ unsubscribe, a blocked stream moves on """
+        self.closed = True
+        self.stream.unsubscribe(self)
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self.get()
+        if item is None:
+            raise StopAsyncIteration
+        return item
+
+    def stats(self):
+        return {"name": self.name, "policy": self.policy, "delivered": self.delivered,
+                "dropped": self.dropped, "queued": self.queue.qsize()}
+
+
+class RadarStream:
+    """ source: RadarDevice or RadarData, read from a single reader thread (receive() keeps per-source state)
+        The next receive() is already running while a frame is handed to the subscribers, so only "block"
+        subscribers can hold acquisition back.
+        Counters: sequence, frames received; error, exception raised by the source (re-raised by Subscription.get())
+    """
+
+    def __init__(self, source, index=0):
+        self.source = source
+        self.index = index
+        self.subscribers = []
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="radarstream")
+        self.task = None
+        self.running = False
+        self.sequence = 0
+        self.error = None
+        self.starttime = None
+        self.stoptime = None
+
+    def subscribe(self, name="", maxsize=4, policy="dropoldest"):
+        subscription = Subscription(self, name or "sub%d" % len(self.subscribers), maxsize, policy)
+        self.subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+
+    def receive(self):
+        data, datalen, self.index = self.source.receive(self.index)
+        frame = data[..., :datalen]
+        frame.flags.writeable = False
+        return frame
+
+    async def readloop(self):
+        loop = asyncio.get_running_loop()
+        pending = loop.run_in_executor(self.executor, self.receive)
+        try:
+            while pending is not None:
+                frame = await asyncio.shield(pending)
+                # after stop() the frame already being received is the last one, it is delivered like the others
+                pending = loop.run_in_executor(self.executor, self.receive) if self.running else None
+                item = (frame, self.sequence)
+                self.sequence += 1
+                for subscription in list(self.subscribers):
+                    await subscription.put(item)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            # let the last receive() finish, the source is not safe to close under it
+            if pending is not None:
+                await asyncio.wait([pending])
+            self.stoptime = timer()
+            for subscription in list(self.subscribers):
+                await subscription.end()
+
+    def start(self):
+        if self.task is None:
+            self.running = True
+            self.starttime = timer()
+            self.stoptime = None
+            self.task = asyncio.get_running_loop().create_task(self.readloop())
+        return self
+
+    async def stop(self):
+        """ stop reading, the frames received so far are still delivered ("block" subscribers get all of them) """
+        if self.task is not None:
+            self.running = False
+            await self.task
+            self.task = None
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self.start()
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+    def stats(self):
+        elapsed = (self.stoptime or timer()) - self.starttime if self.starttime is not None else 0.0
+        return {
+            "frames": self.sequence,
+            "frames_per_s": self.sequence / elapsed if elapsed > 0 else 0.0,
+            "subscribers": [subscription.stats() for subscription in self.subscribers],
+        }
+
+    def report(self):
+        st = self.stats()
+        print("Stream: %d frames, %0.1f frames/s" % (st["frames"], st["frames_per_s"]))
+        for sub in st["subscribers"]:
+            print("  %s (%s): %d delivered, %d dropped, %d queued"
+                  % (sub["name"], sub["policy"], sub["delivered"], sub["dropped"], sub["queued"]))
+        return st
+
+
+async def processed(subscription, func, executor=None):
+    """ async iterator of (func(frame), sequence) for the frames of subscription, func runs in executor
+        (the loop's default thread pool if None) so stages run concurrently: numpy FFTs release the GIL
+    """
+    loop = asyncio.get_running_loop()
+    async for frame, sequence in subscription:
+        yield await loop.run_in_executor(executor, func, frame), sequence
+
+
+async def demo(source, seconds):
+    """ display, detector and recorder consumers of one source, each at its own pace """
+    from processing import rangedoppler, cfar2d
+    c, BW, num_steps, ramp_time_s, slope, N_c, N_s, freq, dist, range_resolution, signal_freq, range_x = source.returnparameters()
+    stream = RadarStream(source)
+    display = stream.subscribe("display", maxsize=1, policy="dropoldest")
+    detector = stream.subscribe("detector", maxsize=2, policy="dropoldest")
+    recorder = stream.subscribe("recorder", maxsize=16, policy="block")
+
+    async def showframes():
+        async for frame, sequence in display:
+            await asyncio.sleep(1 / 30)  # a 30 Hz render loop
+
+    def detect(frame):
+        rd, _ = rangedoppler(frame, n_c=N_c, n_s=N_s, showdb=True)
+        return int(np.count_nonzero(cfar2d(rd, method='ca', threshold_db=15)))
+
+    async def detectframes():
+        async for detections, sequence in processed(detector, detect):
+            pass
+
+    async def recordframes():
+        total = 0
+        async for frame, sequence in recorder:
+            total += frame.shape[-1]
+        print("recorder: %d samples" % total)
+
+    async with stream:
+        consumers = asyncio.gather(showframes(), detectframes(), recordframes())
+        await asyncio.sleep(seconds)
+    await consumers
+    stream.close()
+    return stream.report()
+
+def main():
+    args = parser.parse_args()
+    from myradar import RadarDevice, RadarData
+    if args.datapath:
+        source = RadarData(datapath=args.datapath, replay="realtime")
+    else:
+        source = RadarDevice(args.sdrurl, args.phaserurl, channelmode=args.channelmode)
+    asyncio.run(demo(source, args.seconds))
+
+import argparse
+parser = argparse.ArgumentParser(description='asyncio radar stream with several consumers')
+parser.add_argument('--sdrurl', default="ip:phaser.local:50901", type=str,
+                    help='ad9361 uri, sim: for the simulated Pluto')
+parser.add_argument('--phaserurl', default="ip:phaser.local", type=str,
+                    help='phaser uri, sim: for the simulated board')
+parser.add_argument('--datapath', default=None, type=str,
+                    help='replay a capture file at the device rate instead of the device')
+parser.add_argument('--channelmode', default="sum", type=str,
+                    help='sum, dual or sumdelta')
+parser.add_argument('--seconds', default=5.0, type=float,
+                    help='streaming time')
+
+if __name__ == '__main__':
+    main()
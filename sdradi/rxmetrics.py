@@ -0,0 +1,103 @@
+""" Rolling metrics of an acquisition loop: throughput, rx() latency percentiles, inter-buffer gaps and
+    dropped buffers over the last window buffers. record() is a few array stores per buffer, the statistics
+    are only computed when queried (stats(), gaphistogram(), report()) or every logperiod seconds.
+    metrics = RxMetrics(samplerate, logperiod=5.0)
+    start = timer(); x = sdr.rx(); metrics.record(start, timer(), len(x[0]))
+"""
+import numpy as np
+from timeit import default_timer as timer
+
+#gap histogram bin edges in buffer durations: early, on time, late, one or more buffers lost
+GAP_EDGES = (0.0, 0.5, 0.9, 1.1, 1.5, 2.5, 4.5, np.inf)
+
+
+class RxMetrics:
+    """ samplerate: device sample rate, gives the expected buffer period and dropped buffer estimates
+        window: buffers kept for the rolling statistics
+        logperiod: seconds between report() prints from record(), None never prints
+        enabled: False turns record() into a no-op
+        Counters since reset(): buffers, samples, dropped (buffers missing from gaps longer than one period),
+        overflows (buffers flagged by the device, e.g. readiio())
+    """
+
+    def __init__(self, samplerate, window=1024, logperiod=None, enabled=True, name="rx"):
+        self.samplerate = float(samplerate)
+        self.window = int(window)
+        self.logperiod = logperiod
+        self.enabled = enabled
+        self.name = name
+        self.starts = np.zeros(self.window)
+        self.ends = np.zeros(self.window)
+        self.sizes = np.zeros(self.window, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        self.count = 0  # buffers recorded, also the next ring position
+        self.samples = 0
+        self.dropped = 0
+        self.overflows = 0
+        self.lastend = None
+        self.lastlog = timer()
+
+    def record(self, start, end, nsamples, overflow=False):
+        """ one rx() call from start to end (timer() seconds) returning nsamples per channel """
+        if not self.enabled:
+            return
+        i = self.count % self.window
+        self.starts[i] = start
+        self.ends[i] = end
+        self.sizes[i] = nsamples
+        if self.lastend is not None:
+            #a gap of more than one buffer duration since the last rx() means the kernel ring overflowed
+            self.dropped += max(int(round((end - self.lastend) * self.samplerate / nsamples)) - 1, 0)
+        self.lastend = end
+        self.count += 1
+        self.samples += nsamples
+        self.overflows += bool(overflow)
+        if self.logperiod is not None and end - self.lastlog >= self.logperiod:
+            self.lastlog = end
+            self.report()
+
+    def recent(self):
+        """ (starts, ends, sizes) of the buffers in the window, oldest first """
+        n = min(self.count, self.window)
+        order = (np.arange(self.count - n, self.count)) % self.window
+        return self.starts[order], self.ends[order], self.sizes[order]
+
+    def gaps(self):
+        """ time between consecutive rx() returns in the window, in buffer durations """
+        starts, ends, sizes = self.recent()
+        return np.diff(ends) * self.samplerate / sizes[1:]
+
+    def gaphistogram(self, edges=GAP_EDGES):
+        """ (counts, edges) of the inter-buffer gaps in buffer durations """
+        counts, edges = np.histogram(self.gaps(), bins=np.asarray(edges, dtype=float))
+        return counts, edges
+
+    def stats(self):
+        starts, ends, sizes = self.recent()
+        latency = (ends - starts) * 1e3
+        span = ends[-1] - ends[0] if len(ends) > 1 else 0.0
+        rate = sizes[1:].sum() / span if span > 0 else 0.0
+        p50, p95, p99 = np.percentile(latency, [50, 95, 99]) if len(latency) else (0.0, 0.0, 0.0)
+        counts, edges = self.gaphistogram()
+        return {
+            "buffers": self.count,
+            "samples": self.samples,
+            "MSps": rate / 1e6,
+            "realtime": rate / self.samplerate, #1.0: keeping up with the device
+            "latency_ms_p50": p50,
+            "latency_ms_p95": p95,
+            "latency_ms_p99": p99,
+            "latency_ms_max": latency.max() if len(latency) else 0.0,
+            "gap_histogram": dict(zip(["%g-%g" % (a, b) for a, b in zip(edges[:-1], edges[1:])], counts.tolist())),
+            "dropped": self.dropped,
+            "overflows": self.overflows,
+        }
+
+    def report(self):
+        st = self.stats()
+        print("%s: %d buffers, %0.3f MS/s (%0.2fx realtime), rx latency p50 %0.1f p95 %0.1f p99 %0.1f ms, "
+              "%d dropped, %d overflows" % (self.name, st["buffers"], st["MSps"], st["realtime"], st["latency_ms_p50"],
+                                            st["latency_ms_p95"], st["latency_ms_p99"], st["dropped"], st["overflows"]))
+        return st
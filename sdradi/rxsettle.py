@@ -0,0 +1,73 @@
+""" Settle-aware rx() for measurements after a settings change (element gains/phases, rx gain, LO).
+    The kernel keeps kernelbuffers buffers captured ahead of the reader, so after a change exactly those
+    are stale: SettledRx.changed() discards them on the next rx() instead of a second sdr.rx() per reading.
+    changed(settle=True) also reads until the signal power stops moving (e.g. the ADAR1000 gain quirk)
+    instead of a fixed sleep(1.0).
+    acq = SettledRx(cn0566.sdr, kernelbuffers=1) #the count set with sdr._rxadc.set_kernel_buffers_count()
+    cn0566.set_chan_phase(cal, phase); acq.changed()
+    data = acq.rx()
+"""
+import numpy as np
+from timeit import default_timer as timer
+
+DEFAULT_KERNELBUFFERS = 4  # libiio default
+
+
+def rxpower(data):
+    """ mean power in dB of one rx() return (one array or a list per channel) """
+    if isinstance(data, (list, tuple)):
+        power = sum(np.mean(np.abs(x) ** 2) for x in data)
+    else:
+        power = np.mean(np.abs(data) ** 2)
+    return 10 * np.log10(max(power, 1e-30))
+
+
+class SettledRx:
+    """ sdr: device with rx() (pyadi-iio ad9361 or simdevice.ad9361)
+        kernelbuffers: kernel buffer count the caller set up on sdr (libiio has no getter), the buffers
+        that are stale after a change
+        tolerance_db/stable: settled once stable consecutive buffers differ by less than tolerance_db in power
+        maxtime: settling gives up after maxtime seconds (the old fixed sleep) and uses the data as is
+        Counters: discarded (stale buffers dropped), settlebuffers (buffers read while settling)
+    """
+
+    def __init__(self, sdr, kernelbuffers=DEFAULT_KERNELBUFFERS, tolerance_db=0.2, stable=2, maxtime=1.0):
+        self.sdr = sdr
+        self.kernelbuffers = int(kernelbuffers)
+        self.tolerance_db = tolerance_db
+        self.stable = stable
+        self.maxtime = maxtime
+        self.stale = 0  # buffers to drop before the next reading
+        self.settle = False
+        self.discarded = 0
+        self.settlebuffers = 0
+
+    def changed(self, settle=False):
+        """ settings changed: the buffers already in the kernel ring predate it """
+        self.stale = self.kernelbuffers
+        self.settle = self.settle or settle
+
+    def waitsettled(self):
+        """ read until the power of consecutive buffers agrees, returns the last buffer """
+        start = timer()
+        data = self.sdr.rx()
+        last = rxpower(data)
+        steady = 0
+        while steady < self.stable and timer() - start < self.maxtime:
+            data = self.sdr.rx()
+            self.settlebuffers += 1
+            power = rxpower(data)
+            steady = steady + 1 if abs(power - last) < self.tolerance_db else 0
+            last = power
+        return data
+
+    def rx(self):
+        """ next buffer captured after the last changed(), settled if asked """
+        while self.stale > 0:
+            self.sdr.rx()
+            self.stale -= 1
+            self.discarded += 1
+        if self.settle:
+            self.settle = False
+            return self.waitsettled()
+        return self.sdr.rx()
@@ -0,0 +1,135 @@
+#Tune rx_buffer_size and the kernel buffer count of a device, the best setting goes to a per-host profile
+#python rxtune.py --uri ip:phaser.local:50901 --samplerate 0.6e6
+#python rxtune.py --uri sim:realtime (simulated Pluto paced at the sample rate, "sim:" runs it at full speed)
+#The profile (~/.sdradi/rxprofile_<host>.json, per uri and sample rate) is applied by myradar/myphaser.initAD9361
+#and RadarDevice when called with profile=True: rxbuffer=None takes the tuned rx_buffer_size and kernel buffer
+#count, a pinned rxbuffer only gets the tuned kernel buffer count if it is the size that was tuned.
+import os
+import json
+import socket
+import time
+import numpy as np
+from timeit import default_timer as timer
+
+import simdevice
+from rxmetrics import RxMetrics
+
+DEFAULT_RXBUFFERSIZE = 1024 * 16
+SIZES = (1024, 1024*4, 1024*16, 1024*64, 1024*16*15, 1024*512)
+KERNELBUFFERS = (1, 2, 4, 8)
+
+def profilepath():
+    return os.path.join(os.path.expanduser("~"), ".sdradi", "rxprofile_%s.json" % socket.gethostname())
+
+def readprofiles(path=None):
+    path = path or profilepath()
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as file1:
+        return json.load(file1)
+
+def loadprofile(uri, samplerate, path=None):
+    """ tuned {"rx_buffer_size", "kernelbuffers", ...} of uri at samplerate on this host, None if not tuned """
+    return readprofiles(path).get(uri, {}).get(str(int(samplerate)))
+
+def profilesettings(uri, samplerate, rxbuffersize=None, path=None):
+    """ (rx_buffer_size, kernel buffer count or None to keep the driver's) for uri at samplerate: the tuned pair
+        unless rxbuffersize pins another size than the tuned one, the kernel count was tuned for that size only
+    """
+    tuned = loadprofile(uri, samplerate, path)
+    if tuned and rxbuffersize in (None, tuned["rx_buffer_size"]):
+        return int(tuned["rx_buffer_size"]), int(tuned["kernelbuffers"])
+    return int(rxbuffersize or DEFAULT_RXBUFFERSIZE), None
+
+def saveprofile(uri, samplerate, entry, path=None):
+    path = path or profilepath()
+    profiles = readprofiles(path)
+    profiles.setdefault(uri, {})[str(int(samplerate))] = entry
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file1:
+        json.dump(profiles, file1, indent=1)
+    return path
+
+def opensdr(uri, samplerate, channels=2):
+    if simdevice.issim(uri):
+        sdr = simdevice.ad9361(uri=uri)
+    else:
+        import adi
+        sdr = adi.ad9361(uri=uri)
+    sdr.sample_rate = int(samplerate)
+    sdr.rx_enabled_channels = list(range(channels))
+    return sdr
+
+def measure(sdr, rxbuffersize, kernelbuffers, seconds=3.0, warmup=2):
+    """ sustained rx() statistics (rxmetrics.RxMetrics.stats()) with the given buffer size and kernel buffer count """
+    sdr.rx_destroy_buffer()
+    sdr._rxadc.set_kernel_buffers_count(kernelbuffers)
+    sdr.rx_buffer_size = int(rxbuffersize)
+    for i in range(warmup): #buffer creation and the stale kernel buffers
+        sdr.rx()
+    metrics = RxMetrics(sdr.sample_rate, window=1 << 16)
+    start = timer()
+    while timer() - start < seconds or metrics.count < 4:
+        rxstart = timer()
+        x = sdr.rx()
+        metrics.record(rxstart, timer(), len(x[0]) if isinstance(x, list) else len(x))
+    return metrics.stats()
+
+def best(results):
+    """ the setting that keeps up with the device without drops at the lowest p99 latency,
+        the highest throughput if none keeps up
+    """
+    keepup = [r for r in results if r["realtime"] >= 0.98 and r["dropped"] == 0]
+    if keepup:
+        return min(keepup, key=lambda r: (r["latency_ms_p99"], r["kernelbuffers"]))
+    return max(results, key=lambda r: r["MSps"])
+
+def sweep(uri, samplerate, sizes=SIZES, kernelbuffers=KERNELBUFFERS, seconds=3.0, channels=2):
+    sdr = opensdr(uri, samplerate, channels)
+    results = []
+    print("%10s%8s%10s%10s%10s%10s%10s%9s" % ("size", "kbufs", "MS/s", "realtime", "p50 ms", "p95 ms", "p99 ms", "dropped"))
+    for size in sizes:
+        for k in kernelbuffers:
+            st = measure(sdr, size, k, seconds)
+            st.update({"rx_buffer_size": int(size), "kernelbuffers": int(k)})
+            results.append(st)
+            print("%10d%8d%10.3f%10.2f%10.1f%10.1f%10.1f%9d" % (size, k, st["MSps"], st["realtime"], st["latency_ms_p50"],
+                                                             st["latency_ms_p95"], st["latency_ms_p99"], st["dropped"]))
+    sdr.rx_destroy_buffer()
+    return results
+
+def main():
+    args = parser.parse_args()
+    results = sweep(args.uri, args.samplerate, args.sizes, args.kernelbuffers, args.seconds, args.channels)
+    choice = best(results)
+    print("Best: rx_buffer_size %d, %d kernel buffers, %0.3f MS/s, p99 %0.1f ms"
+          % (choice["rx_buffer_size"], choice["kernelbuffers"], choice["MSps"], choice["latency_ms_p99"]))
+    if args.output:
+        with open(args.output, "w") as file1:
+            json.dump(results, file1, indent=1, default=float)
+    if not args.nosave:
+        entry = {key: choice[key] for key in ("rx_buffer_size", "kernelbuffers", "MSps", "latency_ms_p99")}
+        entry["tuned"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        print("Saved to", saveprofile(args.uri, args.samplerate, entry))
+
+import argparse
+parser = argparse.ArgumentParser(description='rx buffer tuning')
+parser.add_argument('--uri', default="ip:phaser.local:50901", type=str,
+                    help='device uri, sim: or sim:realtime for the simulated Pluto')
+parser.add_argument('--samplerate', default=0.6e6, type=float,
+                    help='sample rate to tune for')
+parser.add_argument('--sizes', default=list(SIZES), type=int, nargs='+',
+                    help='rx_buffer_size values to try')
+parser.add_argument('--kernelbuffers', default=list(KERNELBUFFERS), type=int, nargs='+',
+                    help='kernel buffer counts to try')
+parser.add_argument('--seconds', default=3.0, type=float,
+                    help='measurement time per setting')
+parser.add_argument('--channels', default=2, type=int,
+                    help='rx channels enabled')
+parser.add_argument('--output', default=None, type=str,
+                    help='json file for all results (regression tracking)')
+parser.add_argument('--nosave', action='store_true',
+                    help='do not store the best setting in the host profile')
+
+if __name__ == '__main__':
+    main()
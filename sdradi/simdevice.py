@@ -0,0 +1,681 @@
+#Simulated Pluto (ad9361) and CN0566 phaser, drop-in for the pyadi-iio classes when there is no hardware
+#myradar/myad9361: pass a "sim:" url, e.g. RadarDevice(sdrurl="sim:", phaserurl="sim:")
+#any other script: python simdevice.py phaser/phaser_gui.py (registers this module as adi before running it),
+#or a module from sdradi: python simdevice.py phaser.phaser_gui
+#python simdevice.py --benchmark (sustained rx() throughput)
+#rx() synthesizes the FMCW beat of every target of the scene: IF tone of the tx() waveform + range beat
+#(same 4*slope*R/c relation as the distance axis of the GUI) + Doppler, weighted per channel by the array factor
+#of the 4 elements feeding it (element rx_phase/rx_gain, applied on latch_rx_settings like the ADAR1000).
+#Beacon targets ("beacon": RF Hz) are CW sources like the HB100 used by the phaser calibrations.
+#Settings changes reach the samples kernelbuffers buffers later, the ones already in the kernel ring are stale.
+import sys
+import time
+import types
+import pickle
+from collections import deque
+import numpy as np
+from timeit import default_timer as timer
+
+C = 299792458
+DEFAULT_SCENE = [
+    {"range": 3.0, "velocity": 0.0, "angle": 0.0, "amplitude": 2.0},
+    {"range": 8.0, "velocity": 1.5, "angle": 20.0, "amplitude": 1.0},
+]
+#rx channel of each element (element index 0-7): chan0 is fed by elements 5-8, chan1 by 1-4
+ELEMENT_CHANNEL = np.array([1, 1, 1, 1, 0, 0, 0, 0])
+
+
+class Attribute:
+    """ iio attribute, only its value is kept """
+    def __init__(self, value="0"):
+        self.value = value
+
+class AttributeSink:
+    """ device or channel whose attributes are only stored (LNA bias, TR switch, gpios...), unset ones read as 0 """
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+        self.attrs = {}
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return 0
+
+    def reg_write(self, reg, value):
+        pass
+
+    def reg_read(self, reg):
+        return 0
+
+class Control(AttributeSink):
+    """ iio device handle: debug attributes, channels, registers """
+    def __init__(self, sdr=None):
+        super().__init__()
+        self.sdr = sdr
+        self.debug_attrs = _AttrDict()
+        self.channels = {}
+
+    def find_channel(self, name, output=False):
+        channel = self.channels.get((name, output))
+        if channel is None:
+            channel = self.channels[(name, output)] = AttributeSink()
+            channel.attrs = _AttrDict()
+        return channel
+
+    def set_kernel_buffers_count(self, count):
+        self.sdr.kernelbuffers = max(int(count), 1)
+        self.sdr.rx_destroy_buffer()
+
+    def reg_read(self, reg):
+        #0x80000088 bit 2: rx overflow since the last read (see myradar.readiio)
+        if reg == 0x80000088 and self.sdr is not None:
+            overflow, self.sdr.overflow = self.sdr.overflow, False
+            return 0b0100 if overflow else 0
+        return 0
+
+class _AttrDict(dict):
+    def __missing__(self, key):
+        value = self[key] = Attribute()
+        return value
+
+class Context:
+    def __init__(self, sdr):
+        self.sdr = sdr
+        self.timeout = 0
+
+    def set_timeout(self, timeout):
+        self.timeout = timeout
+
+    def find_device(self, name):
+        return self.sdr._ctrl
+
+
+class ad9361:
+    """ Simulated two channel Pluto. scene: list of targets, dicts with range (m), velocity (m/s, positive
+        receding), angle (deg from boresight), amplitude (ADC counts at 0dB gains, full element gain) and
+        optionally beacon (RF Hz of a CW source, no range beat).
+        realtime: rx() blocks until its buffer has been "received" at sample_rate and drops buffers when the
+        caller falls more than kernelbuffers behind, otherwise it returns as fast as it can synthesize.
+        A "sim:realtime" uri turns it on as well.
+        noise: complex noise rms in ADC counts, samples are rounded and clipped to 12 bits like the AD9363.
+    """
+    def __init__(self, uri="sim:", scene=None, realtime=False, noise=2.0, seed=0):
+        self.uri = uri
+        self.scene = [dict(target) for target in (DEFAULT_SCENE if scene is None else scene)]
+        self.realtime = realtime or "realtime" in str(uri)
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.phaser = None
+        self._ctrl = Control(self)
+        self._rxadc = self._ctrl
+        self._txdac = self._ctrl
+        self._ctx = Context(self)
+        self.ctx = self._ctx
+        self.sample_rate = 30720000
+        self.rx_buffer_size = 1024
+        self.rx_enabled_channels = [0]
+        self.tx_enabled_channels = [0]
+        self.rx_lo = int(2.4e9)
+        self.tx_lo = int(2.4e9)
+        self.rx_rf_bandwidth = 18000000
+        self.tx_rf_bandwidth = 18000000
+        self.gain_control_mode_chan0 = "slow_attack"
+        self.gain_control_mode_chan1 = "slow_attack"
+        self._rxgain = [71.0, 71.0]
+        self.tx_hardwaregain_chan0 = -10
+        self.tx_hardwaregain_chan1 = -10
+        self.tx_cyclic_buffer = False
+        self.loopback = 0
+        self.filter = None
+        self.dds_scales = [0.0] * 8
+        self.dds_frequencies = [0] * 8
+        self.dds_phases = [0] * 8
+        self.dds_enabled = [0] * 8
+        self.txtone = None  #(frequency, amplitude/2**14) of the cyclic tx waveform
+        self.kernelbuffers = 4
+        self.ringsize = None
+        self.overflow = False
+        self.plankey = None
+        self.rx_destroy_buffer()
+
+    #rx gain changes are settings changes, they reach the samples after the buffers already in the ring
+    @property
+    def rx_hardwaregain_chan0(self):
+        return self._rxgain[0]
+
+    @rx_hardwaregain_chan0.setter
+    def rx_hardwaregain_chan0(self, value):
+        self._rxgain[0] = float(value)
+        self.settingschanged()
+
+    @property
+    def rx_hardwaregain_chan1(self):
+        return self._rxgain[1]
+
+    @rx_hardwaregain_chan1.setter
+    def rx_hardwaregain_chan1(self, value):
+        self._rxgain[1] = float(value)
+        self.settingschanged()
+
+    @property
+    def rx_sample_rate(self):
+        return self.sample_rate
+
+    @property
+    def tx_sample_rate(self):
+        return self.sample_rate
+
+    def setscene(self, scene):
+        self.scene = [dict(target) for target in scene]
+        self.plankey = None
+        self.settingschanged()
+
+    def tx(self, data):
+        """ cyclic tx waveform, only its strongest tone matters for the echoes """
+        data = data[-1] if isinstance(data, (list, tuple)) else data
+        data = np.asarray(data)
+        spectrum = np.abs(np.fft.fft(data))
+        freq = np.fft.fftfreq(len(data), 1 / self.sample_rate)[np.argmax(spectrum)]
+        self.txtone = (float(freq), float(np.sqrt(np.mean(np.abs(data) ** 2))) / 2 ** 14)
+        self.settingschanged()
+
+    def tx_destroy_buffer(self):
+        self.txtone = None
+        self.settingschanged()
+
+    def rx_destroy_buffer(self):
+        """ drop the kernel ring, the next rx() starts a fresh stream with the current settings """
+        self.position = getattr(self, "position", 0)  #stream position (samples since start) of the next buffer
+        self.starttime = None
+        self.ring = deque()  #realtime: buffer numbers captured and not read yet
+        self.states = deque()  #(position, channel weights) settings in effect from position on
+        self.states.append((self.position, self.settings(), None))
+
+    def capturefront(self):
+        """ stream position the hardware is capturing at: in max speed mode the kernel ring is always full
+            ahead of the reader, in realtime it is the current time
+        """
+        if self.starttime is None:
+            return self.position
+        if self.realtime:
+            return int((timer() - self.starttime) * self.sample_rate)
+        return self.position + self.kernelbuffers * int(self.rx_buffer_size)
+
+    def settingschanged(self):
+        if not hasattr(self, "states"):
+            return
+        front = self.capturefront()
+        while self.states and self.states[-1][0] >= front:
+            self.states.pop()
+        self.states.append((front, self.settings(), None))
+
+    def settings(self):
+        """ latched settings a buffer is captured with """
+        if self.phaser is not None:
+            element, spacing = self.phaser.latchedweights().copy(), self.phaser.element_spacing
+        else:
+            element, spacing = np.ones(8, dtype=complex), 0.015
+        txlevel = self.txtone[1] * 10 ** (max(self.tx_hardwaregain_chan0, self.tx_hardwaregain_chan1) / 20) \
+            if self.txtone is not None else 0.0
+        return {"element": element, "spacing": spacing, "rxgain": np.array(self._rxgain), "txlevel": txlevel}
+
+    def radarparameters(self):
+        """ (RF start Hz, ramp bandwidth Hz, ramp time s, ramp mode) from the phaser's ADF4159 """
+        if self.phaser is None:
+            return 10e9, 500e6, 1e-3, "continuous_sawtooth"
+        phaser = self.phaser
+        rf = abs(phaser.frequency * 4.0 - self.tx_lo)
+        mode = phaser.ramp_mode if phaser.enable == 0 else "disabled"
+        return rf, phaser.freq_dev_range * 4.0, phaser.freq_dev_time / 1e6, mode
+
+    def plan(self):
+        """ per-target tables for the current configuration: IF+Doppler tone over one buffer and the
+            range beat over one ramp period (+ a buffer, so any ramp phase is a slice)
+        """
+        N = int(self.rx_buffer_size)
+        fs = float(self.sample_rate)
+        rf, BW, ramp_time, mode = self.radarparameters()
+        key = (N, fs, rf, BW, ramp_time, mode, self.txtone, self.rx_lo, self.tx_lo, self.noise,
+               None if self.phaser is None else self.phaser.lo, id(self.scene))
+        if key == self.plankey:
+            return self.tables
+        slope = BW / ramp_time
+        period = max(int(round(ramp_time * fs)), 1)
+        if mode == "continuous_triangular":
+            period *= 2
+        n = np.arange(N)
+        m = np.arange(period + N)
+        ifreq = self.txtone[0] if self.txtone is not None else 0.0
+        tones, tiles, rfs, freqs = [], [], [], []
+        for target in self.scene:
+            if "beacon" in target:  #CW source: LO - RF lands at rx_lo
+                lo = self.phaser.lo if self.phaser is not None else target["beacon"] + self.rx_lo
+                fb = (lo - target["beacon"]) - self.rx_lo
+                freqs.append(fb)
+                tones.append(np.exp(2j * np.pi * fb / fs * n))
+                tiles.append(None)
+                rfs.append(target["beacon"])
+                continue
+            fd = -2 * target.get("velocity", 0.0) * (rf + BW / 2) / C
+            fr = 4 * slope * target["range"] / C if mode != "disabled" else 0.0
+            freqs.append(ifreq + fd)
+            tones.append(np.exp(2j * np.pi * ((ifreq + fd) / fs * n - 2 * rf * target["range"] / C)))
+            ramppos = m % period
+            if mode == "continuous_triangular": #down ramp beats below the IF
+                sign = np.where(ramppos < period // 2, 1.0, -1.0)
+                ramppos = ramppos % (period // 2)
+            else:
+                sign = 1.0
+            tiles.append(np.exp(2j * np.pi * fr / fs * sign * ramppos) if fr != 0 else None)
+            rfs.append(rf + BW / 2)
+        self.tables = {
+            "N": N, "period": period,
+            "tones": np.array(tones).reshape(len(tones), N),
+            "freqs": np.array(freqs),
+            "tiles": tiles,
+            "wavelengths": C / np.array(rfs),
+            "beacon": np.array(["beacon" in target for target in self.scene]),
+            "key": key,
+            "noise": (self.rng.standard_normal((2, 4 * N)) + 1j * self.rng.standard_normal((2, 4 * N)))
+                     * (self.noise / np.sqrt(2)),
+        }
+        self.plankey = key
+        return self.tables
+
+    def weights(self, tables, settings):
+        """ (2, targets) complex gain of every target into each rx channel: array factor of the 4 elements
+            of the channel (latched element phases/gains), rx gain and tx level
+        """
+        angles = np.radians([target.get("angle", 0.0) for target in self.scene])
+        amplitude = np.array([target.get("amplitude", 1.0) for target in self.scene])
+        element = settings["element"]
+        positions = np.arange(8) * settings["spacing"]
+        #plane wave phase at each element (8, targets)
+        arrival = np.exp(-2j * np.pi * np.outer(positions, np.sin(angles)) / tables["wavelengths"])
+        W = np.zeros((2, len(self.scene)), dtype=complex)
+        for channel in range(2):
+            mask = ELEMENT_CHANNEL == channel
+            W[channel] = element[mask] @ arrival[mask]
+        W *= amplitude * 10 ** (settings["rxgain"][:, None] / 20)
+        W[:, ~tables["beacon"]] *= settings["txlevel"] #echoes need the tx, beacons don't
+        return W
+
+    def stateat(self, position, tables):
+        while len(self.states) > 1 and self.states[1][0] <= position:
+            self.states.popleft()
+        start, settings, cached = self.states[0]
+        if cached is None or cached[0] != tables["key"]:
+            cached = (tables["key"], self.weights(tables, settings))
+            self.states[0] = (start, settings, cached)
+        return cached[1]
+
+    def pace(self, N):
+        """ realtime: the hardware fills buffer j at (j+1)*N/sample_rate into the kernel ring while it has a free
+            slot, buffers completing while the ring is full are lost (overflow). Returns the next buffer's position.
+        """
+        now = timer()
+        if self.starttime is None or self.ringsize != N:
+            self.starttime = now - self.position / self.sample_rate
+            self.ring.clear()
+            self.nextcapture = -(-self.position // N)
+            self.ringsize = N
+        completed = int((now - self.starttime) * self.sample_rate) // N #buffers captured by now
+        if completed - self.nextcapture > self.kernelbuffers - len(self.ring):
+            self.overflow = True
+        while self.nextcapture < completed and len(self.ring) < self.kernelbuffers:
+            self.ring.append(self.nextcapture)
+            self.nextcapture += 1
+        self.nextcapture = max(self.nextcapture, completed)
+        if not self.ring: #wait for the buffer being captured
+            due = self.starttime + (self.nextcapture + 1) * N / self.sample_rate
+            time.sleep(max(due - now, 0))
+            self.ring.append(self.nextcapture)
+            self.nextcapture += 1
+        return self.ring.popleft() * N
+
+    def rx(self):
+        N = int(self.rx_buffer_size)
+        if self.realtime:
+            self.position = self.pace(N)
+        elif self.starttime is None:
+            self.starttime = timer()
+        tables = self.plan()
+        W = self.stateat(self.position, tables)
+        #continuous tones: phase at this buffer's first sample, the tables hold the rest of the buffer
+        fs = float(self.sample_rate)
+        echoes = tables["tones"] * np.exp(2j * np.pi * ((tables["freqs"] * self.position / fs) % 1))[:, None]
+        start = self.position % tables["period"]
+        for k, tile in enumerate(tables["tiles"]):
+            if tile is not None:
+                echoes[k] *= tile[start:start + N]
+        out = W @ echoes if len(self.scene) else np.zeros((2, N), dtype=complex)
+        if self.noise > 0: #random slice of the precomputed noise, drawing fresh noise would cost more than the rest
+            offset = self.rng.integers(0, tables["noise"].shape[1] - N)
+            out += tables["noise"][:, offset:offset + N]
+        np.rint(out.view(np.float64), out=out.view(np.float64))
+        np.clip(out.view(np.float64), -2048, 2047, out=out.view(np.float64))
+        self.position += N
+        channels = list(self.rx_enabled_channels)
+        if len(channels) == 1:
+            return out[channels[0]]
+        return [out[channel] for channel in channels]
+
+
+class adf4159:
+    """ ramp settings of the ADF4159 PLL, written to the simulation when enable is written (write it last) """
+    def __init__(self, uri=None):
+        self.uri = uri
+        self.frequency = int(12.1e9 / 4)
+        self.freq_dev_range = 0
+        self.freq_dev_step = 0
+        self.freq_dev_time = 1000
+        self.ramp_mode = "disabled"
+        self.delay_word = 0
+        self.delay_clk = "PFD"
+        self.delay_start_en = 0
+        self.ramp_delay_en = 0
+        self.trig_delay_en = 0
+        self.sing_ful_tri = 0
+        self.tx_trig_en = 0
+        self.powerdown = 0
+        self._enable = 0
+
+    @property
+    def enable(self):
+        return self._enable
+
+    @enable.setter
+    def enable(self, value):
+        self._enable = value
+        sdr = getattr(self, "_sdr", None)
+        if sdr is not None:
+            sdr.settingschanged()
+
+
+class adar1000(AttributeSink):
+    """ one ADAR1000 beamformer: 4 channels with rx_phase/rx_gain/rx_attenuator """
+    def __init__(self, array, chip_id):
+        super().__init__()
+        self.array = array
+        self.chip_id = chip_id
+        self.channels = [AttributeSink(rx_phase=0.0, rx_gain=0, rx_attenuator=True, rx_enable=False) for i in range(4)]
+        self._ctrl = AttributeSink()
+
+    def latch_rx_settings(self):
+        self.array.latch_rx_settings()
+
+    def latch_tx_settings(self):
+        pass
+
+
+class adar1000_array:
+    """ the ADAR1000s of the array with the element numbering of the board """
+    def __init__(self, uri=None, chip_ids=["BEAM0", "BEAM1"], device_map=[[1], [2]],
+                 element_map=[[1, 2, 3, 4, 5, 6, 7, 8]], device_element_map={1: [7, 8, 5, 6], 2: [3, 4, 1, 2]}):
+        self.devices = {}
+        self.elements = {}
+        for chip_id, (number,) in zip(chip_ids, device_map):
+            device = self.devices[number] = adar1000(self, chip_id)
+            for channel, element in zip(device.channels, device_element_map[number]):
+                self.elements[element] = channel
+        self.latched = np.zeros(8, dtype=complex)
+
+    @property
+    def sdr(self):
+        return getattr(self, "_sdr", None)
+
+    @sdr.setter
+    def sdr(self, sdr):
+        #the simulated Pluto receives through this array
+        self._sdr = sdr
+        if isinstance(sdr, ad9361):
+            sdr.phaser = self
+            sdr.settingschanged()
+
+    def latchedweights(self):
+        return self.latched
+
+    def latch_rx_settings(self):
+        """ element phases and gains take effect here, like the ADAR1000 load strobe """
+        for element in range(8):
+            channel = self.elements[element + 1]
+            gain = 0.0 if channel.rx_attenuator else channel.rx_gain / 127
+            self.latched[element] = gain * np.exp(1j * np.radians(channel.rx_phase))
+        if self.sdr is not None and isinstance(self.sdr, ad9361):
+            self.sdr.settingschanged()
+
+    def latch_tx_settings(self):
+        pass
+
+    def steer_rx(self, azimuth, elevation=0):
+        phase = np.degrees(2 * np.pi * self.element_spacing * np.sin(np.radians(azimuth)) * self.lo / C)
+        for element in range(8):
+            self.elements[element + 1].rx_phase = (phase * element) % 360.0
+        self.latch_rx_settings()
+
+
+class CN0566(adf4159, adar1000_array):
+    """ Simulated phaser board: ADF4159 ramp, 8 elements in two ADAR1000s feeding the two Pluto channels,
+        and the calibration/beam methods of phaser.mycn0566.CN0566
+    """
+    num_elements = 8
+    phase_step_size = 2.8125
+    c = C
+    element_spacing = 0.015
+    device_mode = "rx"
+
+    def __init__(self, uri="sim:", sdr=None, verbose=False):
+        adf4159.__init__(self, uri)
+        adar1000_array.__init__(self, uri)
+        self._gpios = one_bit_adc_dac(uri)
+        self._monitor = ad7291(uri)
+        self.Averages = 16
+        self.pcal = [0.0] * self.num_elements
+        self.ccal = [0.0, 0.0]
+        self.gcal = [1.0] * self.num_elements
+        self.ph_deltas = [0] * (self.num_elements - 1)
+        self.sdr = sdr
+        self.gain_cal = False
+        self.phase_cal = False
+        self.lo = 10.5e9
+        self.freq_dev_range = int(500e6 / 4)
+        self.freq_dev_step = int(500e6 / 4 / 1000)
+        self.freq_dev_time = int(1e3)
+        self.muxout = 0
+
+    @property
+    def lo(self):
+        return self.frequency * 4.0
+
+    @lo.setter
+    def lo(self, value):
+        self.frequency = int(value / 4)
+
+    def configure(self, device_mode="rx"):
+        self.device_mode = device_mode
+        for device in self.devices.values():
+            for channel in device.channels:
+                channel.rx_enable = True
+                channel.rx_gain = 127
+                channel.rx_attenuator = False
+        self.latch_rx_settings()
+
+    def load(self, filename, default):
+        try:
+            with open(filename, "rb") as file1:
+                return pickle.load(file1)
+        except FileNotFoundError:
+            return default
+
+    def save(self, filename, values):
+        with open(filename, "wb") as file1:
+            pickle.dump(values, file1)
+
+    def load_channel_cal(self, filename="channel_cal_val.pkl"):
+        self.ccal = self.load(filename, [0.0] * 2)
+
+    def load_gain_cal(self, filename="gain_cal_val.pkl"):
+        self.gcal = self.load(filename, [1.0] * 8)
+
+    def load_phase_cal(self, filename="phase_cal_val.pkl"):
+        self.pcal = self.load(filename, [0.0] * 8)
+
+    def save_channel_cal(self, filename="channel_cal_val.pkl"):
+        self.save(filename, self.ccal)
+
+    def save_gain_cal(self, filename="gain_cal_val.pkl"):
+        self.save(filename, self.gcal)
+
+    def save_phase_cal(self, filename="phase_cal_val.pkl"):
+        self.save(filename, self.pcal)
+
+    def set_rx_hardwaregain(self, gain, apply_cal=True):
+        ccal = self.ccal if apply_cal else [0.0, 0.0]
+        self.sdr.rx_hardwaregain_chan0 = int(gain + ccal[0])
+        self.sdr.rx_hardwaregain_chan1 = int(gain + ccal[1])
+
+    def set_all_gain(self, value=127, apply_cal=True):
+        for i in range(8):
+            self.elements[i + 1].rx_gain = int(value * self.gcal[i]) if apply_cal else value
+            self.elements[i + 1].rx_attenuator = not bool(value)
+        self.latch_tx_settings() #as mycn0566: the gains are latched by the next rx latch
+
+    def set_chan_gain(self, chan_no, gain_val, apply_cal=True):
+        self.elements[chan_no + 1].rx_gain = int(gain_val * self.gcal[chan_no]) if apply_cal else int(gain_val)
+        self.elements[chan_no + 1].rx_attenuator = not bool(gain_val)
+        self.latch_rx_settings()
+
+    def set_chan_phase(self, chan_no, phase_val, apply_cal=True):
+        self.elements[chan_no + 1].rx_phase = (phase_val + (self.pcal[chan_no] if apply_cal else 0)) % 360.0
+        self.latch_rx_settings()
+
+    def set_beam_phase_diff(self, Ph_Diff):
+        for ch in range(8):
+            self.elements[ch + 1].rx_phase = (np.rint(Ph_Diff * ch / self.phase_step_size) * self.phase_step_size
+                                              + self.pcal[ch]) % 360.0
+        self.latch_rx_settings()
+
+    def set_tx_sw_div(self, div_ratio):
+        self._gpios.gpio_div_s0 = div_ratio
+
+    def read_monitor(self, verbose=False):
+        return [self._monitor.temp0()] + [self._monitor.voltage0() / 1000.0] * 8
+
+    def SDR_init(self, SampleRate, TX_freq, RX_freq, Rx_gain, Tx_gain, buffer_size):
+        self.sdr.rx_enabled_channels = [0, 1]
+        self.sdr.gain_control_mode_chan0 = "manual"
+        self.sdr.gain_control_mode_chan1 = "manual"
+        self.sdr._rxadc.set_kernel_buffers_count(1)
+        self.sdr.sample_rate = int(SampleRate)
+        self.sdr.rx_lo = int(RX_freq)
+        self.sdr.rx_buffer_size = int(buffer_size)
+        self.sdr.tx_lo = int(TX_freq)
+        self.sdr.tx_cyclic_buffer = True
+        self.sdr.tx_hardwaregain_chan0 = int(-88)
+        self.sdr.tx_hardwaregain_chan1 = int(Tx_gain)
+        self.sdr.rx_hardwaregain_chan0 = int(Rx_gain)
+        self.sdr.rx_hardwaregain_chan1 = int(Rx_gain)
+
+
+class one_bit_adc_dac(AttributeSink):
+    def __init__(self, uri=None):
+        super().__init__(uri=uri)
+
+class ad7291:
+    def __init__(self, uri=None):
+        self.uri = uri
+
+    def temp0(self):
+        return 30.0
+
+    def __getattr__(self, name):
+        if name.startswith("voltage"):
+            return lambda: 1000.0
+        raise AttributeError(name)
+
+Pluto = ad9361
+
+
+def install():
+    """ register this module as adi (with adi.adar1000, adi.adf4159, adi.cn0566), for scripts that
+        import pyadi-iio directly; call it before they are imported
+    """
+    adi = types.ModuleType("adi")
+    for name in ("ad9361", "Pluto", "CN0566", "adf4159", "adar1000", "adar1000_array", "one_bit_adc_dac", "ad7291"):
+        setattr(adi, name, globals()[name])
+    adi.__path__ = []
+    submodules = {"adar1000": ("adar1000", "adar1000_array"), "adf4159": ("adf4159",), "cn0566": ("CN0566",)}
+    for module, names in submodules.items():
+        sub = types.ModuleType("adi." + module)
+        for name in names:
+            setattr(sub, name, globals()[name])
+        setattr(adi, module, sub)
+        sys.modules["adi." + module] = sub
+    sys.modules["adi"] = adi
+    return adi
+
+def issim(uri):
+    """ urls served by this module: "sim:" or "sim:<anything>" """
+    return isinstance(uri, str) and uri.startswith("sim")
+
+def benchmark(samplerate=0.6e6, rxbuffersize=1024*16*15, seconds=5.0):
+    """ sustained rx() rate with the radar configuration of RadarDevice, against the device's sample rate """
+    sdr = ad9361()
+    sdr.sample_rate = int(samplerate)
+    sdr.rx_buffer_size = rxbuffersize
+    sdr.rx_enabled_channels = [0, 1]
+    sdr.rx_hardwaregain_chan0 = 30
+    sdr.rx_hardwaregain_chan1 = 30
+    phaser = CN0566(sdr=sdr)
+    phaser.configure()
+    phaser.lo = 12.1e9
+    phaser.freq_dev_range = int(500e6 / 4)
+    phaser.ramp_mode = "continuous_sawtooth"
+    phaser.enable = 0
+    t = np.arange(rxbuffersize) / samplerate
+    sdr.tx_lo = int(2.1e9)
+    sdr.rx_lo = int(2.1e9)
+    sdr.tx([0.5 * 2**14 * np.exp(2j * np.pi * 100e3 * t), 2**14 * np.exp(2j * np.pi * 100e3 * t)])
+    sdr.rx()
+    start = timer()
+    nbuffers = 0
+    while timer() - start < seconds:
+        sdr.rx()
+        nbuffers += 1
+    rate = nbuffers * rxbuffersize / (timer() - start)
+    print("Simulated rx: %0.2f MS/s (%0.1fx the %0.2f MS/s device rate), %d targets"
+          % (rate / 1e6, rate / samplerate, samplerate / 1e6, len(sdr.scene)))
+    return rate
+
+def main():
+    args = parser.parse_args()
+    if args.benchmark or args.script is None:
+        benchmark(args.samplerate, args.rxbuffersize, args.seconds)
+        return
+    import os
+    import runpy
+    install()
+    sys.argv = [args.script] + args.args
+    if not args.script.endswith(".py"):
+        runpy.run_module(args.script, run_name="__main__", alter_sys=True)
+        return
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    runpy.run_path(args.script, run_name="__main__")
+
+import argparse
+parser = argparse.ArgumentParser(description='Simulated Pluto/CN0566')
+parser.add_argument('script', nargs='?', default=None, type=str,
+                    help='script or module to run against the simulated devices (adi is replaced by this module)')
+parser.add_argument('args', nargs=argparse.REMAINDER,
+                    help='arguments of the script')
+parser.add_argument('--benchmark', action='store_true',
+                    help='measure the sustained rx() rate')
+parser.add_argument('--samplerate', default=0.6e6, type=float,
+                    help='benchmark sample rate')
+parser.add_argument('--rxbuffersize', default=1024*16*15, type=int,
+                    help='benchmark rx buffer size')
+parser.add_argument('--seconds', default=5.0, type=float,
+                    help='benchmark duration')
+
+if __name__ == '__main__':
+    main()
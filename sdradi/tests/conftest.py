@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+#the sdradi modules import each other as top-level modules, as when run from sdradi/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import processing
+
+
+@pytest.fixture
+def precision():
+    """ processing.setprecision for one test, the previous pipeline precision is restored afterwards """
+    previous = processing.precision
+    yield processing.setprecision
+    processing.setprecision(previous)
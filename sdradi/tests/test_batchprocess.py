@@ -0,0 +1,35 @@
+import numpy as np
+
+from batchprocess import runbatch
+from capture import CaptureRecorder, loadcapture, tocomplex
+from processing import SpectrumProcessor, StreamingSTFT, cfar2d, rangedoppler
+
+
+def test_runbatch_matches_single_process(tmp_path, precision):
+    framesize, nsamples = 3000, 22500 #7 frames and a partial one
+    rng = np.random.default_rng(4)
+    t = np.arange(nsamples) / 0.6e6
+    x = 1500 * np.exp(2j * np.pi * 130e3 * t) + 20 * (rng.standard_normal(nsamples) + 1j * rng.standard_normal(nsamples))
+    path = str(tmp_path / "capture.npy")
+    metadata = {"samplerate": 0.6e6, "rxbuffersize": framesize, "ramp_time_s": 1e-3}
+    with CaptureRecorder(path, metadata=metadata) as recorder:
+        recorder.write(x)
+    output = runbatch(path, output=str(tmp_path / "out"), chunkframes=3, workers=2, nfft=512, precision="double")
+
+    precision("double")
+    data = tocomplex(loadcapture(path)[:])
+    frames = data[:7 * framesize].reshape(7, framesize)
+    spectrum = SpectrumProcessor(window="blackman")
+    assert np.allclose(np.load(output + "_spectrum.npy"), [spectrum.process(frame, 0.6e6)[0] for frame in frames])
+    stft = StreamingSTFT(nfft=512, hop=256, fs=0.6e6, maxframes=1000)
+    ref = stft.update(data)
+    spectrogram = np.load(output + "_spectrogram.npy")
+    assert len(spectrogram) == (7 * framesize - 1) // 256 + 1 #frames starting in the 7 full frames
+    assert np.allclose(spectrogram, ref[:len(spectrogram)])
+    rd, _ = rangedoppler(frames, n_c=4, n_s=600, showdb=True, fulldoppler=True)
+    assert np.allclose(np.load(output + "_rd.npy"), rd)
+    detections = cfar2d(rd, method="ca", threshold_db=15.0)
+    cfar = np.load(output + "_cfar.npz")
+    assert cfar["counts"].sum() > 0
+    assert list(cfar["counts"]) == [len(d) for d in detections]
+    assert np.allclose(cfar["detections"][:, 1:], np.concatenate(detections))
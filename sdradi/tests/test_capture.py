@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from capture import BlockCapture, CaptureRecorder, available_codecs, loadcapture, loadindex, readmetadata, tocomplex
+
+
+def rxbuffers(nbuffers=7, size=3000, seed=0):
+    """ complex rx buffers with float IQ, sums of both 12bit channels reach +-4096 """
+    rng = np.random.default_rng(seed)
+    return [rng.uniform(-4096, 4096, size) + 1j * rng.uniform(-4096, 4096, size) for _ in range(nbuffers)]
+
+
+@pytest.mark.parametrize("mode", ["npy", "chunks"])
+@pytest.mark.parametrize("scale", [1.0, 0.5])
+@pytest.mark.parametrize("threaded", [False, True])
+def test_int16_round_trip(tmp_path, mode, scale, threaded):
+    path = str(tmp_path / "capture.npy")
+    buffers = rxbuffers()
+    with CaptureRecorder(path, mode=mode, scale=scale, metadata={"samplerate": 0.6e6}, chunksamples=5000,
+                         threaded=threaded) as recorder:
+        for k, data in enumerate(buffers):
+            recorder.write(data, rxgain=(k, k + 1))
+    data = loadcapture(path)
+    assert data.dtype == np.int16 and data.shape == (len(buffers) * 3000, 2)
+    meta = readmetadata(path)
+    assert meta["samplerate"] == 0.6e6 and meta["nsamples"] == len(buffers) * 3000
+    restored = tocomplex(data[:], meta["scale"])
+    expected = np.concatenate(buffers)
+    #within the rounding of the stored samples
+    assert np.max(np.abs(restored.real - expected.real)) <= scale / 2
+    assert np.max(np.abs(restored.imag - expected.imag)) <= scale / 2
+    #slices across chunk files read like the whole array
+    assert np.array_equal(data[4000:12001:3], data[:][4000:12001:3])
+    index = loadindex(path)
+    assert list(index["offset"]) == [k * 3000 for k in range(len(buffers))]
+    assert list(index["rxgain1"]) == [k + 1 for k in range(len(buffers))]
+
+
+@pytest.mark.parametrize("compression", available_codecs())
+def test_blocks_int16_round_trip(tmp_path, compression):
+    path = str(tmp_path / "capture.npy")
+    buffers = rxbuffers()
+    with CaptureRecorder(path, mode="blocks", compression=compression, blocksamples=4096, scale=0.5) as recorder:
+        for data in buffers:
+            recorder.write(data)
+    data = loadcapture(path)
+    assert isinstance(data, BlockCapture) and len(data) == len(buffers) * 3000
+    expected = np.concatenate(buffers)
+    restored = tocomplex(data[:], readmetadata(path)["scale"])
+    assert np.max(np.abs(restored.real - expected.real)) <= 0.25
+    assert np.max(np.abs(restored.imag - expected.imag)) <= 0.25
+    #a slice decodes only its blocks and matches the whole capture, the last block is partial
+    assert np.array_equal(data[4000:20999:5], data[:][4000:20999:5])
+    assert np.array_equal(data[-1], data[:][-1])
+    data.close()
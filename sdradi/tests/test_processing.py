@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from scipy import signal
+
+import processing
+from processing import DigitalDownConverter, StreamingSTFT, cfar2d, getdtypes, rangedoppler, todtype
+
+
+def fmcwcapture(N=1024*16*15, fs=0.6e6, seed=0):
+    """ 12bit FMCW-like capture: two beat tones and noise, rounded like the ADC samples """
+    rng = np.random.default_rng(seed)
+    t = np.arange(N) / fs
+    x = 1500 * np.exp(2j * np.pi * 130e3 * t) + 300 * np.exp(2j * np.pi * 101e3 * t)
+    x = x + 20 * (rng.standard_normal(N) + 1j * rng.standard_normal(N))
+    return np.round(x.real) + 1j * np.round(x.imag)
+
+
+def test_rangedoppler_single_matches_double(precision):
+    x = fmcwcapture()
+    n_s = 600
+    n_c = int(len(x) / n_s) - 1
+    results = {}
+    for mode in ("double", "single"):
+        precision(mode)
+        rd, table = rangedoppler(todtype(x), n_c=n_c, n_s=n_s, showdb=True)
+        assert table.dtype == getdtypes()[0]
+        assert rd.dtype == getdtypes()[1]
+        results[mode] = rd
+    ref, single = results["double"], results["single"]
+    valid = ref > ref.max() - 100
+    assert np.max(np.abs(ref[valid] - single[valid])) < 0.05
+
+
+def test_precisioncheck_restores_precision(precision):
+    precision("single")
+    processing.precisioncheck()
+    assert processing.precision == "single"
+
+
+def test_streamingstft_chunks_match_one_pass(precision):
+    precision("double")
+    x = fmcwcapture(N=20000)
+    nfft, overlap = 1024, 0.75
+    stft = StreamingSTFT(nfft=nfft, overlap=overlap, maxframes=8)
+    spectra = []
+    rng = np.random.default_rng(1)
+    start = 0
+    while start < len(x):
+        n = int(rng.integers(1, 3000))
+        spectra.append(stft.update(x[start:start + n]).copy())
+        start += n
+    while stft.available:
+        spectra.append(stft.update().copy()) #frames left queued beyond maxframes
+    spectra = np.concatenate(spectra)
+    #reference: every frame at i*hop of the whole capture in one pass
+    hop = stft.hop
+    nframes = (len(x) - nfft) // hop + 1
+    frames = np.stack([x[i*hop:i*hop + nfft] for i in range(nframes)])
+    win = signal.get_window('blackman', nfft, fftbins=False)
+    ref = np.abs(np.fft.fftshift(np.fft.fft(frames * win, axis=-1), axes=-1)) / (np.sum(win) * 2**11)
+    ref = 20 * np.log10(np.maximum(ref, 10 ** (-15) / 2**11))
+    assert spectra.shape == (nframes, nfft)
+    assert np.max(np.abs(spectra - ref)) < 1e-9
+    assert np.allclose(stft.frametimes(1), [(nframes - 1) * hop / stft.fs])
+
+
+@pytest.mark.parametrize("method", ["ca", "go", "os"])
+def test_cfar2d_finds_the_injected_target(method):
+    rng = np.random.default_rng(2)
+    noise = rng.standard_normal((64, 128)) + 1j * rng.standard_normal((64, 128))
+    noise[20, 50] = 100 #30dB above the noise power
+    rd = 20 * np.log10(np.abs(noise))
+    detections = cfar2d(rd, method=method, threshold_db=15)
+    assert detections.shape == (1, 3)
+    assert tuple(detections[0, :2]) == (50, 20)
+    assert detections[0, 2] > 20
+    #a stack gives the detections of every map
+    stacked = cfar2d(np.stack([rd, rd]), method=method, threshold_db=15)
+    assert len(stacked) == 2 and all(np.array_equal(d, detections) for d in stacked)
+
+
+@pytest.mark.parametrize("decimation", [1, 4])
+def test_ddc_chunks_match_one_shot(precision, decimation):
+    precision("double")
+    x = fmcwcapture(N=30000) / 2**11
+    oneshot = DigitalDownConverter(decimation=decimation).process(x)
+    ddc = DigitalDownConverter(decimation=decimation)
+    rng = np.random.default_rng(3)
+    bounds = np.concatenate(([0], np.sort(rng.integers(1, len(x), 20)), [len(x)]))
+    chunked = np.concatenate([ddc.process(x[a:b]) for a, b in zip(bounds[:-1], bounds[1:])])
+    assert chunked.shape == oneshot.shape == (-(-len(x) // decimation),)
+    assert np.max(np.abs(chunked - oneshot)) < 3e-12